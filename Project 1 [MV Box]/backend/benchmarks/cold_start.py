@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from backend.modules.tools import sprint, Colors
+
+RESULT_PREFIX = 'COLD_START_RESULT '
+ENDPOINTS = {'landing_stats': ('/public/general/info/landing_stats', ''),
+             'top_playlists': ('/public/general/playlists/top_playlists', ''),
+             'mv_tracks': ('/public/general/tracks/mv_tracks', 'seed=1')}
+METRICS = ('process_ms', 'import_ms', 'first_response_ms', 'cold_start_ms', 'warm_response_ms', 'job_ms')
+
+CHILD_SCRIPT = f'''
+import json, os, sys, time
+
+config = json.loads(sys.argv[1])
+started_at = time.perf_counter()
+from backend.modules.db.models import Keys
+Keys.alter_keys(prefix=config['keys_prefix'])
+from backend.modules.api.serverless import api, handler
+imported_at = time.perf_counter()
+response = handler(config['event'], None)
+responded_at = time.perf_counter()
+first_response_at = time.time()
+lazy_app_core = 'app_core' not in api.__dict__
+handler(config['event'], None)
+warm_at = time.perf_counter()
+result = {{'status': response['statusCode'],
+           'lazy_app_core': lazy_app_core,
+           'first_response_at': first_response_at,
+           'import_ms': (imported_at - started_at) * 1000,
+           'first_response_ms': (responded_at - imported_at) * 1000,
+           'cold_start_ms': (responded_at - started_at) * 1000,
+           'warm_response_ms': (warm_at - responded_at) * 1000}}
+if config['job']:
+    job_started_at = time.perf_counter()
+    handler({{'job': config['job']}}, None)
+    result['job_ms'] = (time.perf_counter() - job_started_at) * 1000
+print({RESULT_PREFIX!r} + json.dumps(result), flush=True)
+os._exit(0)
+'''
+
+
+def get_http_event(path: str, query: str = ''):
+    return {'version': '2.0',
+            'routeKey': '$default',
+            'rawPath': path,
+            'rawQueryString': query,
+            'headers': {'host': 'localhost', 'x-forwarded-proto': 'https'},
+            'requestContext': {'http': {'method': 'GET', 'path': path, 'protocol': 'HTTP/1.1',
+                                        'sourceIp': '127.0.0.1'},
+                               'stage': '$default'},
+            'isBase64Encoded': False}
+
+
+def run_cold_start(endpoint: str, job: str, keys_prefix: str, env: dict):
+    path, query = ENDPOINTS[endpoint]
+    config = {'event': get_http_event(path=path, query=query), 'job': job, 'keys_prefix': keys_prefix}
+    spawned_at = time.time()
+    process = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, json.dumps(config)], env=env,
+                             capture_output=True, text=True)
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode or not lines:
+        raise Exception(f'Cold start run failed [{endpoint}]\n{process.stdout}\n{process.stderr}')
+
+    result = json.loads(lines[-1].removeprefix(RESULT_PREFIX))
+    result['process_ms'] = (result.pop('first_response_at') - spawned_at) * 1000
+    return result
+
+
+def summarize(runs: list[dict]):
+    summary = {'runs': len(runs),
+               'statuses': sorted({run['status'] for run in runs}),
+               'lazy_app_core': all(run['lazy_app_core'] for run in runs)}
+    for metric in METRICS:
+        values = [run[metric] for run in runs if metric in run]
+        if values:
+            summary[metric] = {'p50': round(statistics.median(values), 3),
+                               'max': round(max(values), 3)}
+    return summary
+
+
+def main(args: argparse.Namespace):
+    env = {**os.environ,
+           'MONGO_URL': args.mongo_url,
+           'BUILD_TYPE': os.getenv('BUILD_TYPE', 'PRODUCTION'),
+           'MAILGUN_API_KEY': os.getenv('MAILGUN_API_KEY', 'benchmark'),
+           'SPOTIFY_CACHE_PATH': args.spotify_cache_path}
+
+    results = {}
+    for endpoint in args.endpoints:
+        runs = [run_cold_start(endpoint=endpoint, job=args.job, keys_prefix=args.keys_prefix, env=env)
+                for _ in range(args.runs)]
+        results[endpoint] = summary = summarize(runs=runs)
+        line = (f'{endpoint:<16} process {summary["process_ms"]["p50"]:>8.1f}ms  '
+                f'import {summary["import_ms"]["p50"]:>7.1f}ms  '
+                f'first response {summary["first_response_ms"]["p50"]:>7.1f}ms  '
+                f'warm {summary["warm_response_ms"]["p50"]:>6.1f}ms')
+        if 'job_ms' in summary:
+            line += f'  {args.job} {summary["job_ms"]["p50"]:>7.1f}ms'
+        healthy = summary['lazy_app_core'] and summary['statuses'] == [200]
+        sprint(line, Colors.light_green if healthy else Colors.light_red)
+
+    report = {'timestamp': datetime.now(timezone.utc).isoformat(),
+              'config': {key: value for key, value in vars(args).items() if key != 'output'},
+              'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+              'endpoints': results}
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    sprint(f'[REPORT] [{args.output}]', Colors.light_cyan)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serverless cold start benchmark: time from import to the first '
+                                                 'response in a fresh interpreter. Expects a database seeded by '
+                                                 'backend.benchmarks.public_api')
+    parser.add_argument('--mongo-url', default='mongodb://127.0.0.1:27017/?directConnection=true')
+    parser.add_argument('--keys-prefix', default='benchmark')
+    parser.add_argument('--endpoints', nargs='*', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per endpoint')
+    parser.add_argument('--job', help='Also time an event-invoked job after the first response')
+    parser.add_argument('--spotify-cache-path', default=':memory:')
+    parser.add_argument('--output', default='cold_start_benchmark.json')
+    main(parser.parse_args())
@@ -0,0 +1,78 @@
+import argparse
+import random
+import time
+from datetime import datetime, timezone, timedelta
+
+from backend.modules.db.decoding import decode, get_projection
+from backend.modules.db.models import Playlist, Platforms, Track, TrackSource, JoinMember, MemberTypes, \
+    CompactTopPlaylistsSnapshot, SnapshotEntry
+from backend.modules.tools import sprint, Colors
+
+PROJECTIONS = {Playlist: ['platform', 'platform_id', 'mv_track_count', 'follower_count', 'snapshot_id',
+                          'whitelist_version'],
+               JoinMember: ['email']}
+
+
+def get_documents(count: int, rng: random.Random):
+    now = datetime.now(timezone.utc)
+    playlists = [Playlist(platform=Platforms.spotify, platform_id=f'{idx:022d}', name=f'Playlist {idx}',
+                          description='Synthetic playlist description ' * 4,
+                          image_path=f'https://images.example.com/playlists/{idx}.jpg',
+                          follower_count=rng.randrange(1_000_000), track_count=rng.randrange(500),
+                          mv_track_count=rng.randrange(50), snapshot_id=f'snapshot_{idx}')
+                 for idx in range(count)]
+    tracks = [Track(sources=[TrackSource(platform=Platforms.spotify, platform_id=f'{idx:022d}')],
+                    name=f'Track {idx}', image_path=f'https://images.example.com/tracks/{idx}.jpg', mv_pass=True)
+              for idx in range(count)]
+    members = [JoinMember(name=f'Member {idx}', email=f'member_{idx}@example.com',
+                          member_type=rng.choice(list(MemberTypes)),
+                          last_sent_news_date=now - timedelta(days=rng.randrange(30)))
+               for idx in range(count)]
+    snapshots = [CompactTopPlaylistsSnapshot(entries=[SnapshotEntry(token=f'{idx}_{rank}', rank=rank,
+                                                                    follower_count=rng.randrange(1_000_000),
+                                                                    mv_track_count=rng.randrange(50))
+                                                      for rank in range(1, 11)],
+                                             timestamp=now - timedelta(weeks=idx))
+                 for idx in range(count // 10)]
+    return {model: [el.model_dump(by_alias=True, mode='json') for el in models]
+            for model, models in ((Playlist, playlists), (Track, tracks), (JoinMember, members),
+                                  (CompactTopPlaylistsSnapshot, snapshots))}
+
+
+def measure(decode_documents, repeat: int):
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        decode_documents()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count: int, repeat: int):
+    documents = get_documents(count=count, rng=random.Random(42))
+    sprint(f'[DECODING] [{count} DOCUMENTS] [BEST OF {repeat}] [ms per 10k documents]', Colors.light_cyan)
+
+    for model, data in documents.items():
+        scale = 10_000 / len(data) * 1000
+        validated = measure(lambda: decode(model=model, data=data), repeat=repeat) * scale
+        constructed = measure(lambda: [model.model_construct(**el) for el in data], repeat=repeat) * scale
+        trusted = measure(lambda: decode(model=model, data=data, trusted=True), repeat=repeat) * scale
+        line = (f'{model.__name__:<28} model_validate {validated:>8.2f}   raw model_construct {constructed:>8.2f}   '
+                f'records {trusted:>8.2f} ({validated / trusted:.1f}x)')
+
+        if fields := PROJECTIONS.get(model):
+            projected_data = [{key: el[key] for key in ['_id', *get_projection(model=model, fields=fields)]}
+                              for el in data]
+            projected = measure(lambda: decode(model=model, data=projected_data, trusted=True, fields=fields),
+                                repeat=repeat) * scale
+            line += f'   projected records {projected:>8.2f} ({validated / projected:.1f}x)'
+        sprint(line, Colors.light_green)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DBEngine document decoding benchmark')
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(count=args.count, repeat=args.repeat)
@@ -0,0 +1,71 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+import uuid6
+
+from backend.modules.app.playlist_tracking import PlaylistTracking, PlaylistTrace
+from backend.modules.db.models import Platforms
+from backend.modules.tools import sprint, Colors
+
+
+def get_traces(count: int):
+    return [PlaylistTrace(playlist_token=uuid6.uuid7().hex,
+                          platform=Platforms.spotify,
+                          platform_id=f'{idx:022d}',
+                          mv_track_count=idx % 50,
+                          follower_count=idx * 7) for idx in range(count)]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    structure = build()
+    elapsed = time.perf_counter() - started_at
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, memory, elapsed
+
+
+def build_model_slots(traces: list[PlaylistTrace]):
+    slots = tuple([] for _ in range(PlaylistTracking.slot_count))
+    for idx, trace in enumerate(traces):
+        slots[idx % PlaylistTracking.slot_count].append(trace.model_copy())
+    return slots
+
+
+def build_tracking(traces: list[PlaylistTrace]):
+    tracking = PlaylistTracking()
+    for trace in traces:
+        tracking.track(trace)
+    return tracking
+
+
+def main(count: int, updates: int):
+    traces = get_traces(count)
+
+    _, model_memory, _ = measure(lambda: build_model_slots(traces))
+    tracking, tracking_memory, tracking_time = measure(lambda: build_tracking(traces))
+
+    sprint(f'[PLAYLIST_TRACKING] [{count} PLAYLISTS]', Colors.light_cyan)
+    sprint(f'Pydantic slots:    {model_memory / count:.1f} B/playlist', Colors.light_yellow)
+    sprint(f'PlaylistTracking:  {tracking_memory / count:.1f} B/playlist ({tracking_time:.3f}s to load)',
+           Colors.light_green)
+
+    started_at = time.perf_counter()
+    for idx in range(updates):
+        trace = traces[idx % count]
+        trace.follower_count += 1
+        tracking.update(trace)
+    elapsed = time.perf_counter() - started_at
+    sprint(f'PlaylistTracking.update: {elapsed / updates * 1e6:.2f} us/update', Colors.light_green)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PlaylistTracking memory and update benchmark')
+    parser.add_argument('--count', type=int, default=100_000)
+    parser.add_argument('--updates', type=int, default=100_000)
+    args = parser.parse_args()
+    main(count=args.count, updates=args.updates)
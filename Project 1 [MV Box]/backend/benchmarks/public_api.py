@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from threading import Thread, Lock, local
+
+os.environ.setdefault('MAILGUN_API_KEY', 'benchmark')
+os.environ.setdefault('WEB_APP_HOST', 'http://localhost:3000')
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from pymongo import monitoring
+
+from backend.modules.api.routes.public.general import general_api_router
+from backend.modules.app.core import AppCore
+from backend.modules.db.async_db_engine import AsyncDBEngine
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.models import Keys, COLLECTION_INDEXES, Playlist, Track, TrackSource, Artist, ArtistSource, \
+    JoinMember, MemberTypes, GeneralInfo, Platforms
+from backend.modules.db.mongo_engine import MongoEngine
+from backend.modules.tools import sprint, Colors, hour_rounder, get_spotify_playlist_url
+from backend.tests.stubs.spotify import StubSpotifyController, StubSpotifyPlaylist, StubSpotifyUser
+
+SEED_CHUNK_SIZE = 10_000
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'endSessions'}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+        self.lock = Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name not in IGNORED_COMMANDS:
+            with self.lock:
+                self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+
+def get_platform_id(idx: int):
+    return f'{idx:022d}'
+
+
+def insert_chunks(mongo_engine: MongoEngine, key: Keys, models: list):
+    for idx in range(0, len(models), SEED_CHUNK_SIZE):
+        data = [model.model_dump(by_alias=True, mode='json') for model in models[idx:idx + SEED_CHUNK_SIZE]]
+        mongo_engine.insert(db=Keys.mv_box_playlists_db, key=key, data=data)
+
+
+def seed(mongo_engine: MongoEngine, db_engine: DBEngine, playlist_count: int, track_count: int,
+         artist_count: int, member_count: int, snapshot_count: int, rng: random.Random):
+    started_at = time.perf_counter()
+    mongo_engine.engine.drop_database(Keys.mv_box_playlists_db.value)
+    mongo_engine.ensure_indexes(db=Keys.mv_box_playlists_db, indexes=COLLECTION_INDEXES)
+
+    now = datetime.now(timezone.utc)
+    db_engine.add_general_info(info=GeneralInfo(last_snapshot_timestamp=hour_rounder(now),
+                                                snapshot_cycle=int(timedelta(weeks=1).total_seconds()),
+                                                network_coverage=playlist_count * 1000,
+                                                landing_page_view_count=0))
+
+    artists = [Artist(name=f'Artist {idx}', image_path=f'https://images.example.com/artists/{idx}.jpg',
+                      sources=[ArtistSource(platform=Platforms.spotify, platform_id=get_platform_id(idx),
+                                            follower_count=rng.randrange(1_000_000))])
+               for idx in range(artist_count)]
+    insert_chunks(mongo_engine=mongo_engine, key=Keys.artists, models=artists)
+
+    tracks = [Track(artist_token=artists[idx % artist_count].token,
+                    sources=[TrackSource(platform=Platforms.spotify, platform_id=get_platform_id(idx))],
+                    name=f'Track {idx}', image_path=f'https://images.example.com/tracks/{idx}.jpg',
+                    mv_pass=rng.random() < 0.8)
+              for idx in range(track_count)]
+    insert_chunks(mongo_engine=mongo_engine, key=Keys.tracks, models=tracks)
+
+    playlists = [Playlist(platform=Platforms.spotify, platform_id=get_platform_id(idx), name=f'Playlist {idx}',
+                          image_path=f'https://images.example.com/playlists/{idx}.jpg',
+                          follower_count=int(rng.paretovariate(1.2) * 100), track_count=rng.randrange(10, 500),
+                          mv_track_count=rng.randrange(50), sponsored=rng.random() < 0.001,
+                          snapshot_id=f'snapshot_{idx}')
+                 for idx in range(playlist_count)]
+    insert_chunks(mongo_engine=mongo_engine, key=Keys.playlists, models=playlists)
+
+    members = [JoinMember(name=f'Member {idx}', email=f'member_{idx}@example.com',
+                          member_type=rng.choice(list(MemberTypes)), signed_up=rng.random() < 0.9)
+               for idx in range(member_count)]
+    insert_chunks(mongo_engine=mongo_engine, key=Keys.join_members, models=members)
+
+    top_playlists = sorted(playlists, key=lambda x: (x.mv_track_count, x.follower_count), reverse=True)[:30]
+    for week in range(snapshot_count, 0, -1):
+        db_engine.add_top_playlists_snapshot(timestamp=hour_rounder(now - timedelta(weeks=week)),
+                                             playlists=rng.sample(top_playlists, 10))
+
+    sprint(f'[SEED] [{playlist_count} PLAYLISTS] [{track_count} TRACKS] [{artist_count} ARTISTS] '
+           f'[{member_count} MEMBERS] [{snapshot_count} SNAPSHOTS] [{time.perf_counter() - started_at:.1f}s]',
+           Colors.light_green)
+    return [playlist.token for playlist in top_playlists]
+
+
+def get_stub_controller(playlist_count: int, new_playlist_count: int, latency: float):
+    owner = StubSpotifyUser(spotify_id='benchmark_owner', name='Benchmark Owner')
+    playlists = [StubSpotifyPlaylist(spotify_id=get_platform_id(playlist_count + idx),
+                                     snapshot_id=f'snapshot_{idx}', name=f'New Playlist {idx}',
+                                     follower_count=idx, owner=owner)
+                 for idx in range(new_playlist_count)]
+    return StubSpotifyController(playlists=playlists, latency=latency)
+
+
+def start_server(app: FastAPI, port: int):
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def walk_cursors(client: httpx.Client, path: str, params: dict, pages: int):
+    cursors = []
+    response = client.get(path, params=params).json()
+    while response.get('next_cursor') and len(cursors) < pages:
+        cursors.append(response['next_cursor'])
+        response = client.get(path, params={**params, 'cursor': response['next_cursor']}).json()
+    return cursors
+
+
+def get_scenarios(base_url: str, playlist_count: int, history_tokens: list[str], new_playlist_offset: int,
+                  requests: int, rng: random.Random):
+    with httpx.Client(base_url=base_url) as client:
+        top_cursors = walk_cursors(client, '/public/general/playlists/top_playlists', {}, pages=50)
+        track_cursors = walk_cursors(client, '/public/general/tracks/mv_tracks', {'shuffle': False}, pages=50)
+        top_etag = client.get('/public/general/playlists/top_playlists').headers['etag']
+
+    job_ids = []
+    job_ids_lock = Lock()
+
+    def submit_playlist(idx: int):
+        playlist_url = get_spotify_playlist_url(playlist_id=get_platform_id(new_playlist_offset + idx))
+        return 'POST', '/public/general/playlists/track_playlist', {'playlist_url': playlist_url}, None
+
+    def collect_job(response: httpx.Response):
+        with job_ids_lock:
+            job_ids.append(response.json()['job_id'])
+
+    return [
+        ('landing_stats', lambda idx: ('GET', '/public/general/info/landing_stats', None, None), 200, None),
+        ('top_playlists', lambda idx: ('GET', '/public/general/playlists/top_playlists',
+                                       {'offset': rng.randrange(max(playlist_count - 10, 1))}, None), 200, None),
+        ('top_playlists_cursor', lambda idx: ('GET', '/public/general/playlists/top_playlists',
+                                              {'cursor': rng.choice(top_cursors)}, None), 200, None),
+        ('top_playlists_revalidate', lambda idx: ('GET', '/public/general/playlists/top_playlists', None, None,
+                                                  {'If-None-Match': top_etag}), 304, None),
+        ('playlist_history', lambda idx: ('GET', '/public/general/playlists/history',
+                                          {'playlist_token': rng.choice(history_tokens)}, None), 200, None),
+        ('mv_tracks_shuffle', lambda idx: ('GET', '/public/general/tracks/mv_tracks',
+                                           {'seed': rng.randrange(2 ** 31), 'offset': rng.randrange(100)}, None),
+         200, None),
+        ('mv_tracks_cursor', lambda idx: ('GET', '/public/general/tracks/mv_tracks',
+                                          {'shuffle': False, 'cursor': rng.choice(track_cursors)}, None), 200, None),
+        ('track_playlist', submit_playlist, 202, collect_job),
+        ('track_playlist_job', lambda idx: ('GET', f'/public/general/playlists/track_playlist/'
+                                                   f'{job_ids[idx % len(job_ids)]}', None, None), 200, None),
+        ('members_join', lambda idx: ('POST', '/public/general/members/join', None,
+                                      {'name': f'Benchmark {idx}', 'email': f'benchmark_{idx}_{requests}@example.com',
+                                       'member_type': MemberTypes.fan.value}), 200, None),
+    ]
+
+
+def run_scenario(base_url: str, counter: CommandCounter, build_request, expected_status: int, on_response,
+                 requests: int, warmup: int, clients: int):
+    clients_local = local()
+    latencies = []
+    errors = 0
+    results_lock = Lock()
+
+    def send(idx: int, measured: bool):
+        nonlocal errors
+        if not hasattr(clients_local, 'client'):
+            clients_local.client = httpx.Client(base_url=base_url, timeout=30)
+        method, path, params, body, *headers = build_request(idx)
+        started_at = time.perf_counter()
+        response = clients_local.client.request(method, path, params=params, json=body,
+                                                headers=headers[0] if headers else None)
+        elapsed = time.perf_counter() - started_at
+        if response.status_code == expected_status and on_response is not None:
+            on_response(response)
+        if measured:
+            with results_lock:
+                latencies.append(elapsed)
+                errors += response.status_code != expected_status
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(lambda idx: send(idx, measured=False), range(warmup)))
+        ops_before = counter.count
+        started_at = time.perf_counter()
+        list(executor.map(lambda idx: send(idx, measured=True), range(warmup, warmup + requests)))
+        elapsed = time.perf_counter() - started_at
+        ops = counter.count - ops_before
+
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'requests': requests,
+            'errors': errors,
+            'p50_ms': round(quantiles[49] * 1000, 3),
+            'p95_ms': round(quantiles[94] * 1000, 3),
+            'p99_ms': round(quantiles[98] * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'max_ms': round(max(latencies) * 1000, 3),
+            'throughput_rps': round(requests / elapsed, 1),
+            'db_ops_per_request': round(ops / requests, 2)}
+
+
+def compare(results: dict, baseline_path: str, tolerance: float):
+    with open(baseline_path) as file:
+        baseline = json.load(file)['endpoints']
+
+    sprint(f'[COMPARE] [{baseline_path}]', Colors.light_cyan)
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        delta = (result['p95_ms'] - baseline[name]['p95_ms']) / baseline[name]['p95_ms']
+        color = Colors.light_red if delta > tolerance else Colors.light_green
+        sprint(f'{name:<22} p95 {baseline[name]["p95_ms"]:>9.2f}ms -> {result["p95_ms"]:>9.2f}ms '
+               f'({delta:+.1%})', color)
+
+
+def main(args: argparse.Namespace):
+    rng = random.Random(args.random_seed)
+    Keys.alter_keys(prefix='benchmark')
+
+    counter = CommandCounter()
+    mongo_engine = MongoEngine(connection_url=args.mongo_url, marker='benchmark', verbose=False,
+                               event_listeners=[counter])
+    db_engine = DBEngine(db_engine=mongo_engine)
+    if args.skip_seed:
+        history_tokens = [playlist.token for playlist in db_engine.get_top_playlists(limit=30)]
+    else:
+        history_tokens = seed(mongo_engine=mongo_engine, db_engine=db_engine, playlist_count=args.playlists,
+                              track_count=args.tracks, artist_count=args.artists, member_count=args.members,
+                              snapshot_count=args.snapshots, rng=rng)
+
+    new_playlist_offset = 10 ** 12
+    stub_controller = get_stub_controller(playlist_count=new_playlist_offset,
+                                          new_playlist_count=args.requests + args.warmup,
+                                          latency=args.spotify_latency)
+    app_core = AppCore(db_engine=db_engine, dev_mode=True, verbose=False, ingestion_workers=args.ingestion_workers,
+                       spotify_cache_path=':memory:', spotify_controller=stub_controller)
+
+    app = FastAPI()
+    app.include_router(general_api_router, prefix='/public')
+    app.db_engine = db_engine
+    app.async_mongo_engine = AsyncMongoEngine(connection_url=args.mongo_url, marker='benchmark', verbose=False,
+                                              event_listeners=[counter], metrics=mongo_engine.metrics)
+    app.async_db_engine = AsyncDBEngine(db_engine=app.async_mongo_engine, sync_engine=db_engine)
+    app.playlist_ingestion = app_core.playlist_ingestion
+    server, server_thread = start_server(app=app, port=args.port)
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    results = {}
+    try:
+        scenarios = get_scenarios(base_url=base_url, playlist_count=args.playlists, history_tokens=history_tokens,
+                                  new_playlist_offset=new_playlist_offset, requests=args.requests, rng=rng)
+        for name, build_request, expected_status, on_response in scenarios:
+            if args.endpoints and name not in args.endpoints:
+                continue
+            results[name] = run_scenario(base_url=base_url, counter=counter, build_request=build_request,
+                                         expected_status=expected_status, on_response=on_response,
+                                         requests=args.requests, warmup=args.warmup, clients=args.clients)
+            result = results[name]
+            sprint(f'{name:<22} p50 {result["p50_ms"]:>8.2f}ms  p95 {result["p95_ms"]:>8.2f}ms  '
+                   f'p99 {result["p99_ms"]:>8.2f}ms  {result["throughput_rps"]:>8.1f} rps  '
+                   f'{result["db_ops_per_request"]:>5.2f} ops/req  {result["errors"]} errors',
+                   Colors.light_red if result['errors'] else Colors.light_green)
+    finally:
+        server.should_exit = True
+        server_thread.join()
+        app_core.__del__()
+        app.async_mongo_engine.__del__()
+        db_engine.__del__()
+        mongo_engine.__del__()
+
+    report = {'timestamp': datetime.now(timezone.utc).isoformat(),
+              'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+              'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+              'endpoints': results}
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    sprint(f'[REPORT] [{args.output}]', Colors.light_cyan)
+
+    if args.compare:
+        compare(results=results, baseline_path=args.compare, tolerance=args.tolerance)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Public API latency benchmark against a local MongoDB')
+    parser.add_argument('--mongo-url', default='mongodb://127.0.0.1:27017/?directConnection=true')
+    parser.add_argument('--playlists', type=int, default=100_000)
+    parser.add_argument('--tracks', type=int, default=50_000)
+    parser.add_argument('--artists', type=int, default=10_000)
+    parser.add_argument('--members', type=int, default=1_000_000)
+    parser.add_argument('--snapshots', type=int, default=52)
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the data seeded by a previous run')
+    parser.add_argument('--requests', type=int, default=2_000, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--endpoints', nargs='*', help='Only run the given scenarios')
+    parser.add_argument('--spotify-latency', type=float, default=0.05, help='Stub Spotify call latency in seconds')
+    parser.add_argument('--ingestion-workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--output', default='public_api_benchmark.json')
+    parser.add_argument('--compare', help='Previous report to compare p95 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed p95 regression before flagging')
+    main(parser.parse_args())
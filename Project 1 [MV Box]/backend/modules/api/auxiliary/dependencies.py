@@ -1,17 +1,33 @@
 from typing import Annotated
 from fastapi import Request, Depends
 
-from backend.modules.app.core import AppCore
+from backend.modules.app.ingestion import PlaylistIngestion
+from backend.modules.db.async_db_engine import AsyncDBEngine
 from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.instrumentation import current_scope, OperationMetrics
 
 
 def get_db_engine(request: Request) -> DBEngine:
     return request.app.db_engine
 
 
-def get_app_core(request: Request) -> AppCore:
-    return request.app.app_core
+def get_async_db_engine(request: Request) -> AsyncDBEngine:
+    return request.app.async_db_engine
+
+
+def get_playlist_ingestion(request: Request) -> PlaylistIngestion | None:
+    return request.app.playlist_ingestion
+
+
+def get_operation_metrics(request: Request) -> OperationMetrics:
+    return request.app.mongo_engine.metrics
+
+
+async def set_operation_scope(request: Request):
+    current_scope.set(f'{request.method} {request.scope["route"].path}')
 
 
 DBEngineDep = Annotated[DBEngine, Depends(get_db_engine)]
-AppCoreDep = Annotated[AppCore, Depends(get_app_core)]
+AsyncDBEngineDep = Annotated[AsyncDBEngine, Depends(get_async_db_engine)]
+PlaylistIngestionDep = Annotated[PlaylistIngestion | None, Depends(get_playlist_ingestion)]
+OperationMetricsDep = Annotated[OperationMetrics, Depends(get_operation_metrics)]
@@ -0,0 +1,24 @@
+import hashlib
+
+from fastapi import Request, Response
+from fastapi import status as http_status
+
+
+def get_etag(content: bytes):
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+
+def is_not_modified(request: Request, etag: str):
+    if (header := request.headers.get('if-none-match')) is None:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def get_cache_headers(etag: str, cache_control: str):
+    return {'ETag': etag, 'Cache-Control': cache_control}
+
+
+def not_modified(etag: str, cache_control: str):
+    return Response(status_code=http_status.HTTP_304_NOT_MODIFIED,
+                    headers=get_cache_headers(etag=etag, cache_control=cache_control))
@@ -0,0 +1,12 @@
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+
+def add_cors_middleware(api: FastAPI, web_app_host: str):
+    api.add_middleware(CORSMiddleware,
+                       allow_origins=[web_app_host,
+                                      'http://localhost:3000',
+                                      'http://127.0.0.1:3000'],
+                       allow_credentials=True,
+                       allow_methods=['*'],
+                       allow_headers=['*'])
@@ -4,12 +4,17 @@ from contextlib import asynccontextmanager
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Depends
 
+from backend.modules.api.auxiliary.dependencies import set_operation_scope
+from backend.modules.api.auxiliary.middlewares import add_cors_middleware
+from backend.modules.api.routes.internal.metrics import metrics_api_router, METRICS_API_KEY
 from backend.modules.api.routes.public.general import general_api_router
 from backend.modules.app.core import AppCore
+from backend.modules.db.async_db_engine import AsyncDBEngine
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
 from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.models import Keys, COLLECTION_INDEXES
 from backend.modules.db.mongo_engine import MongoEngine
 from backend.modules.tools import sprint, Colors
 
@@ -37,14 +42,25 @@ async def lifespan(app: FastAPI):
         dev_mode = True
 
     app.mongo_engine = MongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD, marker=marker)
+    app.mongo_engine.ensure_indexes(db=Keys.mv_box_playlists_db, indexes=COLLECTION_INDEXES)
     app.db_engine = DBEngine(db_engine=app.mongo_engine)
+    app.db_engine.compact_top_playlists_snapshots()
     app.app_core = AppCore(db_engine=app.db_engine, dev_mode=dev_mode)
+    app.playlist_ingestion = app.app_core.playlist_ingestion
+    app.async_mongo_engine = AsyncMongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD,
+                                              marker=marker, metrics=app.mongo_engine.metrics)
+    app.async_db_engine = AsyncDBEngine(db_engine=app.async_mongo_engine, sync_engine=app.db_engine)
 
     public_routes_prefix = '/public'
-    app.include_router(general_api_router, prefix=public_routes_prefix)
+    app.include_router(general_api_router, prefix=public_routes_prefix,
+                       dependencies=[Depends(set_operation_scope)])
+    if dev_mode or METRICS_API_KEY:
+        app.include_router(metrics_api_router, prefix='/internal')
 
     yield
 
+    app.async_mongo_engine.__del__()
+    app.db_engine.__del__()
     app.mongo_engine.__del__()
     app.app_core.__del__()
 
@@ -62,13 +78,7 @@ api = FastAPI(title='MV Box Playlists API',
               lifespan=lifespan,
               docs_url=docs_url,
               redoc_url=redoc_url)
-api.add_middleware(CORSMiddleware,
-                   allow_origins=[WEB_APP_HOST,
-                                  'http://localhost:3000',
-                                  'http://127.0.0.1:3000'],
-                   allow_credentials=True,
-                   allow_methods=['*'],
-                   allow_headers=['*'])
+add_cors_middleware(api=api, web_app_host=WEB_APP_HOST)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,32 @@
+import hmac
+import os
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi import status as http_status
+
+from backend.modules.api.auxiliary.dependencies import OperationMetricsDep
+from backend.modules.db.instrumentation import MetricsSnapshot
+
+load_dotenv()
+
+METRICS_API_KEY = os.getenv('METRICS_API_KEY')
+
+
+def verify_metrics_key(x_metrics_key: str = Header(default=None)):
+    if METRICS_API_KEY and not hmac.compare_digest(x_metrics_key or '', METRICS_API_KEY):
+        raise HTTPException(http_status.HTTP_403_FORBIDDEN, 'Invalid metrics key')
+
+
+metrics_api_router = APIRouter(prefix='/metrics', tags=['metrics'], dependencies=[Depends(verify_metrics_key)])
+
+
+@metrics_api_router.get('/db', response_model=MetricsSnapshot)
+def metrics_get_db_operations(metrics: OperationMetricsDep):
+    return metrics.snapshot()
+
+
+@metrics_api_router.delete('/db')
+def metrics_reset_db_operations(metrics: OperationMetricsDep):
+    metrics.reset()
+    return {'details': 'ok'}
@@ -1,17 +1,23 @@
-import random
 from datetime import timedelta
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi import status as http_status
 from pydantic import BaseModel
 
-from backend.modules.api.auxiliary.dependencies import DBEngineDep, AppCoreDep
-from backend.modules.db.models import InfoTypes, JoinMember, Platforms
+from backend.modules.api.auxiliary.dependencies import AsyncDBEngineDep, PlaylistIngestionDep
+from backend.modules.api.auxiliary.etags import get_etag, is_not_modified, not_modified, get_cache_headers
+from backend.modules.db.leaderboard import LeaderboardPage
+from backend.modules.db.models import InfoTypes, JoinMember, Platforms, Playlist, IngestionJob, IngestionStatus
+from backend.modules.db.track_sampler import TrackSampler, CursorExpired
 from backend.modules.tools import try_extract, validate_email_format, extract_spotify_id_from_urs, base62_validator, \
     get_spotify_playlist_url, get_spotify_track_url
 
 general_api_router = APIRouter(prefix='/general', tags=['general'])
 
+LANDING_STATS_CACHE_CONTROL = 'no-cache'
+LEADERBOARD_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=300'
+CATALOG_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=3600'
+
 
 class TopPlaylist(BaseModel):
     token: str
@@ -27,6 +33,7 @@ class TopPlaylist(BaseModel):
 class TopPlaylistsResponse(BaseModel):
     offset: int
     next_offset: int | None
+    next_cursor: str | None = None
     count: int
     playlists: list[TopPlaylist]
 
@@ -46,6 +53,8 @@ class MVTrack(BaseModel):
 class MVTracksResponse(BaseModel):
     offset: int
     next_offset: int | None
+    next_cursor: str | None = None
+    seed: int | None = None
     count: int
     tracks: list[MVTrack]
 
@@ -56,117 +65,184 @@ class LandingStatsResponse(BaseModel):
     view_count: int
 
 
+class PlaylistHistoryEntry(BaseModel):
+    timestamp: int
+    rank: int
+    follower_count: int
+    mv_track_count: int
+
+
+class PlaylistHistoryResponse(BaseModel):
+    playlist_token: str
+    history: list[PlaylistHistoryEntry]
+
+
 class TrackPlaylistResponse(BaseModel):
     playlist: TopPlaylist
     playlist_rank: int
 
 
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: IngestionStatus
+    result: TrackPlaylistResponse | None = None
+    error: str | None = None
+
+
 @general_api_router.get('/info/landing_stats', response_model=LandingStatsResponse)
-def general_info_get_landing_stats(db: DBEngineDep):
-    data = db.get_info(InfoTypes.general)
+async def general_info_get_landing_stats(request: Request, response: Response, db: AsyncDBEngineDep):
+    data = await db.get_cached_info(InfoTypes.general)
+    db.view_counter.incr()
     next_snapshot_at = data.last_snapshot_timestamp + timedelta(seconds=data.snapshot_cycle)
-    db.incr_landing_page_view_count()
-    return LandingStatsResponse(next_snapshot_at=int(next_snapshot_at.timestamp()),
-                                network_coverage=data.network_coverage,
-                                view_count=data.landing_page_view_count)
+    stats = LandingStatsResponse(next_snapshot_at=int(next_snapshot_at.timestamp()),
+                                 network_coverage=data.network_coverage,
+                                 view_count=data.landing_page_view_count)
+    etag = get_etag(stats.model_dump_json().encode())
+    if is_not_modified(request=request, etag=etag):
+        return not_modified(etag=etag, cache_control=LANDING_STATS_CACHE_CONTROL)
+
+    response.headers.update(get_cache_headers(etag=etag, cache_control=LANDING_STATS_CACHE_CONTROL))
+    return stats
+
+
+def wrap_top_playlist(playlist: Playlist):
+    return TopPlaylist(token=playlist.token,
+                       name=playlist.name,
+                       platform=playlist.platform,
+                       platform_url=get_spotify_playlist_url(playlist_id=playlist.platform_id),
+                       image_url=playlist.image_path,
+                       follower_count=playlist.follower_count,
+                       mv_track_count=playlist.mv_track_count,
+                       sponsored=playlist.sponsored)
+
+
+def render_top_playlists_page(page: LeaderboardPage):
+    response = TopPlaylistsResponse(offset=page.offset, next_offset=page.next_offset,
+                                    next_cursor=page.next_cursor, count=len(page.playlists),
+                                    playlists=[wrap_top_playlist(playlist) for playlist in page.playlists])
+    return response.model_dump_json().encode()
 
 
 @general_api_router.get('/playlists/top_playlists', response_model=TopPlaylistsResponse)
-def general_playlists_get_top_playlists(db: DBEngineDep, offset: int = 0):
+async def general_playlists_get_top_playlists(request: Request, db: AsyncDBEngineDep, offset: int = 0,
+                                              cursor: str = None):
     if offset < 0:
         raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid offset')
 
-    limit = 11
-    next_offset = None
-    playlists = db.get_top_playlists(offset=offset, limit=limit)
-    sponsored_playlists = db.get_sponsored_playlists(offset=offset, limit=limit - 1)
-    if len(playlists) == limit:
-        next_offset = offset + limit - 1
-        playlists.pop()
-
-    sponsor_idx = -2
-    for spl in sponsored_playlists:
-        sponsor_idx += 3
-        playlists.insert(sponsor_idx, spl)
-
-    wrapped_playlists = [TopPlaylist(token=playlist.token,
-                                     name=playlist.name,
-                                     platform=playlist.platform,
-                                     platform_url=get_spotify_playlist_url(playlist_id=playlist.platform_id),
-                                     image_url=playlist.image_path,
-                                     follower_count=playlist.follower_count,
-                                     mv_track_count=playlist.mv_track_count,
-                                     sponsored=playlist.sponsored) for playlist in playlists]
-
-    return TopPlaylistsResponse(offset=offset, next_offset=next_offset,
-                                count=len(playlists), playlists=wrapped_playlists)
-
-
-@general_api_router.post('/playlists/track_playlist', response_model=TrackPlaylistResponse)
-def general_playlists_track_playlist(playlist_url: str, db: DBEngineDep, app_core: AppCoreDep):
+    await db.ensure_leaderboard()
+    try:
+        content = db.leaderboard.get_rendered_page(offset=offset, cursor=cursor, render=render_top_playlists_page)
+    except ValueError:
+        raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid cursor')
+    etag = get_etag(content)
+    if is_not_modified(request=request, etag=etag):
+        return not_modified(etag=etag, cache_control=LEADERBOARD_CACHE_CONTROL)
+    return Response(content=content, media_type='application/json',
+                    headers=get_cache_headers(etag=etag, cache_control=LEADERBOARD_CACHE_CONTROL))
+
+
+async def wrap_ingestion_job(job: IngestionJob, db: AsyncDBEngineDep):
+    response = IngestionJobResponse(job_id=job.token, status=job.status, error=job.error)
+    if job.status is IngestionStatus.done and (playlist := await db.get_playlist(playlist_token=job.playlist_token)):
+        response.result = TrackPlaylistResponse(playlist=wrap_top_playlist(playlist),
+                                                playlist_rank=await db.get_playlist_rank(playlist_token=playlist.token))
+    return response
+
+
+@general_api_router.post('/playlists/track_playlist', response_model=IngestionJobResponse,
+                         status_code=http_status.HTTP_202_ACCEPTED)
+async def general_playlists_track_playlist(playlist_url: str, db: AsyncDBEngineDep,
+                                           playlist_ingestion: PlaylistIngestionDep):
     spotify_id = extract_spotify_id_from_urs(url=playlist_url)
     if not spotify_id or not base62_validator(data=spotify_id):
         raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid url')
 
-    if db.check_playlist_existence(platform_id=spotify_id, platform=Platforms.spotify):
+    if await db.check_playlist_existence(platform_id=spotify_id, platform=Platforms.spotify):
         raise HTTPException(http_status.HTTP_403_FORBIDDEN, 'Playlist already exists')
 
-    try:
-        new_playlist = app_core.track_new_playlist(platform_id=spotify_id, platform=Platforms.spotify)
-    except:
-        raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid url')
+    job = await db.enqueue_ingestion_job(platform_id=spotify_id, platform=Platforms.spotify)
+    if playlist_ingestion is not None:
+        playlist_ingestion.notify()
+    return await wrap_ingestion_job(job=job, db=db)
+
 
-    playlist_rank = db.get_playlist_rank(playlist_token=new_playlist.token)
-    return TrackPlaylistResponse(playlist=TopPlaylist(token=new_playlist.token,
-                                                      name=new_playlist.name,
-                                                      platform=new_playlist.platform,
-                                                      platform_url=get_spotify_playlist_url(new_playlist.platform_id),
-                                                      image_url=new_playlist.image_path,
-                                                      follower_count=new_playlist.follower_count,
-                                                      mv_track_count=new_playlist.mv_track_count,
-                                                      sponsored=new_playlist.sponsored),
-                                 playlist_rank=playlist_rank)
+@general_api_router.get('/playlists/track_playlist/{job_id}', response_model=IngestionJobResponse)
+async def general_playlists_get_track_playlist_job(job_id: str, db: AsyncDBEngineDep):
+    if not (job := await db.get_ingestion_job(job_token=job_id)):
+        raise HTTPException(http_status.HTTP_404_NOT_FOUND, 'Job not found')
+    return await wrap_ingestion_job(job=job, db=db)
+
+
+@general_api_router.get('/playlists/history', response_model=PlaylistHistoryResponse)
+async def general_playlists_get_history(playlist_token: str, db: AsyncDBEngineDep, limit: int = 52):
+    if not 0 < limit <= 520:
+        raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid limit')
+
+    points = await db.get_playlist_history(playlist_token=playlist_token, limit=limit)
+    history = [PlaylistHistoryEntry(timestamp=int(point.timestamp.timestamp()), rank=point.rank,
+                                    follower_count=point.follower_count, mv_track_count=point.mv_track_count)
+               for point in points]
+    return PlaylistHistoryResponse(playlist_token=playlist_token, history=history)
 
 
 @general_api_router.get('/tracks/mv_tracks', response_model=MVTracksResponse)
-def general_tracks_get_mv_tracks(db: DBEngineDep, offset: int = 0, shuffle: bool = True):
+async def general_tracks_get_mv_tracks(request: Request, response: Response, db: AsyncDBEngineDep, offset: int = 0,
+                                       cursor: str = None, shuffle: bool = None, seed: int = None):
     if offset < 0:
         raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid offset')
+    if seed is not None and not 0 <= seed < TrackSampler.seed_limit:
+        raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid seed')
+    if shuffle is None:
+        shuffle = seed is not None
 
+    cacheable = not shuffle or seed is not None or cursor is not None
     limit = 11
     next_offset = None
-    tracks = db.get_mv_tracks(offset=offset, limit=limit)
-    if len(tracks) == limit:
-        next_offset = offset + limit - 1
+    next_cursor = None
+    try:
+        if shuffle:
+            page, tracks = await db.sample_mv_track_records(seed=seed, offset=offset, limit=limit - 1, cursor=cursor)
+            offset, next_offset, next_cursor, seed = page.offset, page.next_offset, page.next_cursor, page.seed
+        else:
+            tracks = await db.get_mv_track_records(offset=offset, limit=limit, cursor=cursor)
+    except CursorExpired:
+        raise HTTPException(http_status.HTTP_410_GONE, 'Cursor expired')
+    except ValueError:
+        raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid cursor')
+    if not shuffle and len(tracks) == limit:
         tracks.pop()
-
-    artist_tokens = [track.artist_token for track in tracks]
-    artists = db.get_artists(artist_tokens)
-    artists = {artist.token: artist for artist in artists}
+        next_offset = offset + limit - 1 if cursor is None else None
+        next_cursor = db.get_track_cursor(tracks[-1])
 
     mv_tracks = []
     for track in tracks:
-        mv_tracks.append(MVTrack(title=track.name,
-                                 artist_name=try_extract(lambda: artists[track.artist_token].name),
+        mv_tracks.append(MVTrack(title=track.name, artist_name=track.artist_name,
                                  image_url=track.image_path, sources=[MVTrackSource(platform=source.platform,
                                                                                     platform_url=get_spotify_track_url(source.platform_id))
                                                                       for source in track.sources]))
-    if shuffle:
-        random.shuffle(mv_tracks)
-    return MVTracksResponse(offset=offset, next_offset=next_offset,
-                            count=len(tracks), tracks=mv_tracks)
+    tracks_response = MVTracksResponse(offset=offset, next_offset=next_offset, next_cursor=next_cursor,
+                                       seed=seed if shuffle else None, count=len(tracks), tracks=mv_tracks)
+    if not cacheable:
+        response.headers['Cache-Control'] = 'no-store'
+        return tracks_response
+
+    etag = get_etag(tracks_response.model_dump_json().encode())
+    if is_not_modified(request=request, etag=etag):
+        return not_modified(etag=etag, cache_control=CATALOG_CACHE_CONTROL)
+    response.headers.update(get_cache_headers(etag=etag, cache_control=CATALOG_CACHE_CONTROL))
+    return tracks_response
 
 
 @general_api_router.post('/members/join')
-def general_members_join(body: JoinMember, db: DBEngineDep):
+async def general_members_join(body: JoinMember, db: AsyncDBEngineDep):
     # TODO add request limit
     if not validate_email_format(email=body.email):
         raise HTTPException(http_status.HTTP_400_BAD_REQUEST, 'Invalid email')
 
-    if not db.add_join_member(member=body):
-        member = db.get_join_members(target={'email': body.email})[0]
+    if not await db.add_join_member(member=body):
+        member = (await db.get_join_members(target={'email': body.email}))[0]
         if member.signed_up:
             raise HTTPException(http_status.HTTP_403_FORBIDDEN, 'Member already exists')
-        db.sign_up_member(token=member.token)
+        await db.sign_up_member(token=member.token)
     return {'details': 'ok'}
 
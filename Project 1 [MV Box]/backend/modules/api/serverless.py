@@ -0,0 +1,99 @@
+import os
+import time
+from functools import cached_property
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Depends
+from mangum import Mangum
+
+from backend.modules.api.auxiliary.dependencies import set_operation_scope
+from backend.modules.api.auxiliary.middlewares import add_cors_middleware
+from backend.modules.api.routes.internal.metrics import metrics_api_router, METRICS_API_KEY
+from backend.modules.api.routes.public.general import general_api_router
+from backend.modules.db.async_db_engine import AsyncDBEngine
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.mongo_engine import MongoEngine
+from backend.modules.tools import sprint, Colors
+
+load_dotenv()
+
+MONGO_URL = os.getenv('MONGO_URL')
+MONGO_HOST = os.getenv('MONGO_HOST')
+MONGO_USER = os.getenv('MONGO_USER')
+MONGO_PASSWORD = os.getenv('MONGO_PASSWORD')
+
+BUILD_TYPE = os.getenv('BUILD_TYPE', 'PRODUCTION')
+WEB_APP_HOST = os.getenv('WEB_APP_HOST', 'http://localhost:3000')
+SERVERLESS_CACHE_DIR = os.getenv('CACHE_DIR', '/tmp/mv_box')
+SERVERLESS_SPOTIFY_CACHE_PATH = os.getenv('SPOTIFY_CACHE_PATH', os.path.join(SERVERLESS_CACHE_DIR,
+                                                                              'spotify_cache.sqlite3'))
+
+MARKER = 'Serverless'
+
+
+class ServerlessAPI(FastAPI):
+    playlist_ingestion = None
+
+    @cached_property
+    def dev_mode(self):
+        return BUILD_TYPE == 'DEV'
+
+    @cached_property
+    def mongo_engine(self):
+        return MongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD,
+                           connection_url=MONGO_URL, marker=MARKER)
+
+    @cached_property
+    def db_engine(self):
+        return DBEngine(db_engine=self.mongo_engine)
+
+    @cached_property
+    def async_mongo_engine(self):
+        return AsyncMongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD,
+                                connection_url=MONGO_URL, marker=MARKER, metrics=self.mongo_engine.metrics)
+
+    @cached_property
+    def async_db_engine(self):
+        return AsyncDBEngine(db_engine=self.async_mongo_engine, sync_engine=self.db_engine)
+
+    @cached_property
+    def app_core(self):
+        from backend.modules.app.core import AppCore
+
+        return AppCore(db_engine=self.db_engine, dev_mode=self.dev_mode, ingestion_workers=0,
+                       spotify_cache_path=SERVERLESS_SPOTIFY_CACHE_PATH, serverless=True)
+
+
+api = ServerlessAPI(title='MV Box Playlists API',
+                    version='0.0.1',
+                    docs_url='/docs' if BUILD_TYPE == 'DEV' else None,
+                    redoc_url='/redocs' if BUILD_TYPE == 'DEV' else None)
+add_cors_middleware(api=api, web_app_host=WEB_APP_HOST)
+api.include_router(general_api_router, prefix='/public', dependencies=[Depends(set_operation_scope)])
+if BUILD_TYPE == 'DEV' or METRICS_API_KEY:
+    api.include_router(metrics_api_router, prefix='/internal')
+
+http_handler = Mangum(api, lifespan='off')
+
+
+def run_job(job: str):
+    start_time = time.perf_counter()
+    api.app_core.run_job(job=job)
+    elapsed = time.perf_counter() - start_time
+    sprint(f'[SERVERLESS] [{MARKER}] [JOB] [{job}] [{elapsed:.2f}s]', Colors.light_cyan)
+    return {'job': job, 'elapsed_ms': round(elapsed * 1000, 3)}
+
+
+def flush_counters():
+    if 'db_engine' in api.__dict__:
+        api.db_engine.view_counter.flush()
+
+
+def handler(event: dict, context: object):
+    if 'job' in event:
+        return run_job(job=event['job'])
+    try:
+        return http_handler(event, context)
+    finally:
+        flush_counters()
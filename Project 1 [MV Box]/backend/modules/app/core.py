@@ -1,120 +1,267 @@
+import functools
 import os
 import random
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
+from threading import Lock
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
+from backend.modules.app.ingestion import PlaylistIngestion
+from backend.modules.app.job_leases import JobLeases
+from backend.modules.app.playlist_tracking import PlaylistTrace, PlaylistTracking
+from backend.modules.app.refresh_engine import PlaylistRefreshEngine, RefreshEvents, check_refresh_deadline
+from backend.modules.app.refresh_scheduler import RefreshScheduler
+from backend.modules.app.spotify_cache import PersistentCache, CachedSpotifyController
+from backend.modules.db.bulk_writer import BulkWriter
 from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.instrumentation import scoped
 from backend.modules.db.models import ConfigTypes, Platforms, Playlist, SpotifyUser, Track, Artist, ArtistSource, \
-    TrackSource, SenderSlugs, InfoTypes
-from backend.modules.email_service.engine import MailGunEngine
-from backend.modules.email_service.templates import EmailPlaylistModel, TopPlaylistsEmailModel, TemplateEngine
+    TrackSource, SenderSlugs, InfoTypes, JoinMember
 from backend.modules.platforms.spotify.controller import SpotifyController
 from backend.modules.platforms.spotify.models import SpotifyTrack
-from backend.modules.tools import sprint, Colors, hour_rounder, CronThread, try_extract, slice_format, \
-    get_spotify_playlist_url, format_number, group_into_bunches
+from backend.modules.tools import sprint, Colors, hour_rounder, CronThread, CronScheduler, try_extract, slice_format, \
+    get_spotify_playlist_url, format_number, group_into_bunches, TokenBucket
 
 load_dotenv()
 
 MAILGUN_API_KEY = os.environ['MAILGUN_API_KEY']
 WEB_APP_HOST = os.environ['WEB_APP_HOST']
-
-
-class PlaylistTrace(BaseModel):
-    playlist_token: str
-    platform: Platforms
-    platform_id: str
-    mv_track_count: int
-    follower_count: int
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'mv_box'))
+SPOTIFY_CACHE_PATH = os.getenv('SPOTIFY_CACHE_PATH', os.path.join(CACHE_DIR, 'spotify_cache.sqlite3'))
 
 
 class TrackWhitelist(BaseModel):
-    spotify_id_list: list[str] = []
-
-
-class PlaylistTracking(BaseModel):
-    available_slot_idx: int = 0
-    slots: tuple[list[PlaylistTrace]] = tuple([] for _ in range(24))
+    spotify_ids: set[str] = set()
+    version: int | None = None
 
 
 class AppCore:
-    def __init__(self, db_engine: DBEngine, dev_mode: bool = False, verbose: bool = True):
+    spotify_calls_per_refresh = 2
+    playlist_tracking_fields = ['platform', 'platform_id', 'mv_track_count', 'follower_count', 'snapshot_id',
+                                'whitelist_version']
+    playlist_sync_lookback = timedelta(minutes=10)
+
+    def __init__(self, db_engine: DBEngine, dev_mode: bool = False, verbose: bool = True,
+                 tracking_workers: int = 8, spotify_rate_limit: float = 10,
+                 playlist_timeout: timedelta = timedelta(seconds=60), emailing_workers: int = 4,
+                 emailing_rate_limit: float = 5, emailing_page_size: int = 500, emailing_batch_size: int = 5,
+                 ingestion_workers: int = 2, spotify_hourly_budget: int = 6000,
+                 spotify_cache_path: str = SPOTIFY_CACHE_PATH, job_lease_ttl: timedelta = timedelta(seconds=60),
+                 spotify_controller: SpotifyController = None, serverless: bool = False):
         self.db_engine = db_engine
         self.verbose = verbose
         self.dev_mode = dev_mode
-        self.spotify_config = self.db_engine.get_config(config_type=ConfigTypes.spotify)
-        self.spotify_controller = SpotifyController(client_id=self.spotify_config.client_id,
-                                                    client_secret=self.spotify_config.client_secret)
+        self.serverless = serverless
+        self.emailing_workers = emailing_workers
+        self.emailing_rate_limit = emailing_rate_limit
+        self.emailing_page_size = emailing_page_size
+        self.emailing_batch_size = emailing_batch_size
+        self._spotify_controller = spotify_controller
+        self.spotify_controller_lock = Lock()
+        self.spotify_rate_limiter = TokenBucket(rate=spotify_rate_limit)
+        self.spotify_cache = PersistentCache(path=spotify_cache_path, marker='spotify_cache', verbose=verbose)
+        self.playlist_refresh_engine = PlaylistRefreshEngine(target=self._refresh_playlist,
+                                                             workers=tracking_workers,
+                                                             playlist_timeout=playlist_timeout,
+                                                             marker='playlist_tracking', verbose=verbose)
         self.playlist_tracking = PlaylistTracking()
+        self.refresh_scheduler = RefreshScheduler(hourly_budget=spotify_hourly_budget // self.spotify_calls_per_refresh)
+        self.track_whitelist = TrackWhitelist()
+        self.last_playlist_token = None
 
-        self._init_playlist_tracking()
+        if not self.serverless:
+            self._init_track_whitelist()
+            self._init_refresh_scheduler()
+            self._init_playlist_tracking()
+
+        self.playlist_ingestion = PlaylistIngestion(db_engine=self.db_engine, target=self._ingest_playlist,
+                                                    workers=ingestion_workers, marker='playlist_ingestion',
+                                                    verbose=verbose)
 
+        self.job_leases = None
         if not self.dev_mode:
+            self.job_leases = JobLeases(db_engine=self.db_engine, ttl=job_lease_ttl, marker='app_core',
+                                        verbose=verbose)
+        self.jobs = {'playlist_tracking': self._get_cron_target(job='playlist_tracking',
+                                                                target=self._leader_playlist_tracking_job,
+                                                                on_acquire=self._init_leader_state),
+                     'update_stats': self._get_cron_target(job='update_stats', target=self._update_stats_job),
+                     'top_playlists_emailing': self._get_cron_target(job='top_playlists_emailing',
+                                                                     target=self._top_playlists_emailing_job),
+                     'top_playlists_snapshot': self._get_cron_target(job='top_playlists_snapshot',
+                                                                     target=self._top_playlists_snapshots_job),
+                     'playlist_ingestion': scoped('playlist_ingestion', self._playlist_ingestion_job)}
+
+        if not self.dev_mode and not self.serverless:
             per_hour = hour_rounder(datetime.now(timezone.utc))
             per_hour += timedelta(hours=1) if per_hour < datetime.now(timezone.utc) else timedelta()
+            self.cron_scheduler = CronScheduler(workers=4, marker='app_core', silent_mode=not verbose)
             self.playlist_tracking_thread = CronThread(start_time=per_hour, recall_time=timedelta(hours=1),
-                                                       target=self._playlist_tracking_job,
-                                                       marker='playlist_tracking_thread')
+                                                       target=self.jobs['playlist_tracking'],
+                                                       marker='playlist_tracking_thread',
+                                                       scheduler=self.cron_scheduler)
 
             self.update_stats_thread = CronThread(start_time=per_hour, recall_time=timedelta(hours=1),
-                                                  target=self._update_stats_job,
-                                                  marker='update_stats_thread')
+                                                  target=self.jobs['update_stats'],
+                                                  marker='update_stats_thread',
+                                                  scheduler=self.cron_scheduler)
 
             self.top_playlists_emailing_thread = CronThread(start_time=per_hour + timedelta(minutes=5),
                                                             recall_time=timedelta(hours=1),
-                                                            target=self._top_playlists_emailing_job,
-                                                            marker='top_playlists_emailing_job_thread')
+                                                            target=self.jobs['top_playlists_emailing'],
+                                                            marker='top_playlists_emailing_job_thread',
+                                                            scheduler=self.cron_scheduler)
 
             general_info = self.db_engine.get_info(info_type=InfoTypes.general)
             next_top_time = general_info.last_snapshot_timestamp.replace(tzinfo=timezone.utc) + timedelta(seconds=general_info.snapshot_cycle)
             self.top_playlists_snapshot_thread = CronThread(start_time=next_top_time,
                                                             recall_time=timedelta(seconds=general_info.snapshot_cycle),
-                                                            target=self._top_playlists_snapshots_job,
-                                                            marker='weekly_playlist_top_job')
+                                                            target=self.jobs['top_playlists_snapshot'],
+                                                            marker='weekly_playlist_top_job',
+                                                            scheduler=self.cron_scheduler)
 
     def __del__(self):
-        self.spotify_controller.__del__()
-        if not self.dev_mode:
+        if self._spotify_controller is not None:
+            self._spotify_controller.__del__()
+        self.spotify_cache.__del__()
+        self.playlist_refresh_engine.__del__()
+        self.playlist_ingestion.__del__()
+        if not self.dev_mode and not self.serverless:
             self.playlist_tracking_thread.__del__()
             self.top_playlists_emailing_thread.__del__()
             self.top_playlists_snapshot_thread.__del__()
             self.update_stats_thread.__del__()
+            self.cron_scheduler.__del__()
+        if self.job_leases is not None:
+            self.job_leases.__del__()
+
+    @property
+    def spotify_controller(self):
+        with self.spotify_controller_lock:
+            if self._spotify_controller is None:
+                spotify_config = self.db_engine.get_config(config_type=ConfigTypes.spotify)
+                self._spotify_controller = SpotifyController(client_id=spotify_config.client_id,
+                                                             client_secret=spotify_config.client_secret)
+            return self._spotify_controller
+
+    @functools.cached_property
+    def spotify_lookup(self):
+        return CachedSpotifyController(controller=self.spotify_controller, cache=self.spotify_cache,
+                                       rate_limiter=self.spotify_rate_limiter, models={'track': SpotifyTrack})
+
+    def run_job(self, job: str):
+        if job not in self.jobs:
+            raise ValueError(f'Unknown job [{job}]')
+        return self.jobs[job]()
+
+    def _init_track_whitelist(self):
+        version = self.db_engine.get_whitelist_version()
+        spotify_ids = self.db_engine.get_mv_track_ids(platform=Platforms.spotify)
+        self.track_whitelist.spotify_ids = set(spotify_ids)
+        self.track_whitelist.version = version
+        if self.verbose:
+            sprint(f'[TRACK_WHITELIST] [LOADED] [{len(self.track_whitelist.spotify_ids)}]', Colors.light_green)
 
-    def _init_playlist_tracking(self):
-        playlists = self.db_engine.get_top_playlists()
-        playlists += self.db_engine.get_sponsored_playlists()
+    def _init_refresh_scheduler(self):
+        schedules = self.db_engine.get_playlist_schedules()
+        self.refresh_scheduler.load(schedules=schedules)
+        if self.verbose:
+            sprint(f'[REFRESH_SCHEDULER] [LOADED] [{len(schedules)}]', Colors.light_green)
+
+    def _sync_track_whitelist(self):
+        if self.track_whitelist.version is None or \
+                self.db_engine.get_whitelist_version() != self.track_whitelist.version:
+            self._init_track_whitelist()
+
+    def _track_playlists(self, playlists: list):
         for playlist in playlists:
             trace = PlaylistTrace(playlist_token=playlist.token,
                                   platform=playlist.platform,
                                   platform_id=playlist.platform_id,
                                   mv_track_count=playlist.mv_track_count,
-                                  follower_count=playlist.follower_count)
+                                  follower_count=playlist.follower_count,
+                                  snapshot_id=playlist.snapshot_id,
+                                  whitelist_version=playlist.whitelist_version)
             self._track_playlist(playlist=trace)
+            if self.last_playlist_token is None or playlist.token > self.last_playlist_token:
+                self.last_playlist_token = playlist.token
+
+    def _init_playlist_tracking(self):
+        fields = self.playlist_tracking_fields
+        playlists = self.db_engine.get_top_playlists(trusted=True, fields=fields)
+        playlists += self.db_engine.get_sponsored_playlists(trusted=True, fields=fields)
+        self._track_playlists(playlists=playlists)
         if self.verbose:
             sprint(f'[PLAYLIST_TRACKING] [LOADED] [{len(playlists)}]', Colors.light_green)
 
+    def _sync_playlist_tracking(self):
+        if self.last_playlist_token is None:
+            return self._init_playlist_tracking()
+        lookback_ms = int(self.playlist_sync_lookback.total_seconds() * 1000)
+        timestamp = try_extract(lambda: int(self.last_playlist_token[:12], 16), default_value=0)
+        since_token = f'{max(timestamp - lookback_ms, 0):012x}'
+        playlists = [playlist for playlist in self.db_engine.get_competing_playlists_after(
+            playlist_token=since_token, trusted=True, fields=self.playlist_tracking_fields)
+                     if playlist.token not in self.playlist_tracking]
+        self._track_playlists(playlists=playlists)
+        if self.verbose and playlists:
+            sprint(f'[PLAYLIST_TRACKING] [SYNCED] [{len(playlists)}]', Colors.light_green)
+
+    def _init_leader_state(self):
+        self._init_refresh_scheduler()
+        self._init_track_whitelist()
+        self._init_playlist_tracking()
+
     def _update_playlist_trace(self, trace: PlaylistTrace):
-        for s_idx, slot in enumerate(self.playlist_tracking.slots):
-            for p_idx, playlist in enumerate(slot):
-                if playlist.playlist_token == trace.playlist_token:
-                    self.playlist_tracking.slots[s_idx][p_idx] = trace
-                    return True
-        return False
+        return self.playlist_tracking.update(trace=trace)
 
     def _update_stats_job(self):
         member_count = self.db_engine.get_join_members_count()
         self.db_engine.update_general_info(network_coverage=member_count)
 
-    def _track_playlist(self, playlist: PlaylistTrace):
-        idx = self.playlist_tracking.available_slot_idx
-        self.playlist_tracking.slots[idx].append(playlist)
-        self.playlist_tracking.available_slot_idx = idx + 1 if idx < 23 else 0
+    def _track_playlist(self, playlist: PlaylistTrace, next_refresh_at: datetime = None):
+        self.refresh_scheduler.add(playlist_token=playlist.playlist_token, now=datetime.now(timezone.utc),
+                                   next_refresh_at=next_refresh_at)
+        return self.playlist_tracking.track(trace=playlist)
+
+    # Returns RefreshEvents.tracks_skipped when the playlist snapshot and whitelist version were unchanged and the
+    # track download was skipped, None otherwise
+    def _refresh_playlist(self, playlist: PlaylistTrace, batch: BulkWriter = None):
+        counts = (playlist.mv_track_count, playlist.follower_count)
+        tracks_key = (playlist.snapshot_id, playlist.whitelist_version)
+        playlist = self.check_playlist(playlist=playlist, batch=batch)
+        changed = counts != (playlist.mv_track_count, playlist.follower_count)
+        if schedule := self.refresh_scheduler.record(playlist_token=playlist.playlist_token, changed=changed,
+                                                     now=datetime.now(timezone.utc)):
+            self.db_engine.save_playlist_schedule(schedule=schedule, batch=batch)
+        if tracks_key[0] is not None and tracks_key == (playlist.snapshot_id, playlist.whitelist_version):
+            return RefreshEvents.tracks_skipped
 
     def _playlist_tracking_job(self):
-        current_hour = datetime.now(timezone.utc).hour
-        for playlist in self.playlist_tracking.slots[current_hour]:
-            self.check_playlist(playlist=playlist)
+        playlist_tokens = self.refresh_scheduler.due(now=datetime.now(timezone.utc))
+        playlists = [trace for token in playlist_tokens if (trace := self.playlist_tracking.get(token)) is not None]
+        with self.db_engine.bulk_writer(marker='playlist_tracking', verbose=self.verbose) as batch:
+            return self.playlist_refresh_engine.run(playlists=playlists, batch=batch)
+
+    def _get_cron_target(self, job: str, target: object, on_acquire: object = None):
+        if self.job_leases is None:
+            return scoped(job, target)
+        return scoped(job, self.job_leases.leased(job=job, target=target, on_acquire=on_acquire))
+
+    def _leader_playlist_tracking_job(self):
+        if not self.refresh_scheduler:
+            self._init_leader_state()
+        else:
+            self._sync_track_whitelist()
+            self._sync_playlist_tracking()
+        return self._playlist_tracking_job()
+
+    def _playlist_ingestion_job(self):
+        self._sync_track_whitelist()
+        return self.playlist_ingestion.drain()
 
     def _top_playlists_snapshots_job(self):
         top_playlists = self.db_engine.get_top_playlists(limit=10)
@@ -132,7 +279,11 @@ class AppCore:
         self.db_engine.set_last_snapshot_timestamp(date=hour_rounder(datetime.now(timezone.utc)))
 
     def _top_playlists_emailing_job(self):
-        snapshot = self.db_engine.get_top_playlists_snapshots(limit=1)[0]
+        from backend.modules.email_service.engine import MailGunEngine
+        from backend.modules.email_service.templates import EmailPlaylistModel, TopPlaylistsEmailModel, \
+            TemplateEngine
+
+        snapshot = self.db_engine.get_latest_top_playlists_snapshot()
         top_playlists = snapshot.top_playlists
 
         formatted_top_playlists = [EmailPlaylistModel(name=slice_format(text=pl.name, max_length=20),
@@ -153,47 +304,90 @@ class AppCore:
         mailgun = MailGunEngine(api_key=MAILGUN_API_KEY)
         email_user = self.db_engine.get_email_user(sender=SenderSlugs.community_team)
 
-        active_members = self.db_engine.get_join_members(target={'news_subscription': True}, limit=5)
-
-        members_batches = group_into_bunches(data=active_members, bunch_size=5)
+        target = {'news_subscription': True,
+                  '$or': [{'last_sent_news_date': None},
+                          {'last_sent_news_date': {'$lt': snapshot.timestamp}}]}
+        rate_limiter = TokenBucket(rate=self.emailing_rate_limit)
 
-        for batch in members_batches:
-            template = TemplateEngine.top_playlists(recipient_email=[member.email for member in batch], data=context,
-                                                    email_user=email_user)
+        def send_batch(batch: list[JoinMember]):
+            template = TemplateEngine.top_playlists(recipient_email=[member.email for member in batch],
+                                                    data=context, email_user=email_user)
+            rate_limiter.acquire()
             mailgun.send_email(template=template)
-            if self.verbose:
-                sprint(f'[EMAILING] [WEEKLY TOP] [SENT] [{len(batch)}]', Colors.light_cyan)
-            for member in batch:
-                self.db_engine.update_join_member(token=member.token, last_sent_news_date=datetime.now(timezone.utc))
+            return batch
+
+        sent_count = 0
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=self.emailing_workers, thread_name_prefix='emailing') as executor:
+            for page in self.db_engine.iter_join_members(target=target, page_size=self.emailing_page_size,
+                                                             trusted=True, fields=['email']):
+                futures = [executor.submit(send_batch, batch)
+                           for batch in group_into_bunches(data=page, bunch_size=self.emailing_batch_size)]
+                for future in as_completed(futures):
+                    try:
+                        batch = future.result()
+                    except:
+                        failed_count += 1
+                        sprint('[EMAILING] [WEEKLY TOP] [FAILED]', Colors.light_red)
+                        print(traceback.format_exc())
+                        continue
+
+                    self.db_engine.update_join_members(tokens=[member.token for member in batch],
+                                                       last_sent_news_date=datetime.now(timezone.utc))
+                    sent_count += len(batch)
+                    if self.verbose:
+                        sprint(f'[EMAILING] [WEEKLY TOP] [SENT] [{len(batch)}]', Colors.light_cyan)
 
-    def check_playlist(self, playlist: PlaylistTrace):
+        if self.verbose:
+            sprint(f'[EMAILING] [WEEKLY TOP] [DONE] [SENT {sent_count}] [FAILED BATCHES {failed_count}]',
+                   Colors.light_green)
+
+    def check_playlist(self, playlist: PlaylistTrace, batch: BulkWriter = None):
         if playlist.platform is Platforms.spotify:
+            self.spotify_rate_limiter.acquire()
+            check_refresh_deadline()
             playlist_info = self.spotify_controller.get_playlist(spotify_id=playlist.platform_id)
-            tracks = self.spotify_controller.get_playlist_tracks(playlist_id=playlist.platform_id)
-            track_ids = [track.spotify_id for track in tracks]
-
-            mv_tracks = self.db_engine.get_mv_tracks()
-            mv_tracks_ids = [track.sources[0].platform_id for track in mv_tracks]
-            whitelist_count = len(set(mv_tracks_ids) & set(track_ids))
+            snapshot_id = try_extract(lambda: playlist_info.snapshot_id)
+            whitelist_version = self.track_whitelist.version
 
             updated_mv_track_count = None
             updated_follower_count = None
-            if whitelist_count != playlist.mv_track_count:
-                updated_mv_track_count = whitelist_count
-                playlist.mv_track_count = whitelist_count
+            updated_snapshot_id = None
+            updated_whitelist_version = None
+            if (snapshot_id is None or snapshot_id != playlist.snapshot_id or
+                    whitelist_version != playlist.whitelist_version):
+                check_refresh_deadline()
+                self.spotify_rate_limiter.acquire()
+                check_refresh_deadline()
+                tracks = self.spotify_controller.get_playlist_tracks(playlist_id=playlist.platform_id)
+                track_ids = {track.spotify_id for track in tracks}
+                whitelist_count = len(self.track_whitelist.spotify_ids.intersection(track_ids))
+
+                if whitelist_count != playlist.mv_track_count:
+                    updated_mv_track_count = whitelist_count
+                    playlist.mv_track_count = whitelist_count
+                if snapshot_id is not None:
+                    updated_snapshot_id = snapshot_id
+                    playlist.snapshot_id = snapshot_id
+                    updated_whitelist_version = whitelist_version
+                    playlist.whitelist_version = whitelist_version
             if playlist_info.follower_count != playlist.follower_count:
                 updated_follower_count = playlist_info.follower_count
                 playlist.follower_count = playlist_info.follower_count
 
+            check_refresh_deadline()
             self.db_engine.update_playlist(playlist_token=playlist.playlist_token,
                                            mv_track_count=updated_mv_track_count,
-                                           follower_count=updated_follower_count)
+                                           follower_count=updated_follower_count,
+                                           snapshot_id=updated_snapshot_id,
+                                           whitelist_version=updated_whitelist_version,
+                                           batch=batch)
             self._update_playlist_trace(trace=playlist)
         return playlist
 
     def track_new_playlist(self, platform_id: str, platform: Platforms):
         if platform is Platforms.spotify:
-            playlist = self.spotify_controller.get_playlist(spotify_id=platform_id)
+            playlist = self.spotify_lookup.get_playlist(spotify_id=platform_id)
             new_user = SpotifyUser(name=playlist.owner.name,
                                    follower_count=playlist.owner.follower_count,
                                    spotify_id=playlist.owner.spotify_id)
@@ -217,21 +411,39 @@ class AppCore:
                                   platform_id=new_playlist.platform_id,
                                   mv_track_count=new_playlist.mv_track_count,
                                   follower_count=new_playlist.follower_count)
-            self._track_playlist(playlist=trace)
+            self._track_playlist(playlist=trace,
+                                 next_refresh_at=hour_rounder(datetime.now(timezone.utc)) + timedelta(hours=1))
             trace = self.check_playlist(playlist=trace)
 
             new_playlist.mv_track_count = trace.mv_track_count
             new_playlist.follower_count = trace.follower_count
+            new_playlist.snapshot_id = trace.snapshot_id
+            new_playlist.whitelist_version = trace.whitelist_version
         if self.verbose:
             sprint(f'[PLAYLIST_TRACKING] [NEW] [{platform.value.upper()}] [{platform_id}]', Colors.light_cyan)
         return new_playlist
 
+    def submit_playlist(self, platform_id: str, platform: Platforms):
+        job = self.db_engine.enqueue_ingestion_job(platform_id=platform_id, platform=platform)
+        self.playlist_ingestion.notify()
+        return job
+
+    def _ingest_playlist(self, platform_id: str, platform: Platforms):
+        if self.db_engine.check_playlist_existence(platform_id=platform_id, platform=platform):
+            raise Exception('Playlist already exists')
+        try:
+            return self.track_new_playlist(platform_id=platform_id, platform=platform)
+        except:
+            if self.verbose:
+                print(traceback.format_exc())
+            raise Exception('Invalid url')
+
     def add_track(self, platform_id: str, platform: Platforms):
         if platform is Platforms.spotify:
             if self.db_engine.check_track_existence(platform_id=platform_id, platform=platform):
                 raise Exception('Track already exists')
 
-            spotify_track: SpotifyTrack = try_extract(lambda: self.spotify_controller.get_tracks_info(track_ids=[platform_id])[0])
+            spotify_track: SpotifyTrack = try_extract(lambda: self.spotify_lookup.get_tracks_info(track_ids=[platform_id])[0])
             if not spotify_track:
                 raise Exception('Track not found')
 
@@ -251,6 +463,11 @@ class AppCore:
                           mv_pass=True)
 
             self.db_engine.add_track(track=track)
+            self.track_whitelist.spotify_ids.add(spotify_track.spotify_id)
+            version = self.track_whitelist.version
+            self.track_whitelist.version = self.db_engine.bump_whitelist_version()
+            if version is None or self.track_whitelist.version != version + 1:
+                self._init_track_whitelist()
             return track
         return None
         # TODO Todo check if a main object already exists for multiple platforms
@@ -0,0 +1,79 @@
+import traceback
+from datetime import timedelta
+from threading import Thread, Event
+
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.instrumentation import operation_scope
+from backend.modules.db.models import IngestionJob
+from backend.modules.tools import sprint, Colors
+
+
+class PlaylistIngestion:
+    def __init__(self, db_engine: DBEngine, target: object, workers: int = 2,
+                 poll_interval: timedelta = timedelta(seconds=5), stale_after: timedelta = timedelta(minutes=10),
+                 max_attempts: int = 3, marker: str = None, verbose: bool = True):
+        assert workers >= 0, 'The worker count must not be negative'
+        assert max_attempts > 0, 'The attempt limit must be greater than 0'
+
+        self.db_engine = db_engine
+        self.target = target
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.marker = marker
+        self.verbose = verbose
+
+        self.wakeup = Event()
+        self.stopped = Event()
+        self.threads = [Thread(target=self._worker, name=f'{marker or "playlist_ingestion"}_{idx}', daemon=True)
+                        for idx in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __del__(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def _worker(self):
+        while not self.stopped.is_set():
+            try:
+                with operation_scope(self.marker or 'playlist_ingestion'):
+                    self.drain()
+            except:
+                if self.verbose:
+                    sprint(f'[PLAYLIST_INGESTION] [{self.marker}] [WORKER FAILED]', Colors.light_red)
+                    print(traceback.format_exc())
+            self.wakeup.wait(self.poll_interval.total_seconds())
+            self.wakeup.clear()
+
+    def drain(self):
+        self.db_engine.requeue_stale_ingestion_jobs(stale_after=self.stale_after, max_attempts=self.max_attempts)
+        processed = 0
+        while not self.stopped.is_set() and self.process_next():
+            processed += 1
+        return processed
+
+    def process(self, job: IngestionJob):
+        try:
+            playlist = self.target(job.platform_id, job.platform)
+        except Exception as ex:
+            self.db_engine.finish_ingestion_job(job_token=job.token, error=str(ex))
+            if self.verbose:
+                sprint(f'[PLAYLIST_INGESTION] [{self.marker}] [FAILED] [{job.platform.value.upper()}] '
+                       f'[{job.platform_id}] [{ex}]', Colors.light_red)
+            return False
+
+        self.db_engine.finish_ingestion_job(job_token=job.token, playlist_token=playlist.token)
+        if self.verbose:
+            sprint(f'[PLAYLIST_INGESTION] [{self.marker}] [DONE] [{job.platform.value.upper()}] '
+                   f'[{job.platform_id}]', Colors.light_cyan)
+        return True
+
+    def process_next(self):
+        if (job := self.db_engine.claim_ingestion_job()) is None:
+            return False
+        self.process(job=job)
+        return True
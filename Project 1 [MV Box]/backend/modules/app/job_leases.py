@@ -0,0 +1,77 @@
+import os
+import socket
+import traceback
+from datetime import timedelta
+from threading import Lock
+
+import uuid6
+
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.instrumentation import scoped
+from backend.modules.tools import sprint, Colors, RepeatThread
+
+
+class JobLeases:
+    def __init__(self, db_engine: DBEngine, owner: str = None, ttl: timedelta = timedelta(seconds=60),
+                 marker: str = None, verbose: bool = True):
+        assert ttl.total_seconds() > 0, 'The lease ttl must be greater than 0'
+
+        self.db_engine = db_engine
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid6.uuid7().hex[-8:]}'
+        self.ttl = ttl
+        self.marker = marker
+        self.verbose = verbose
+
+        self.held: set[str] = set()
+        self.lock = Lock()
+        self.heartbeat_thread = RepeatThread(ttl.total_seconds() / 3, scoped('job_leases', self.heartbeat))
+        self.heartbeat_thread.daemon = True
+        self.heartbeat_thread.start()
+
+    def __del__(self):
+        self.heartbeat_thread.cancel()
+        for job in list(self.held):
+            self.release(job=job)
+
+    def is_held(self, job: str):
+        return job in self.held
+
+    def acquire(self, job: str):
+        acquired = self.db_engine.acquire_job_lease(job=job, owner=self.owner, ttl=self.ttl)
+        with self.lock:
+            if acquired and job not in self.held:
+                self.held.add(job)
+                if self.verbose:
+                    sprint(f'[JOB_LEASES] [{self.marker}] [ACQUIRED] [{job}] [{self.owner}]', Colors.light_green)
+            elif not acquired and job in self.held:
+                self.held.discard(job)
+                if self.verbose:
+                    sprint(f'[JOB_LEASES] [{self.marker}] [LOST] [{job}] [{self.owner}]', Colors.light_red)
+        return acquired
+
+    def release(self, job: str):
+        with self.lock:
+            self.held.discard(job)
+        return self.db_engine.release_job_lease(job=job, owner=self.owner)
+
+    def heartbeat(self):
+        for job in list(self.held):
+            try:
+                self.acquire(job=job)
+            except:
+                if self.verbose:
+                    sprint(f'[JOB_LEASES] [{self.marker}] [HEARTBEAT FAILED] [{job}]', Colors.light_red)
+                    print(traceback.format_exc())
+
+    def leased(self, job: str, target: object, on_acquire: object = None):
+        def run(*args, **kwargs):
+            was_held = self.is_held(job)
+            if not self.acquire(job=job):
+                if self.verbose:
+                    sprint(f'[JOB_LEASES] [{self.marker}] [SKIPPED] [{job}] leased by another process',
+                           Colors.light_black)
+                return None
+            if not was_held and on_acquire is not None:
+                on_acquire()
+            return target(*args, **kwargs)
+        return run
@@ -0,0 +1,137 @@
+from array import array
+from threading import RLock
+
+from pydantic import BaseModel
+
+from backend.modules.db.models import Platforms
+
+
+class PlaylistTrace(BaseModel):
+    playlist_token: str
+    platform: Platforms
+    platform_id: str
+    mv_track_count: int
+    follower_count: int
+    snapshot_id: str | None = None
+    whitelist_version: int | None = None
+
+
+class PlaylistSlot:
+    __slots__ = ('tokens', 'platforms', 'platform_ids', 'mv_track_counts', 'follower_counts', 'snapshot_ids',
+                 'whitelist_versions')
+
+    platform_codes = tuple(Platforms)
+
+    def __init__(self):
+        self.tokens: list[str] = []
+        self.platforms = array('B')
+        self.platform_ids: list[str] = []
+        self.mv_track_counts = array('q')
+        self.follower_counts = array('q')
+        self.snapshot_ids: list[str | None] = []
+        self.whitelist_versions: list[int | None] = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def append(self, trace: PlaylistTrace):
+        self.tokens.append(trace.playlist_token)
+        self.platforms.append(self.platform_codes.index(trace.platform))
+        self.platform_ids.append(trace.platform_id)
+        self.mv_track_counts.append(trace.mv_track_count)
+        self.follower_counts.append(trace.follower_count)
+        self.snapshot_ids.append(trace.snapshot_id)
+        self.whitelist_versions.append(trace.whitelist_version)
+        return len(self.tokens) - 1
+
+    def set(self, position: int, trace: PlaylistTrace):
+        self.platforms[position] = self.platform_codes.index(trace.platform)
+        self.platform_ids[position] = trace.platform_id
+        self.mv_track_counts[position] = trace.mv_track_count
+        self.follower_counts[position] = trace.follower_count
+        self.snapshot_ids[position] = trace.snapshot_id
+        self.whitelist_versions[position] = trace.whitelist_version
+
+    def pop(self, position: int):
+        last = len(self.tokens) - 1
+        if position != last:
+            self.tokens[position] = self.tokens[last]
+            self.platforms[position] = self.platforms[last]
+            self.platform_ids[position] = self.platform_ids[last]
+            self.mv_track_counts[position] = self.mv_track_counts[last]
+            self.follower_counts[position] = self.follower_counts[last]
+            self.snapshot_ids[position] = self.snapshot_ids[last]
+            self.whitelist_versions[position] = self.whitelist_versions[last]
+        self.tokens.pop()
+        self.platforms.pop()
+        self.platform_ids.pop()
+        self.mv_track_counts.pop()
+        self.follower_counts.pop()
+        self.snapshot_ids.pop()
+        self.whitelist_versions.pop()
+        return self.tokens[position] if position != last else None
+
+    def get(self, position: int):
+        return PlaylistTrace(playlist_token=self.tokens[position],
+                             platform=self.platform_codes[self.platforms[position]],
+                             platform_id=self.platform_ids[position],
+                             mv_track_count=self.mv_track_counts[position],
+                             follower_count=self.follower_counts[position],
+                             snapshot_id=self.snapshot_ids[position],
+                             whitelist_version=self.whitelist_versions[position])
+
+
+class PlaylistTracking:
+    slot_count = 24
+
+    def __init__(self):
+        self.available_slot_idx = 0
+        self.slots = tuple(PlaylistSlot() for _ in range(self.slot_count))
+        self.index: dict[str, tuple[int, int]] = {}
+        self.lock = RLock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, playlist_token: str):
+        return playlist_token in self.index
+
+    def track(self, trace: PlaylistTrace):
+        with self.lock:
+            if self.update(trace=trace):
+                return self.index[trace.playlist_token][0]
+
+            slot_idx = self.available_slot_idx
+            position = self.slots[slot_idx].append(trace)
+            self.index[trace.playlist_token] = (slot_idx, position)
+            self.available_slot_idx = slot_idx + 1 if slot_idx < self.slot_count - 1 else 0
+            return slot_idx
+
+    def update(self, trace: PlaylistTrace):
+        with self.lock:
+            if (location := self.index.get(trace.playlist_token)) is None:
+                return False
+            slot_idx, position = location
+            self.slots[slot_idx].set(position, trace)
+            return True
+
+    def remove(self, playlist_token: str):
+        with self.lock:
+            if (location := self.index.pop(playlist_token, None)) is None:
+                return False
+            slot_idx, position = location
+            if (moved_token := self.slots[slot_idx].pop(position)) is not None:
+                self.index[moved_token] = (slot_idx, position)
+            return True
+
+    def get(self, playlist_token: str):
+        with self.lock:
+            if (location := self.index.get(playlist_token)) is None:
+                return None
+            slot_idx, position = location
+            return self.slots[slot_idx].get(position)
+
+    def get_slot(self, slot_idx: int):
+        with self.lock:
+            slot = self.slots[slot_idx]
+            return [slot.get(position) for position in range(len(slot))]
@@ -0,0 +1,128 @@
+import enum
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from contextvars import ContextVar, copy_context
+from datetime import timedelta
+
+from pydantic import BaseModel
+
+from backend.modules.db.models import Platforms
+from backend.modules.tools import sprint, Colors
+
+
+refresh_deadline: ContextVar[float | None] = ContextVar('refresh_deadline', default=None)
+
+
+class RefreshTimeout(Exception):
+    pass
+
+
+def check_refresh_deadline():
+    deadline = refresh_deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise RefreshTimeout('Playlist refresh timed out')
+
+
+class RefreshEvents(enum.Enum):
+    tracks_skipped = 'tracks_skipped'
+
+
+class RefreshSummary(BaseModel):
+    total: int = 0
+    refreshed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    still_running: int = 0
+    skipped: int = 0
+    tracks_skipped: int = 0
+    wall_time: float = 0
+
+
+class PlaylistRefreshEngine:
+    supported_platforms = (Platforms.spotify,)
+
+    def __init__(self, target: object, workers: int = 8, playlist_timeout: timedelta = timedelta(seconds=60),
+                 marker: str = None, verbose: bool = True):
+        assert workers > 0, 'The worker count must be greater than 0'
+
+        self.target = target
+        self.workers = workers
+        self.playlist_timeout = playlist_timeout
+        self.marker = marker
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=marker or 'playlist_refresh')
+
+    def __del__(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_target(self, playlist, started_at: dict, key: int, *args, **kwargs):
+        started_at[key] = time.monotonic()
+        refresh_deadline.set(started_at[key] + self.playlist_timeout.total_seconds())
+        return self.target(playlist, *args, **kwargs)
+
+    def run(self, playlists: list, *args, **kwargs):
+        summary = RefreshSummary(total=len(playlists))
+        run_started_at = time.monotonic()
+        timeout = self.playlist_timeout.total_seconds()
+
+        queue = iter(playlists)
+        seen_tokens = set()
+        started_at: dict[int, float] = {}
+        pending: dict[Future, int] = {}
+        running: set[Future] = set()
+        exhausted = False
+
+        while True:
+            running = {future for future in running if not future.done()}
+            while not exhausted and len(pending) + len(running) < self.workers:
+                if (playlist := next(queue, None)) is None:
+                    exhausted = True
+                    break
+                if playlist.platform not in self.supported_platforms or playlist.playlist_token in seen_tokens:
+                    summary.skipped += 1
+                    continue
+                seen_tokens.add(playlist.playlist_token)
+                key = id(playlist)
+                future = self.executor.submit(copy_context().run, self._run_target, playlist, started_at, key,
+                                              *args, **kwargs)
+                pending[future] = key
+
+            if not pending and (exhausted or not running):
+                break
+
+            now = time.monotonic()
+            deadlines = [started_at[key] + timeout for key in pending.values() if key in started_at]
+            wait_time = max(min(deadlines) - now, 0) if deadlines else timeout
+            done, _ = wait(set(pending) | running, timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if pending.pop(future, None) is None:
+                    continue
+                try:
+                    if future.result() is RefreshEvents.tracks_skipped:
+                        summary.tracks_skipped += 1
+                    summary.refreshed += 1
+                except:
+                    summary.failed += 1
+                    if self.verbose:
+                        sprint(f'[PLAYLIST_REFRESH] [{self.marker}] [FAILED]', Colors.light_red)
+                        print(traceback.format_exc())
+
+            now = time.monotonic()
+            for future, key in list(pending.items()):
+                if key in started_at and started_at[key] + timeout <= now:
+                    pending.pop(future)
+                    running.add(future)
+                    summary.timed_out += 1
+                    summary.failed += 1
+
+        summary.still_running = sum(not future.done() for future in running)
+        summary.wall_time = round(time.monotonic() - run_started_at, 3)
+        if self.verbose:
+            sprint(f'[PLAYLIST_REFRESH] [{self.marker}] [REFRESHED {summary.refreshed}] [FAILED {summary.failed}] '
+                   f'[TIMED OUT {summary.timed_out}] [STILL RUNNING {summary.still_running}] '
+                   f'[SKIPPED {summary.skipped}] '
+                   f'[TRACKS SKIPPED {summary.tracks_skipped}] [{summary.wall_time}s]',
+                   Colors.light_cyan)
+        return summary
@@ -0,0 +1,82 @@
+import heapq
+from datetime import datetime, timedelta
+from threading import RLock
+
+from backend.modules.db.models import PlaylistSchedule
+from backend.modules.tools import hour_rounder
+
+
+class RefreshScheduler:
+    interval_tiers = ((0.5, 1), (0.25, 3), (0.1, 6), (0.02, 24), (0, 168))
+    stagger_hours = 24
+
+    def __init__(self, hourly_budget: int = 3000, smoothing: float = 0.3):
+        assert hourly_budget > 0, 'The hourly budget must be greater than 0'
+        assert 0 < smoothing <= 1, 'The smoothing factor must be in (0, 1]'
+
+        self.hourly_budget = hourly_budget
+        self.smoothing = smoothing
+
+        self.schedules: dict[str, PlaylistSchedule] = {}
+        self.queue: list[tuple[datetime, str]] = []
+        self.lock = RLock()
+
+    def __len__(self):
+        return len(self.schedules)
+
+    def __contains__(self, playlist_token: str):
+        return playlist_token in self.schedules
+
+    @classmethod
+    def get_interval(cls, change_rate: float):
+        for min_rate, interval in cls.interval_tiers:
+            if change_rate >= min_rate:
+                return interval
+        return cls.interval_tiers[-1][1]
+
+    def _push(self, schedule: PlaylistSchedule):
+        self.schedules[schedule.playlist_token] = schedule
+        heapq.heappush(self.queue, (schedule.next_refresh_at, schedule.playlist_token))
+
+    def load(self, schedules: list[PlaylistSchedule]):
+        with self.lock:
+            for schedule in schedules:
+                self._push(schedule)
+
+    def add(self, playlist_token: str, now: datetime, next_refresh_at: datetime = None):
+        with self.lock:
+            if playlist_token in self.schedules:
+                return self.schedules[playlist_token]
+            if next_refresh_at is None:
+                next_refresh_at = hour_rounder(now) + timedelta(hours=len(self.schedules) % self.stagger_hours)
+            schedule = PlaylistSchedule(_id=playlist_token, next_refresh_at=next_refresh_at)
+            self._push(schedule)
+            return schedule
+
+    def remove(self, playlist_token: str):
+        with self.lock:
+            return self.schedules.pop(playlist_token, None) is not None
+
+    def due(self, now: datetime):
+        with self.lock:
+            retry_at = hour_rounder(now) + timedelta(hours=1)
+            playlist_tokens = []
+            while self.queue and len(playlist_tokens) < self.hourly_budget and self.queue[0][0] <= now:
+                next_refresh_at, playlist_token = heapq.heappop(self.queue)
+                schedule = self.schedules.get(playlist_token)
+                if schedule is None or schedule.next_refresh_at != next_refresh_at:
+                    continue
+                schedule.next_refresh_at = retry_at
+                heapq.heappush(self.queue, (retry_at, playlist_token))
+                playlist_tokens.append(playlist_token)
+            return playlist_tokens
+
+    def record(self, playlist_token: str, changed: bool, now: datetime):
+        with self.lock:
+            if (schedule := self.schedules.get(playlist_token)) is None:
+                return None
+            schedule.change_rate = round(self.smoothing * changed + (1 - self.smoothing) * schedule.change_rate, 6)
+            schedule.interval = self.get_interval(change_rate=schedule.change_rate)
+            schedule.next_refresh_at = hour_rounder(now) + timedelta(hours=schedule.interval)
+            heapq.heappush(self.queue, (schedule.next_refresh_at, playlist_token))
+            return schedule.model_copy()
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import stat
+import time
+from datetime import timedelta
+from threading import Lock
+
+from pydantic import BaseModel
+
+from backend.modules.tools import sprint, Colors, TokenBucket
+
+
+def ensure_private_dir(path: str):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise Exception(f'Cache directory [{path}] must be a directory owned by the current user and not writable '
+                        f'by others')
+    return path
+
+
+class PersistentCache:
+    def __init__(self, path: str = ':memory:', max_entries: int = 50_000, max_bytes: int = 64 * 1024 * 1024,
+                 default_ttl: timedelta = timedelta(days=1), marker: str = None, verbose: bool = True):
+        assert max_entries > 0, 'The entry limit must be greater than 0'
+        assert max_bytes > 0, 'The size limit must be greater than 0'
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.marker = marker
+        self.verbose = verbose
+
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self.connection = None
+        if path != ':memory:':
+            ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                                'size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)')
+        self.purge_expired()
+
+    def __del__(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def get(self, key: str, model: type[BaseModel]):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self.connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+            try:
+                value = model.model_validate_json(row[0])
+            except Exception:
+                self.connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.misses += 1
+                if self.verbose:
+                    sprint(f'[PERSISTENT_CACHE] [{self.marker}] [CORRUPT ENTRY] [{key}]', Colors.light_red)
+                return None
+            self.connection.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: BaseModel, ttl: timedelta = None):
+        data = value.model_dump_json().encode()
+        if len(data) > self.max_bytes:
+            return False
+
+        now = time.time()
+        expires_at = now + (ttl or self.default_ttl).total_seconds()
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) '
+                                    'VALUES (?, ?, ?, ?, ?)', (key, data, len(data), expires_at, now))
+            self._evict()
+        return True
+
+    def delete(self, key: str):
+        with self.lock:
+            return self.connection.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def purge_expired(self):
+        with self.lock:
+            return self.connection.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),)).rowcount
+
+    def _evict(self):
+        entry_count, byte_count = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) '
+                                                          'FROM cache').fetchone()
+        if entry_count <= self.max_entries and byte_count <= self.max_bytes:
+            return
+
+        evicted_keys = []
+        for key, size in self.connection.execute('SELECT key, size FROM cache ORDER BY accessed_at'):
+            if entry_count <= self.max_entries and byte_count <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            entry_count -= 1
+            byte_count -= size
+        self.connection.executemany('DELETE FROM cache WHERE key = ?', evicted_keys)
+        if self.verbose:
+            sprint(f'[PERSISTENT_CACHE] [{self.marker}] [EVICTED {len(evicted_keys)}]', Colors.light_yellow)
+
+
+class CachedSpotifyController:
+    ttls = {'playlist': timedelta(minutes=10),
+            'track': timedelta(days=7)}
+
+    def __init__(self, controller: object, cache: PersistentCache, rate_limiter: TokenBucket = None,
+                 models: dict[str, type[BaseModel]] = None):
+        self.controller = controller
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.models = dict(models or {})
+
+    def __getattr__(self, item: str):
+        return getattr(self.controller, item)
+
+    def _acquire(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def _get(self, kind: str, spotify_id: str):
+        if (model := self.models.get(kind)) is None:
+            return None
+        return self.cache.get(f'{kind}:{spotify_id}', model=model)
+
+    def _set(self, kind: str, spotify_id: str, value: BaseModel):
+        self.models.setdefault(kind, type(value))
+        self.cache.set(f'{kind}:{spotify_id}', value, ttl=self.ttls[kind])
+
+    def get_playlist(self, spotify_id: str):
+        if (playlist := self._get('playlist', spotify_id)) is None:
+            self._acquire()
+            playlist = self.controller.get_playlist(spotify_id=spotify_id)
+            self._set('playlist', spotify_id, playlist)
+        return playlist
+
+    def get_tracks_info(self, track_ids: list[str]):
+        tracks = {track_id: self._get('track', track_id) for track_id in track_ids}
+        if missing_ids := [track_id for track_id, track in tracks.items() if track is None]:
+            self._acquire()
+            for track in self.controller.get_tracks_info(track_ids=missing_ids):
+                tracks[track.spotify_id] = track
+                self._set('track', track.spotify_id, track)
+        return [tracks[track_id] for track_id in track_ids if tracks.get(track_id) is not None]
@@ -0,0 +1,195 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.decoding import decode, get_projection
+from backend.modules.db.leaderboard import Leaderboard
+from backend.modules.db.models import Keys, Platforms, Playlist, GeneralInfo, InfoTypes, JoinMember, IngestionJob, \
+    IngestionStatus
+
+
+class AsyncDBEngine:
+    get_track_cursor = staticmethod(DBEngine.get_track_cursor)
+
+    def __init__(self, db_engine: AsyncMongoEngine, sync_engine: DBEngine):
+        self.db_engine = db_engine
+        self.sync_engine = sync_engine
+        self.leaderboard = sync_engine.leaderboard
+        self.view_counter = sync_engine.view_counter
+        self.track_sampler = sync_engine.track_sampler
+        self.leaderboard_lock = asyncio.Lock()
+        self.track_sampler_lock = asyncio.Lock()
+
+    async def check_playlist_existence(self, platform_id: str, platform: Platforms):
+        return await self.db_engine.exists(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                           target={'platform_id': platform_id,
+                                                   'platform': platform.value})
+
+    async def _get_competing_playlists(self, sponsored: bool, trusted: bool = False, fields: list[str] = None):
+        data = await self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                         target={'competing': True, 'sponsored': sponsored},
+                                         project=get_projection(model=Playlist, fields=fields) if fields else None,
+                                         sort=DBEngine.playlist_sort)
+        return decode(model=Playlist, data=data, trusted=trusted, fields=fields)
+
+    async def ensure_leaderboard(self):
+        if not self.leaderboard.is_stale():
+            return
+        async with self.leaderboard_lock:
+            if self.leaderboard.is_stale():
+                top_playlists = await self._get_competing_playlists(sponsored=False, trusted=True,
+                                                                    fields=Leaderboard.ranking_fields)
+                sponsored_playlists = await self._get_competing_playlists(sponsored=True, trusted=True,
+                                                                          fields=Leaderboard.ranking_fields)
+                await asyncio.get_running_loop().run_in_executor(None, self.leaderboard.load, top_playlists,
+                                                                 sponsored_playlists)
+
+    async def get_playlist(self, playlist_token: str):
+        data = await self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                             target={'_id': playlist_token})
+        return Playlist.model_validate(data) if data else None
+
+    async def get_playlist_rank(self, playlist_token: str):
+        return (await self.get_playlist_ranks(playlist_tokens=[playlist_token])).get(playlist_token)
+
+    async def get_playlist_ranks(self, playlist_tokens: list[str]):
+        data = await self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                         target={'_id': {'$in': playlist_tokens}, 'competing': True},
+                                         project={'mv_track_count': 1, 'follower_count': 1})
+        ranks = {}
+        rank_cache = {}
+        for el in data:
+            rank_key = (el['mv_track_count'], el['follower_count'])
+            if rank_key not in rank_cache:
+                rank_cache[rank_key] = await self.db_engine.count(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                                                  target=DBEngine._playlist_rank_target(*rank_key)) + 1
+            ranks[el['_id']] = rank_cache[rank_key]
+        return ranks
+
+    async def get_playlist_history(self, playlist_token: str, start: datetime = None, end: datetime = None,
+                                   limit: int = 0):
+        pipeline = DBEngine._playlist_history_pipeline(playlist_token=playlist_token, start=start, end=end,
+                                                       limit=limit)
+        data = await self.db_engine.aggregate(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots,
+                                              pipeline=pipeline)
+        return DBEngine._to_playlist_history(data=data)
+
+    async def get_artist_names(self, artist_tokens: list[str]):
+        names, missing_tokens = self.sync_engine._get_cached_artist_names(artist_tokens=artist_tokens)
+        if missing_tokens:
+            data = await self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.artists,
+                                             target={'_id': {'$in': missing_tokens}}, project={'name': 1})
+            missing_names = {el['_id']: el['name'] for el in data}
+            self.sync_engine._cache_artist_names(missing_names)
+            names.update(missing_names)
+        return names
+
+    async def _aggregate_mv_track_records(self, pipeline: list[dict]):
+        data = await self.db_engine.aggregate(db=Keys.mv_box_playlists_db, key=Keys.tracks,
+                                              pipeline=DBEngine._mv_track_records_pipeline(pipeline=pipeline))
+        artist_names = await self.get_artist_names(artist_tokens=DBEngine._get_artist_tokens(data=data))
+        return DBEngine._to_mv_track_records(data=data, artist_names=artist_names)
+
+    async def get_mv_track_records(self, offset: int = 0, limit: int = 0, cursor: str = None):
+        pipeline = self.sync_engine._mv_track_records_page_pipeline(offset=offset, limit=limit, cursor=cursor)
+        return await self._aggregate_mv_track_records(pipeline=pipeline)
+
+    async def _reshuffle_track_sampler(self):
+        try:
+            data = await self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.tracks,
+                                             target={'mv_pass': True}, project={'_id': 1})
+        except:
+            self.track_sampler.release_reload()
+            raise
+        self.track_sampler.reshuffle(tokens=[el['_id'] for el in data])
+
+    async def ensure_track_sampler(self):
+        if not self.track_sampler.is_stale():
+            return
+        if self.track_sampler.shuffled_at is not None:
+            if self.track_sampler.claim_reload():
+                await self._reshuffle_track_sampler()
+            return
+        async with self.track_sampler_lock:
+            if self.track_sampler.claim_reload():
+                await self._reshuffle_track_sampler()
+
+    async def sample_mv_track_records(self, seed: int = None, offset: int = 0, limit: int = 10, cursor: str = None):
+        await self.ensure_track_sampler()
+        page = self.track_sampler.get_page(seed=seed, offset=offset, limit=limit, cursor=cursor)
+        if not page.tokens:
+            return page, []
+
+        records = await self._aggregate_mv_track_records(pipeline=[{'$match': {'_id': {'$in': page.tokens},
+                                                                                'mv_pass': True}}])
+        records = {record.token: record for record in records}
+        return page, [records[token] for token in page.tokens if token in records]
+
+    async def get_info(self, info_type: InfoTypes):
+        data = await self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.info,
+                                             target={'_id': info_type.value})
+        if info_type is InfoTypes.general:
+            return GeneralInfo.model_validate(data)
+        return None
+
+    async def get_cached_info(self, info_type: InfoTypes):
+        cached = self.sync_engine.info_cache.get(info_type)
+        if cached is None or cached[0] < time.monotonic():
+            return self.sync_engine._set_cached_info(info_type=info_type,
+                                                     info=await self.get_info(info_type=info_type))
+        return cached[1]
+
+    async def add_join_member(self, member: JoinMember):
+        if await self.db_engine.exists(db=Keys.mv_box_playlists_db, key=Keys.join_members,
+                                       target={'email': member.email}):
+            return False
+
+        data = member.model_dump(by_alias=True, mode='json')
+        await self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.join_members, data=data)
+        return True
+
+    async def get_join_members(self, offset: int = 0, limit: int = 0, target: dict = None, trusted: bool = False,
+                               fields: list[str] = None):
+        sort = [('last_sent_news_date', 1), ('signed_up', -1)]
+        data = await self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.join_members,
+                                         target=target if target is not None else {},
+                                         project=get_projection(model=JoinMember, fields=fields) if fields else None,
+                                         sort=sort, skip=offset, limit=limit)
+        return decode(model=JoinMember, data=data, trusted=trusted, fields=fields)
+
+    async def sign_up_member(self, token: str):
+        await self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.join_members,
+                                        target={'_id': token}, update_query={'$set': {'signed_up': True}})
+
+    async def enqueue_ingestion_job(self, platform_id: str, platform: Platforms):
+        job = IngestionJob(platform=platform, platform_id=platform_id)
+        target = {'platform_id': platform_id, 'platform': platform.value}
+        try:
+            data = await self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                                            target=target,
+                                                            update_query={'$setOnInsert': job.model_dump(by_alias=True,
+                                                                                                         mode='json',
+                                                                                                         exclude={'updated_at'})},
+                                                            upsert=True)
+        except DuplicateKeyError:
+            data = await self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs, target=target)
+        job = IngestionJob.model_validate(data)
+        if job.status in (IngestionStatus.done, IngestionStatus.failed):
+            data = await self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                                            target={**target, 'status': job.status.value},
+                                                            update_query={'$set': {'status': IngestionStatus.queued.value,
+                                                                                   'attempts': 0,
+                                                                                   'playlist_token': None,
+                                                                                   'error': None,
+                                                                                   'updated_at': datetime.now(timezone.utc)}})
+            job = IngestionJob.model_validate(data) if data else await self.get_ingestion_job(job_token=job.token)
+        return job
+
+    async def get_ingestion_job(self, job_token: str):
+        data = await self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                             target={'_id': job_token})
+        return IngestionJob.model_validate(data) if data else None
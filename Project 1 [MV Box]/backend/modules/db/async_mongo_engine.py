@@ -0,0 +1,129 @@
+from urllib.parse import quote_plus
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession
+from pymongo import ReturnDocument
+from pymongo.server_api import ServerApi
+
+from backend.modules.db.instrumentation import OperationMetrics
+from backend.modules.db.models import Keys
+from backend.modules.db.mongo_engine import MongoEngine
+from backend.modules.tools import sprint, Colors
+
+
+class AsyncMongoEngine:
+    def __init__(self, host: str = None, username: str = None, password: str = None, port: int = None,
+                 marker: str = None, verbose: bool = True, plan_check: bool = False, connection_url: str = None,
+                 event_listeners: list = None, metrics: OperationMetrics = None):
+        if connection_url is None:
+            connection_url = f'mongodb+srv://{quote_plus(username)}:{quote_plus(password)}@{quote_plus(host)}/?retryWrites=true&w=majority'
+
+        self.verbose = verbose
+        self.marker = marker
+        self.plan_check = plan_check
+        self.metrics = metrics or OperationMetrics(marker=marker, verbose=verbose)
+
+        if self.verbose:
+            sprint(f'[ASYNC_MONGO_DB] [{marker}] [CONNECTING]', Colors.light_green)
+        self.engine = AsyncIOMotorClient(host=connection_url, port=port, server_api=ServerApi('1'),
+                                         event_listeners=event_listeners or [])
+        self.session: AsyncIOMotorClientSession | None = None
+
+    def __del__(self):
+        if self.verbose:
+            sprint(f'[ASYNC_MONGO_DB] [{self.marker}] [DISCONNECTING]', Colors.light_red)
+        self.engine.close()
+
+    async def start_session(self):
+        await self.abort_session()
+        self.session = await self.engine.start_session()
+        self.session.start_transaction()
+
+    async def abort_session(self):
+        if self.session is not None:
+            await self.session.abort_transaction()
+            await self.session.end_session()
+            self.session = None
+
+    async def _check_plan(self, db: Keys, key: Keys, target: dict, sort: list[tuple] = None):
+        if not self.plan_check or key is Keys.test or (not target and not sort):
+            return
+        plan = await self.engine[db.value][key.value].find(filter=target, sort=sort).explain()
+        if MongoEngine._has_collscan(plan['queryPlanner']['winningPlan']):
+            raise Exception(f'[ASYNC_MONGO_DB] [{self.marker}] COLLSCAN on [{key.value}] [{target}] [{sort}]')
+
+    def _measure(self, key: Keys, operation: str, target: dict = None):
+        return self.metrics.measure(collection=key.value, operation=operation, target=target)
+
+    async def insert(self, db: Keys, key: Keys, data: list[dict] | dict):
+        if data:
+            if type(data) is list:
+                with self._measure(key=key, operation='insert_many'):
+                    return await self.engine[db.value][key.value].insert_many(data, session=self.session)
+            elif type(data) is dict:
+                with self._measure(key=key, operation='insert_one'):
+                    return await self.engine[db.value][key.value].insert_one(data, session=self.session)
+        return None
+
+    async def find_one(self, db: Keys, key: Keys, target: dict, project: dict = None):
+        if target is not None:
+            await self._check_plan(db=db, key=key, target=target)
+            with self._measure(key=key, operation='find_one', target=target):
+                return await self.engine[db.value][key.value].find_one(filter=target, projection=project,
+                                                                       session=self.session)
+
+    async def find(self, db: Keys, key: Keys, target: dict, project: dict = None, sort: list[tuple] = None,
+                   skip: int = 0, limit: int = 0):
+        if target is not None:
+            await self._check_plan(db=db, key=key, target=target, sort=sort)
+            with self._measure(key=key, operation='find', target=target):
+                cursor = self.engine[db.value][key.value].find(filter=target, projection=project, sort=sort,
+                                                               skip=skip, limit=limit, session=self.session)
+                return await cursor.to_list(length=None)
+
+    async def aggregate(self, db: Keys, key: Keys, pipeline: list[dict]):
+        if pipeline:
+            target = None
+            if '$match' in pipeline[0]:
+                target = pipeline[0]['$match']
+                sort = list(pipeline[1]['$sort'].items()) if len(pipeline) > 1 and '$sort' in pipeline[1] else None
+                await self._check_plan(db=db, key=key, target=target, sort=sort)
+            with self._measure(key=key, operation='aggregate', target=target):
+                cursor = self.engine[db.value][key.value].aggregate(pipeline, session=self.session)
+                return await cursor.to_list(length=None)
+
+    async def update_one(self, db: Keys, key: Keys, target: dict, update_query: dict, upsert: bool = False):
+        if update_query is not None:
+            await self._check_plan(db=db, key=key, target=target)
+            with self._measure(key=key, operation='update_one', target=target):
+                return await self.engine[db.value][key.value].update_one(filter=target, update=update_query,
+                                                                         upsert=upsert, session=self.session)
+
+    async def find_one_and_update(self, db: Keys, key: Keys, target: dict, update_query: dict,
+                                  sort: list[tuple] = None, upsert: bool = False):
+        if update_query is not None:
+            await self._check_plan(db=db, key=key, target=target, sort=sort)
+            with self._measure(key=key, operation='find_one_and_update', target=target):
+                return await self.engine[db.value][key.value].find_one_and_update(filter=target,
+                                                                                  update=update_query,
+                                                                                  sort=sort, upsert=upsert,
+                                                                                  return_document=ReturnDocument.AFTER,
+                                                                                  session=self.session)
+
+    async def delete_one(self, db: Keys, key: Keys, target: dict):
+        if target is not None:
+            await self._check_plan(db=db, key=key, target=target)
+            with self._measure(key=key, operation='delete_one', target=target):
+                return await self.engine[db.value][key.value].delete_one(filter=target, session=self.session)
+
+    async def exists(self, db: Keys, key: Keys, target: dict):
+        if target is not None:
+            await self._check_plan(db=db, key=key, target=target)
+            with self._measure(key=key, operation='exists', target=target):
+                return bool(await self.engine[db.value][key.value].count_documents(filter=target, limit=1,
+                                                                                   session=self.session))
+
+    async def count(self, db: Keys, key: Keys, target: dict):
+        if target is not None:
+            await self._check_plan(db=db, key=key, target=target)
+            with self._measure(key=key, operation='count', target=target):
+                return await self.engine[db.value][key.value].count_documents(filter=target, session=self.session)
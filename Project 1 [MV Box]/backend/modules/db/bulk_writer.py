@@ -0,0 +1,102 @@
+from datetime import timedelta
+from threading import RLock, Timer
+
+from pydantic import BaseModel
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from backend.modules.db.models import Keys
+from backend.modules.db.mongo_engine import MongoEngine
+from backend.modules.tools import sprint, Colors
+
+
+class BulkWriteReport(BaseModel):
+    key: str
+    operation_count: int
+    matched_count: int = 0
+    modified_count: int = 0
+    upserted_count: int = 0
+    requeued_count: int = 0
+    unsent_count: int = 0
+    errors: list[dict] = []
+
+
+class BulkWriter:
+    def __init__(self, engine: MongoEngine, db: Keys, batch_size: int = 500,
+                 flush_interval: timedelta = timedelta(seconds=5), marker: str = None, verbose: bool = True):
+        assert batch_size > 0, 'The batch size must be greater than 0'
+
+        self.engine = engine
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.marker = marker
+        self.verbose = verbose
+
+        self.operations: dict[Keys, list[UpdateOne]] = {}
+        self.operation_count = 0
+        self.flush_timer: Timer | None = None
+        self.reports: list[BulkWriteReport] = []
+        self.lock = RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush(requeue=False)
+
+    def _queue(self, key: Keys, operations: list[UpdateOne]):
+        self.operations.setdefault(key, []).extend(operations)
+        self.operation_count += len(operations)
+        if self.flush_timer is None:
+            self.flush_timer = Timer(self.flush_interval.total_seconds(), self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def update_one(self, key: Keys, target: dict, update_query: dict, upsert: bool = False):
+        with self.lock:
+            self._queue(key=key, operations=[UpdateOne(filter=target, update=update_query, upsert=upsert)])
+            if self.operation_count >= self.batch_size:
+                self.flush()
+
+    def flush(self, requeue: bool = True):
+        with self.lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            operations, self.operations = self.operations, {}
+            self.operation_count = 0
+
+            reports = []
+            for key, key_operations in operations.items():
+                report = BulkWriteReport(key=key.value, operation_count=len(key_operations))
+                details = {}
+                try:
+                    result = self.engine.bulk_write(db=self.db, key=key, operations=key_operations, ordered=False)
+                    details = result.bulk_api_result
+                except BulkWriteError as ex:
+                    details = ex.details
+                    report.errors = [{'index': error['index'], 'code': error['code'], 'message': error['errmsg']}
+                                     for error in details.get('writeErrors', [])]
+                except PyMongoError as ex:
+                    report.errors = [{'index': None, 'code': getattr(ex, 'code', None), 'message': str(ex)}]
+                    if requeue:
+                        report.requeued_count = len(key_operations)
+                        self._queue(key=key, operations=key_operations)
+                    else:
+                        report.unsent_count = len(key_operations)
+
+                report.matched_count = details.get('nMatched', 0)
+                report.modified_count = details.get('nModified', 0)
+                report.upserted_count = details.get('nUpserted', 0)
+                reports.append(report)
+
+                if report.errors:
+                    sprint(f'[BULK_WRITE] [{self.marker}] [{key.value}] '
+                           f'[ERRORS {len(report.errors)}/{report.operation_count}] '
+                           f'[REQUEUED {report.requeued_count}] [UNSENT {report.unsent_count}]', Colors.light_red)
+                elif self.verbose:
+                    sprint(f'[BULK_WRITE] [{self.marker}] [{key.value}] [{report.operation_count}]', Colors.light_blue)
+
+            self.reports += reports
+            return reports
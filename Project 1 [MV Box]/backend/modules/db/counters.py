@@ -0,0 +1,72 @@
+import traceback
+from datetime import timedelta
+from threading import Lock, Event, Thread
+
+from backend.modules.tools import sprint, Colors
+
+
+class WriteBehindCounter:
+    def __init__(self, flush: object, flush_interval: timedelta = timedelta(seconds=5), flush_threshold: int = 100,
+                 marker: str = None):
+        assert flush_threshold > 0, 'The flush threshold must be greater than 0'
+
+        self.flush_target = flush
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.marker = marker
+
+        self.pending = 0
+        self.in_flight = 0
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.wake_event = Event()
+        self.stop_event = Event()
+        self.flush_thread: Thread | None = None
+
+    def __del__(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join()
+            self.flush_thread = None
+        self.flush()
+
+    @property
+    def pending_count(self):
+        return self.pending + self.in_flight
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait(self.flush_interval.total_seconds())
+            self.wake_event.clear()
+            self.flush()
+
+    def incr(self, amount: int = 1):
+        with self.lock:
+            self.pending += amount
+            if self.flush_thread is None and not self.stop_event.is_set():
+                self.flush_thread = Thread(target=self._run, name=f'{self.marker}_flush', daemon=True)
+                self.flush_thread.start()
+            if self.pending >= self.flush_threshold:
+                self.wake_event.set()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                amount, self.pending = self.pending, 0
+                self.in_flight = amount
+            if not amount:
+                return 0
+
+            try:
+                self.flush_target(amount)
+            except:
+                with self.lock:
+                    self.pending += amount
+                sprint(f'[WRITE_BEHIND] [{self.marker}] [FLUSH FAILED] [{amount}]', Colors.light_red)
+                print(traceback.format_exc())
+                amount = 0
+            finally:
+                with self.lock:
+                    self.in_flight = 0
+            return amount
@@ -1,13 +1,55 @@
-from datetime import datetime
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+from pydantic import TypeAdapter
+from pymongo.errors import DuplicateKeyError
 
 from backend.modules.db.models import Playlist, Keys, Track, Artist, GeneralInfo, InfoTypes, JoinMember, Platforms, \
-    ConfigTypes, SpotifyConfig, SpotifyUser, SenderSlugs, EmailUser, TopPlaylistsSnapshot
+    ConfigTypes, SpotifyConfig, SpotifyUser, SenderSlugs, EmailUser, TopPlaylistsSnapshot, MVTrackRecord, \
+    IngestionJob, IngestionStatus, PlaylistSchedule, SnapshotEntry, CompactTopPlaylistsSnapshot, PlaylistHistoryPoint, \
+    JobLease
+from backend.modules.db.bulk_writer import BulkWriter
+from backend.modules.db.counters import WriteBehindCounter
+from backend.modules.db.decoding import decode, get_projection
+from backend.modules.db.leaderboard import Leaderboard, PlaylistRanking
 from backend.modules.db.mongo_engine import MongoEngine
+from backend.modules.db.track_sampler import TrackSampler
+from backend.modules.tools import encode_cursor, decode_cursor
 
 
 class DBEngine:
-    def __init__(self, db_engine: MongoEngine):
+    playlist_sort = [('mv_track_count', -1), ('follower_count', -1), ('_id', 1)]
+
+    def __init__(self, db_engine: MongoEngine, leaderboard_staleness: timedelta = timedelta(minutes=5),
+                 info_cache_ttl: timedelta = timedelta(seconds=30),
+                 view_count_flush_interval: timedelta = timedelta(seconds=5), view_count_flush_threshold: int = 100,
+                 artist_name_cache_size: int = 1024, track_reshuffle_interval: timedelta = timedelta(hours=1),
+                 snapshot_playlist_cache_size: int = 256):
         self.db_engine = db_engine
+        self.leaderboard = Leaderboard(loader=self._load_leaderboard, max_staleness=leaderboard_staleness)
+        self.info_cache_ttl = info_cache_ttl
+        self.info_cache: dict[InfoTypes, tuple[float, GeneralInfo]] = {}
+        self.view_counter = WriteBehindCounter(flush=self._flush_landing_page_view_count,
+                                               flush_interval=view_count_flush_interval,
+                                               flush_threshold=view_count_flush_threshold,
+                                               marker='landing_page_view_count')
+        self.artist_name_cache_size = artist_name_cache_size
+        self.artist_names: OrderedDict[str, str] = OrderedDict()
+        self.artist_names_lock = Lock()
+        self.track_sampler = TrackSampler(loader=self._load_mv_track_tokens, reshuffle_interval=track_reshuffle_interval)
+        self.snapshot_playlist_cache_size = snapshot_playlist_cache_size
+        self.snapshot_playlists: OrderedDict[str, Playlist] = OrderedDict()
+        self.snapshot_playlists_lock = Lock()
+
+    def __del__(self):
+        self.view_counter.__del__()
+
+    def bulk_writer(self, batch_size: int = 500, flush_interval: timedelta = timedelta(seconds=5),
+                    marker: str = None, verbose: bool = False):
+        return BulkWriter(engine=self.db_engine, db=Keys.mv_box_playlists_db, batch_size=batch_size,
+                          flush_interval=flush_interval, marker=marker, verbose=verbose)
 
     def check_playlist_existence(self, platform_id: str, platform: Platforms):
         return self.db_engine.exists(db=Keys.mv_box_playlists_db, key=Keys.playlists,
@@ -32,52 +74,227 @@ class DBEngine:
 
         data = playlist.model_dump(by_alias=True, mode='json')
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.playlists, data=data)
+        self.leaderboard.add(playlist=playlist)
         return True
 
-    def get_top_playlists(self, offset: int = 0, limit: int = 0):
-        sort = [('mv_track_count', -1), ('follower_count', -1)]
-        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
-                                   target={'competing': True, 'sponsored': False},
-                                   sort=sort, skip=offset, limit=limit)
-        return [Playlist.model_validate(el) for el in data]
-
-    def get_sponsored_playlists(self, offset: int = 0, limit: int = 0):
-        sort = [('mv_track_count', -1), ('follower_count', -1)]
+    @staticmethod
+    def get_playlist_cursor(playlist: Playlist):
+        return encode_cursor(PlaylistRanking.get_cursor_values(playlist))
+
+    @staticmethod
+    def _playlist_cursor_target(cursor: str):
+        values = decode_cursor(cursor)
+        if not PlaylistRanking.validate_cursor_values(values):
+            raise ValueError('Invalid cursor')
+        mv_track_count, follower_count, token = values
+        return {'$or': [{'mv_track_count': {'$lt': mv_track_count}},
+                        {'mv_track_count': mv_track_count, 'follower_count': {'$lt': follower_count}},
+                        {'mv_track_count': mv_track_count, 'follower_count': follower_count, '_id': {'$gt': token}}]}
+
+    def _get_competing_playlists(self, sponsored: bool, offset: int = 0, limit: int = 0, cursor: str = None,
+                                 trusted: bool = False, fields: list[str] = None):
+        target = {'competing': True, 'sponsored': sponsored}
+        if cursor is not None:
+            target.update(self._playlist_cursor_target(cursor))
+            offset = 0
+        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists, target=target,
+                                   project=get_projection(model=Playlist, fields=fields) if fields else None,
+                                   sort=self.playlist_sort, skip=offset, limit=limit)
+        return decode(model=Playlist, data=data, trusted=trusted, fields=fields)
+
+    def get_competing_playlists_after(self, playlist_token: str, trusted: bool = False, fields: list[str] = None):
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
-                                   target={'competing': True, 'sponsored': True},
-                                   sort=sort, skip=offset, limit=limit)
-        return [Playlist.model_validate(el) for el in data]
+                                   target={'_id': {'$gt': playlist_token}, 'competing': True},
+                                   project=get_projection(model=Playlist, fields=fields) if fields else None,
+                                   sort=[('_id', 1)])
+        return decode(model=Playlist, data=data, trusted=trusted, fields=fields)
+
+    def get_top_playlists(self, offset: int = 0, limit: int = 0, cursor: str = None, trusted: bool = False,
+                          fields: list[str] = None):
+        return self._get_competing_playlists(sponsored=False, offset=offset, limit=limit, cursor=cursor,
+                                             trusted=trusted, fields=fields)
+
+    def get_sponsored_playlists(self, offset: int = 0, limit: int = 0, cursor: str = None, trusted: bool = False,
+                                fields: list[str] = None):
+        return self._get_competing_playlists(sponsored=True, offset=offset, limit=limit, cursor=cursor,
+                                             trusted=trusted, fields=fields)
+
+    def _update_one(self, key: Keys, target: dict, update_query: dict, upsert: bool = False, batch: BulkWriter = None):
+        if batch is not None:
+            batch.update_one(key=key, target=target, update_query=update_query, upsert=upsert)
+        else:
+            self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=key, target=target, update_query=update_query,
+                                      upsert=upsert)
+
+    def _load_leaderboard(self):
+        return (self.get_top_playlists(trusted=True, fields=Leaderboard.ranking_fields),
+                self.get_sponsored_playlists(trusted=True, fields=Leaderboard.ranking_fields))
+
+    @staticmethod
+    def _playlist_rank_target(mv_track_count: int, follower_count: int):
+        return {'competing': True,
+                '$or': [{'mv_track_count': {'$gt': mv_track_count}},
+                        {'mv_track_count': mv_track_count, 'follower_count': {'$gt': follower_count}}]}
 
     def get_playlist_rank(self, playlist_token: str):
-        sort = [('mv_track_count', -1), ('follower_count', -1)]
+        return self.get_playlist_ranks(playlist_tokens=[playlist_token]).get(playlist_token)
+
+    def get_playlist_ranks(self, playlist_tokens: list[str]):
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
-                                   target={'competing': True}, sort=sort, project={'_id': 1})
-        tokens = [el['_id'] for el in data]
-        return tokens.index(playlist_token) + 1
+                                   target={'_id': {'$in': playlist_tokens}, 'competing': True},
+                                   project={'mv_track_count': 1, 'follower_count': 1})
+        ranks = {}
+        rank_cache = {}
+        for el in data:
+            rank_key = (el['mv_track_count'], el['follower_count'])
+            if rank_key not in rank_cache:
+                rank_cache[rank_key] = self.db_engine.count(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                                            target=self._playlist_rank_target(*rank_key)) + 1
+            ranks[el['_id']] = rank_cache[rank_key]
+        return ranks
 
     def update_playlist(self,
                         playlist_token: str,
                         mv_track_count: int = None,
-                        follower_count: int = None):
+                        follower_count: int = None,
+                        snapshot_id: str = None,
+                        whitelist_version: int = None,
+                        batch: BulkWriter = None):
         update_query = {}
         if mv_track_count is not None:
             update_query.update({'mv_track_count': mv_track_count})
         if follower_count is not None:
             update_query.update({'follower_count': follower_count})
+        if snapshot_id is not None:
+            update_query.update({'snapshot_id': snapshot_id})
+        if whitelist_version is not None:
+            update_query.update({'whitelist_version': whitelist_version})
 
         if update_query:
-            self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.playlists,
-                                      target={'_id': playlist_token},
-                                      update_query={'$set': update_query})
+            self._update_one(key=Keys.playlists, target={'_id': playlist_token},
+                             update_query={'$set': update_query}, batch=batch)
+        if mv_track_count is not None or follower_count is not None:
+            self.leaderboard.update(playlist_token=playlist_token,
+                                    mv_track_count=mv_track_count,
+                                    follower_count=follower_count)
+
+    def get_whitelist_version(self):
+        data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.info,
+                                       target={'_id': InfoTypes.whitelist.value})
+        return data['version'] if data else 0
+
+    def bump_whitelist_version(self):
+        data = self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.info,
+                                                  target={'_id': InfoTypes.whitelist.value},
+                                                  update_query={'$inc': {'version': 1}}, upsert=True)
+        return data['version']
 
     def add_track(self, track: Track):
         data = track.model_dump(by_alias=True, mode='json')
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.tracks, data=data)
-
-    def get_mv_tracks(self, offset: int = 0, limit: int = 0):
+        if track.mv_pass:
+            self.track_sampler.add(token=track.token)
+
+    @staticmethod
+    def get_track_cursor(track: Track | MVTrackRecord):
+        return encode_cursor([track.token])
+
+    @staticmethod
+    def _mv_tracks_target(cursor: str = None):
+        target = {'mv_pass': True}
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if not isinstance(values, list) or len(values) != 1 or not isinstance(values[0], str):
+                raise ValueError('Invalid cursor')
+            target.update({'_id': {'$gt': values[0]}})
+        return target
+
+    def get_mv_tracks(self, offset: int = 0, limit: int = 0, cursor: str = None, trusted: bool = False,
+                      fields: list[str] = None):
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.tracks,
-                                   target={'mv_pass': True}, skip=offset, limit=limit)
-        return [Track.model_validate(el) for el in data]
+                                   target=self._mv_tracks_target(cursor=cursor),
+                                   project=get_projection(model=Track, fields=fields) if fields else None,
+                                   sort=[('_id', 1)], skip=offset if cursor is None else 0, limit=limit)
+        return decode(model=Track, data=data, trusted=trusted, fields=fields)
+
+    @staticmethod
+    def _mv_track_records_pipeline(pipeline: list[dict]):
+        return pipeline + [{'$project': {'artist_token': 1, 'sources': 1, 'name': 1, 'image_path': 1}}]
+
+    @staticmethod
+    def _get_artist_tokens(data: list[dict]):
+        return list({el['artist_token'] for el in data if el.get('artist_token') is not None})
+
+    @staticmethod
+    def _to_mv_track_records(data: list[dict], artist_names: dict[str, str]):
+        return [MVTrackRecord.model_validate({**el, 'artist_name': artist_names.get(el.get('artist_token'))})
+                for el in data]
+
+    def _aggregate_mv_track_records(self, pipeline: list[dict]):
+        data = list(self.db_engine.aggregate(db=Keys.mv_box_playlists_db, key=Keys.tracks,
+                                             pipeline=self._mv_track_records_pipeline(pipeline=pipeline)))
+        artist_names = self.get_artist_names(artist_tokens=self._get_artist_tokens(data=data))
+        return self._to_mv_track_records(data=data, artist_names=artist_names)
+
+    def _mv_track_records_page_pipeline(self, offset: int = 0, limit: int = 0, cursor: str = None):
+        pipeline = [{'$match': self._mv_tracks_target(cursor=cursor)},
+                    {'$sort': {'_id': 1}}]
+        if offset and cursor is None:
+            pipeline.append({'$skip': offset})
+        if limit:
+            pipeline.append({'$limit': limit})
+        return pipeline
+
+    def get_mv_track_records(self, offset: int = 0, limit: int = 0, cursor: str = None):
+        return self._aggregate_mv_track_records(pipeline=self._mv_track_records_page_pipeline(offset=offset,
+                                                                                              limit=limit,
+                                                                                              cursor=cursor))
+
+    def _load_mv_track_tokens(self):
+        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.tracks,
+                                   target={'mv_pass': True}, project={'_id': 1})
+        return [el['_id'] for el in data]
+
+    def sample_mv_track_records(self, seed: int = None, offset: int = 0, limit: int = 10, cursor: str = None):
+        page = self.track_sampler.get_page(seed=seed, offset=offset, limit=limit, cursor=cursor)
+        if not page.tokens:
+            return page, []
+
+        records = self._aggregate_mv_track_records(pipeline=[{'$match': {'_id': {'$in': page.tokens},
+                                                                          'mv_pass': True}}])
+        records = {record.token: record for record in records}
+        return page, [records[token] for token in page.tokens if token in records]
+
+    def _cache_artist_names(self, names: dict[str, str]):
+        with self.artist_names_lock:
+            for token, name in names.items():
+                self.artist_names[token] = name
+                self.artist_names.move_to_end(token)
+            while len(self.artist_names) > self.artist_name_cache_size:
+                self.artist_names.popitem(last=False)
+
+    def _get_cached_artist_names(self, artist_tokens: list[str]):
+        with self.artist_names_lock:
+            names = {token: self.artist_names[token] for token in artist_tokens if token in self.artist_names}
+            for token in names:
+                self.artist_names.move_to_end(token)
+        return names, list({token for token in artist_tokens if token not in names})
+
+    def get_artist_names(self, artist_tokens: list[str]):
+        names, missing_tokens = self._get_cached_artist_names(artist_tokens=artist_tokens)
+        if missing_tokens:
+            data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.artists,
+                                       target={'_id': {'$in': missing_tokens}}, project={'name': 1})
+            missing_names = {el['_id']: el['name'] for el in data}
+            self._cache_artist_names(missing_names)
+            names.update(missing_names)
+        return names
+
+    def get_mv_track_ids(self, platform: Platforms):
+        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.tracks,
+                                   target={'mv_pass': True, 'sources.platform': platform.value},
+                                   project={'_id': 0, 'sources': 1})
+        return [source['platform_id'] for el in data for source in el['sources'] if source['platform'] == platform.value]
 
     def get_artists(self, artist_tokens: list[str]):
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.artists,
@@ -98,6 +315,7 @@ class DBEngine:
     def add_general_info(self, info: GeneralInfo):
         data = info.model_dump(by_alias=True, mode='json')
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.info, data=data)
+        self.info_cache.pop(InfoTypes.general, None)
 
     def get_info(self, info_type: InfoTypes):
         data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.info,
@@ -106,6 +324,19 @@ class DBEngine:
             return GeneralInfo.model_validate(data)
         return None
 
+    def get_cached_info(self, info_type: InfoTypes):
+        cached = self.info_cache.get(info_type)
+        if cached is None or cached[0] < time.monotonic():
+            return self._refresh_info_cache(info_type=info_type)
+        return cached[1]
+
+    def _refresh_info_cache(self, info_type: InfoTypes):
+        return self._set_cached_info(info_type=info_type, info=self.get_info(info_type=info_type))
+
+    def _set_cached_info(self, info_type: InfoTypes, info: GeneralInfo):
+        self.info_cache[info_type] = (time.monotonic() + self.info_cache_ttl.total_seconds(), info)
+        return info
+
     def update_general_info(self,
                             network_coverage: int = None,
                             landing_page_view_count: int = None):
@@ -119,16 +350,22 @@ class DBEngine:
             self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.info,
                                       target={'_id': InfoTypes.general.value},
                                       update_query={'$set': update_query})
+            self.info_cache.pop(InfoTypes.general, None)
 
     def incr_landing_page_view_count(self, amount: int = 1):
         self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.info,
                                   target={'_id': InfoTypes.general.value},
                                   update_query={'$inc': {'landing_page_view_count': amount}})
 
+    def _flush_landing_page_view_count(self, amount: int):
+        self.incr_landing_page_view_count(amount=amount)
+        self.info_cache.pop(InfoTypes.general, None)
+
     def set_last_snapshot_timestamp(self, date: datetime):
         self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.info,
                                   target={'_id': InfoTypes.general.value},
                                   update_query={'$set': {'last_snapshot_timestamp': date}})
+        self.info_cache.pop(InfoTypes.general, None)
 
     def get_config(self, config_type: ConfigTypes):
         data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.configs,
@@ -150,24 +387,48 @@ class DBEngine:
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.join_members, data=data)
         return True
 
-    def get_join_members(self, offset: int = 0, limit: int = 0, target: dict = None):
+    def get_join_members(self, offset: int = 0, limit: int = 0, target: dict = None, trusted: bool = False,
+                         fields: list[str] = None):
         sort = [('last_sent_news_date', 1), ('signed_up', -1)]
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.join_members,
                                    target=target if target is not None else {},
+                                   project=get_projection(model=JoinMember, fields=fields) if fields else None,
                                    sort=sort, skip=offset, limit=limit)
-        return [JoinMember.model_validate(el) for el in data]
+        return decode(model=JoinMember, data=data, trusted=trusted, fields=fields)
+
+    def iter_join_members(self, target: dict = None, page_size: int = 500, trusted: bool = False,
+                          fields: list[str] = None):
+        target = target if target is not None else {}
+        project = get_projection(model=JoinMember, fields=fields) if fields else None
+        last_token = None
+        while True:
+            page_target = {'$and': [target, {'_id': {'$gt': last_token}}]} if last_token is not None else target
+            data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.join_members, target=page_target,
+                                       project=project, sort=[('_id', 1)], limit=page_size)
+            members = decode(model=JoinMember, data=data, trusted=trusted, fields=fields)
+            if members:
+                yield members
+            if len(members) < page_size:
+                return
+            last_token = members[-1].token
 
     def update_join_member(self,
                            token: str,
-                           last_sent_news_date: datetime = None):
+                           last_sent_news_date: datetime = None,
+                           batch: BulkWriter = None):
         update_query = {}
         if last_sent_news_date is not None:
             update_query.update({'last_sent_news_date': last_sent_news_date})
 
         if update_query:
-            self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.join_members,
-                                      target={'_id': token},
-                                      update_query={'$set': update_query})
+            self._update_one(key=Keys.join_members, target={'_id': token},
+                             update_query={'$set': update_query}, batch=batch)
+
+    def update_join_members(self, tokens: list[str], last_sent_news_date: datetime):
+        if tokens:
+            self.db_engine.update_many(db=Keys.mv_box_playlists_db, key=Keys.join_members,
+                                       target={'_id': {'$in': tokens}},
+                                       update_query={'$set': {'last_sent_news_date': last_sent_news_date}})
 
     def get_join_members_count(self):
         return self.db_engine.count(db=Keys.mv_box_playlists_db, key=Keys.join_members, target={})
@@ -205,14 +466,212 @@ class DBEngine:
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.email_users, data=data)
 
     def add_top_playlists_snapshot(self, timestamp: datetime, playlists: list[Playlist]):
-        snapshot = TopPlaylistsSnapshot(top_playlists=playlists, timestamp=timestamp)
+        entries = [SnapshotEntry(token=playlist.token, rank=rank, follower_count=playlist.follower_count,
+                                 mv_track_count=playlist.mv_track_count, sponsored=playlist.sponsored)
+                   for rank, playlist in enumerate(playlists, start=1)]
+        snapshot = CompactTopPlaylistsSnapshot(entries=entries, timestamp=timestamp)
         data = snapshot.model_dump(by_alias=True, mode='json')
         self.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots, data=data)
+        self._cache_snapshot_playlists(playlists=playlists)
+
+    def _cache_snapshot_playlists(self, playlists: list[Playlist]):
+        with self.snapshot_playlists_lock:
+            for playlist in playlists:
+                self.snapshot_playlists[playlist.token] = playlist
+                self.snapshot_playlists.move_to_end(playlist.token)
+            while len(self.snapshot_playlists) > self.snapshot_playlist_cache_size:
+                self.snapshot_playlists.popitem(last=False)
+
+    def _get_snapshot_playlists(self, playlist_tokens: list[str]):
+        with self.snapshot_playlists_lock:
+            playlists = {token: self.snapshot_playlists[token] for token in playlist_tokens
+                         if token in self.snapshot_playlists}
+            for token in playlists:
+                self.snapshot_playlists.move_to_end(token)
+
+        if missing_tokens := list({token for token in playlist_tokens if token not in playlists}):
+            data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                       target={'_id': {'$in': missing_tokens}})
+            missing_playlists = [Playlist.model_validate(el) for el in data]
+            self._cache_snapshot_playlists(playlists=missing_playlists)
+            playlists.update({playlist.token: playlist for playlist in missing_playlists})
+        return playlists
+
+    def _resolve_top_playlists_snapshots(self, data: list[dict]):
+        snapshots = [TopPlaylistsSnapshot.model_validate(el) if 'top_playlists' in el
+                     else CompactTopPlaylistsSnapshot.model_validate(el) for el in data]
+        playlists = self._get_snapshot_playlists(playlist_tokens=[entry.token for snapshot in snapshots
+                                                                  if isinstance(snapshot, CompactTopPlaylistsSnapshot)
+                                                                  for entry in snapshot.entries])
+        resolved_snapshots = []
+        for snapshot in snapshots:
+            if isinstance(snapshot, CompactTopPlaylistsSnapshot):
+                top_playlists = [playlists[entry.token].model_copy(update={'follower_count': entry.follower_count,
+                                                                           'mv_track_count': entry.mv_track_count,
+                                                                           'sponsored': entry.sponsored})
+                                 for entry in snapshot.entries if entry.token in playlists]
+                snapshot = TopPlaylistsSnapshot(_id=snapshot.token, top_playlists=top_playlists,
+                                                timestamp=snapshot.timestamp)
+            resolved_snapshots.append(snapshot)
+        return resolved_snapshots
 
     def get_top_playlists_snapshots(self, offset: int = 0, limit: int = 0, target: dict = None):
         sort = [('timestamp', -1)]
         data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots,
                                    target=target if target is not None else {},
                                    sort=sort, skip=offset, limit=limit)
-        return [TopPlaylistsSnapshot.model_validate(el) for el in data]
+        return self._resolve_top_playlists_snapshots(data=list(data))
+
+    def get_latest_top_playlists_snapshot(self):
+        snapshots = self.get_top_playlists_snapshots(limit=1)
+        return snapshots[0] if snapshots else None
+
+    @staticmethod
+    def _playlist_history_pipeline(playlist_token: str, start: datetime = None, end: datetime = None,
+                                   limit: int = 0):
+        target = {'entries.token': playlist_token}
+        timestamp_range = {}
+        if start is not None:
+            timestamp_range.update({'$gte': TypeAdapter(datetime).dump_python(start, mode='json')})
+        if end is not None:
+            timestamp_range.update({'$lt': TypeAdapter(datetime).dump_python(end, mode='json')})
+        if timestamp_range:
+            target.update({'timestamp': timestamp_range})
+
+        pipeline = [{'$match': target},
+                    {'$sort': {'timestamp': -1 if limit else 1}}]
+        if limit:
+            pipeline.append({'$limit': limit})
+        pipeline += [{'$project': {'_id': 0, 'timestamp': 1,
+                                   'entry': {'$first': {'$filter': {'input': '$entries',
+                                                                    'cond': {'$eq': ['$$this.token', playlist_token]}}}}}},
+                     {'$sort': {'timestamp': 1}}]
+        return pipeline
+
+    @staticmethod
+    def _to_playlist_history(data: list[dict]):
+        return [PlaylistHistoryPoint(timestamp=el['timestamp'], rank=el['entry']['rank'],
+                                     follower_count=el['entry']['follower_count'],
+                                     mv_track_count=el['entry']['mv_track_count']) for el in data]
+
+    def get_playlist_history(self, playlist_token: str, start: datetime = None, end: datetime = None,
+                             limit: int = 0):
+        pipeline = self._playlist_history_pipeline(playlist_token=playlist_token, start=start, end=end, limit=limit)
+        data = self.db_engine.aggregate(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots,
+                                        pipeline=pipeline)
+        return self._to_playlist_history(data=data)
+
+    def compact_top_playlists_snapshots(self):
+        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots,
+                                   target={'top_playlists': {'$exists': True}})
+        compacted = 0
+        for snapshot in [TopPlaylistsSnapshot.model_validate(el) for el in data]:
+            entries = [SnapshotEntry(token=playlist.token, rank=rank, follower_count=playlist.follower_count,
+                                     mv_track_count=playlist.mv_track_count, sponsored=playlist.sponsored)
+                       for rank, playlist in enumerate(snapshot.top_playlists, start=1)]
+            self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots,
+                                      target={'_id': snapshot.token},
+                                      update_query={'$set': {'entries': [entry.model_dump() for entry in entries]},
+                                                    '$unset': {'top_playlists': ''}})
+            compacted += 1
+        return compacted
+
+    def get_playlist(self, playlist_token: str):
+        data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.playlists,
+                                       target={'_id': playlist_token})
+        return Playlist.model_validate(data) if data else None
+
+    def enqueue_ingestion_job(self, platform_id: str, platform: Platforms):
+        job = IngestionJob(platform=platform, platform_id=platform_id)
+        target = {'platform_id': platform_id, 'platform': platform.value}
+        try:
+            data = self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                                      target=target,
+                                                      update_query={'$setOnInsert': job.model_dump(by_alias=True,
+                                                                                                   mode='json',
+                                                                                                   exclude={'updated_at'})},
+                                                      upsert=True)
+        except DuplicateKeyError:
+            data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs, target=target)
+        job = IngestionJob.model_validate(data)
+        if job.status in (IngestionStatus.done, IngestionStatus.failed):
+            data = self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                                      target={**target, 'status': job.status.value},
+                                                      update_query={'$set': {'status': IngestionStatus.queued.value,
+                                                                             'attempts': 0,
+                                                                             'playlist_token': None,
+                                                                             'error': None,
+                                                                             'updated_at': datetime.now(timezone.utc)}})
+            job = IngestionJob.model_validate(data) if data else self.get_ingestion_job(job_token=job.token)
+        return job
+
+    def get_ingestion_job(self, job_token: str):
+        data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                       target={'_id': job_token})
+        return IngestionJob.model_validate(data) if data else None
+
+    def claim_ingestion_job(self):
+        data = self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                                  target={'status': IngestionStatus.queued.value},
+                                                  update_query={'$set': {'status': IngestionStatus.processing.value,
+                                                                         'updated_at': datetime.now(timezone.utc)},
+                                                                '$inc': {'attempts': 1}},
+                                                  sort=[('_id', 1)])
+        return IngestionJob.model_validate(data) if data else None
+
+    def finish_ingestion_job(self, job_token: str, playlist_token: str = None, error: str = None):
+        status = IngestionStatus.failed if error is not None else IngestionStatus.done
+        self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                  target={'_id': job_token},
+                                  update_query={'$set': {'status': status.value,
+                                                         'playlist_token': playlist_token,
+                                                         'error': error,
+                                                         'updated_at': datetime.now(timezone.utc)}})
+
+    def requeue_stale_ingestion_jobs(self, stale_after: timedelta, max_attempts: int = 3):
+        target = {'status': IngestionStatus.processing.value,
+                  'updated_at': {'$lt': datetime.now(timezone.utc) - stale_after}}
+        self.db_engine.update_many(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                   target={**target, 'attempts': {'$gte': max_attempts}},
+                                   update_query={'$set': {'status': IngestionStatus.failed.value,
+                                                          'error': 'Too many attempts',
+                                                          'updated_at': datetime.now(timezone.utc)}})
+        result = self.db_engine.update_many(db=Keys.mv_box_playlists_db, key=Keys.ingestion_jobs,
+                                            target={**target, 'attempts': {'$lt': max_attempts}},
+                                            update_query={'$set': {'status': IngestionStatus.queued.value,
+                                                                   'updated_at': datetime.now(timezone.utc)}})
+        return result.modified_count
+
+    def get_playlist_schedules(self):
+        data = self.db_engine.find(db=Keys.mv_box_playlists_db, key=Keys.playlist_schedules, target={})
+        return [PlaylistSchedule.model_validate(el) for el in data]
+
+    def save_playlist_schedule(self, schedule: PlaylistSchedule, batch: BulkWriter = None):
+        data = schedule.model_dump(by_alias=True, mode='json', exclude={'playlist_token'})
+        self._update_one(key=Keys.playlist_schedules, target={'_id': schedule.playlist_token},
+                         update_query={'$set': data}, upsert=True, batch=batch)
+
+    def acquire_job_lease(self, job: str, owner: str, ttl: timedelta):
+        now = datetime.now(timezone.utc)
+        try:
+            data = self.db_engine.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.job_leases,
+                                                      target={'_id': job,
+                                                              '$or': [{'owner': owner},
+                                                                      {'expires_at': {'$lt': now}}]},
+                                                      update_query={'$set': {'owner': owner,
+                                                                             'expires_at': now + ttl,
+                                                                             'heartbeat_at': now}},
+                                                      upsert=True)
+        except DuplicateKeyError:
+            return False
+        return data is not None and data['owner'] == owner
+
+    def release_job_lease(self, job: str, owner: str):
+        result = self.db_engine.update_one(db=Keys.mv_box_playlists_db, key=Keys.job_leases,
+                                           target={'_id': job, 'owner': owner},
+                                           update_query={'$set': {'expires_at': datetime.now(timezone.utc)}})
+        return result.modified_count > 0
 
+    def get_job_lease(self, job: str):
+        data = self.db_engine.find_one(db=Keys.mv_box_playlists_db, key=Keys.job_leases, target={'_id': job})
+        return JobLease.model_validate(data) if data else None
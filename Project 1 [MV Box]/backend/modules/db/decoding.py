@@ -0,0 +1,82 @@
+import enum
+import functools
+import types
+import typing
+from collections import namedtuple
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _get_converter(annotation: object):
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return _get_converter(args[0]) if len(args) == 1 else None
+    if origin in (list, set, tuple):
+        args = typing.get_args(annotation)
+        if not args or (converter := _get_converter(args[0])) is None:
+            return origin if origin is not list else None
+        return lambda value: origin(converter(el) for el in value)
+    if isinstance(annotation, type):
+        if issubclass(annotation, enum.Enum):
+            members = annotation._value2member_map_
+            return lambda value: members[value] if value in members else annotation(value)
+        if issubclass(annotation, BaseModel):
+            return RecordDecoder.get(annotation)
+        if issubclass(annotation, datetime):
+            return _parse_datetime
+    return None
+
+
+class RecordDecoder:
+    def __init__(self, model: type[BaseModel], fields: tuple[str, ...] = None):
+        names = list(fields) if fields is not None else list(model.model_fields)
+        for name, field in model.model_fields.items():
+            if field.alias == '_id' and name not in names:
+                names.insert(0, name)
+
+        self.model = model
+        self.record_type = namedtuple(f'{model.__name__}Record', names)
+        self.keys = []
+        self.converters = []
+        for idx, name in enumerate(names):
+            if (field := model.model_fields.get(name)) is None:
+                raise ValueError(f'Unknown field [{name}] for [{model.__name__}]')
+            self.keys.append((field.alias or name, None if field.is_required() else field.default))
+            if (converter := _get_converter(field.annotation)) is not None:
+                self.converters.append((idx, converter))
+
+    @classmethod
+    @functools.cache
+    def get(cls, model: type[BaseModel], fields: tuple[str, ...] = None):
+        return cls(model, fields)
+
+    def __call__(self, data: dict):
+        values = [data.get(key, default) for key, default in self.keys]
+        for idx, converter in self.converters:
+            if values[idx] is not None:
+                values[idx] = converter(values[idx])
+        return tuple.__new__(self.record_type, values)
+
+
+def get_projection(model: type[BaseModel], fields: list[str]):
+    projection = {}
+    for name in fields:
+        if (field := model.model_fields.get(name)) is None:
+            raise ValueError(f'Unknown field [{name}] for [{model.__name__}]')
+        projection[field.alias or name] = 1
+    return projection
+
+
+def decode(model: type[BaseModel], data: typing.Iterable[dict], trusted: bool = False, fields: list[str] = None):
+    if trusted:
+        decoder = RecordDecoder.get(model, tuple(fields) if fields is not None else None)
+        return [decoder(el) for el in data]
+    if fields is not None:
+        raise ValueError('Field projections require trusted decoding')
+    return [model.model_validate(el) for el in data]
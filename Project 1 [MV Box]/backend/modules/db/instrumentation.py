@@ -0,0 +1,225 @@
+import bisect
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone, timedelta
+from threading import Lock
+
+from pydantic import BaseModel
+
+from backend.modules.tools import sprint, Colors
+
+current_scope: ContextVar[str | None] = ContextVar('current_scope', default=None)
+
+
+@contextmanager
+def operation_scope(name: str):
+    token = current_scope.set(name)
+    try:
+        yield
+    finally:
+        current_scope.reset(token)
+
+
+def scoped(name: str, target: object):
+    def run(*args, **kwargs):
+        with operation_scope(name):
+            return target(*args, **kwargs)
+    return run
+
+
+def get_filter_shape(target: object):
+    if isinstance(target, dict):
+        return {key: get_filter_shape(value) for key, value in target.items()}
+    if isinstance(target, list):
+        return [get_filter_shape(el) for el in target if isinstance(el, dict)] or '?'
+    return '?'
+
+
+def summarize_plan(plan: dict):
+    stages = []
+    while isinstance(plan, dict) and plan.get('stage'):
+        stages.append(f'{plan["stage"]}({plan["indexName"]})' if 'indexName' in plan else plan['stage'])
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return ' <- '.join(stages)
+
+
+class LatencyHistogram:
+    bounds_ms = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.
+        self.max_ms = 0.
+
+    def observe(self, elapsed_ms: float, failed: bool = False):
+        self.buckets[bisect.bisect_left(self.bounds_ms, elapsed_ms)] += 1
+        self.count += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q: float):
+        if not self.count:
+            return 0.
+        rank = q * self.count
+        seen = 0
+        for idx, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(self.bounds_ms[idx], self.max_ms) if idx < len(self.bounds_ms) else self.max_ms
+        return self.max_ms
+
+
+class OperationStats(BaseModel):
+    scope: str | None
+    collection: str
+    operation: str
+    count: int
+    errors: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class SlowQuery(BaseModel):
+    timestamp: datetime
+    scope: str | None
+    collection: str
+    operation: str
+    elapsed_ms: float
+    filter_shape: dict | list | str | None = None
+    plan: str | None = None
+
+
+class MetricsSnapshot(BaseModel):
+    started_at: datetime
+    operations: list[OperationStats]
+    slow_queries: list[SlowQuery]
+
+
+class OperationMetrics:
+    def __init__(self, slow_threshold: timedelta = timedelta(milliseconds=100), explain_slow_queries: bool = False,
+                 slow_log_size: int = 100, marker: str = None, verbose: bool = True):
+        self.slow_threshold_ms = slow_threshold.total_seconds() * 1000
+        self.explain_slow_queries = explain_slow_queries
+        self.marker = marker
+        self.verbose = verbose
+
+        self.histograms: dict[tuple[str | None, str, str], LatencyHistogram] = {}
+        self.slow_queries: deque[SlowQuery] = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now(timezone.utc)
+        self.lock = Lock()
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.slow_queries.clear()
+            self.started_at = datetime.now(timezone.utc)
+
+    def record(self, collection: str, operation: str, elapsed: float, target: object = None,
+               explain: object = None, failed: bool = False, scope: str = None):
+        elapsed_ms = elapsed * 1000
+        scope = scope or current_scope.get()
+        key = (scope, collection, operation)
+        with self.lock:
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.observe(elapsed_ms=elapsed_ms, failed=failed)
+
+        if elapsed_ms >= self.slow_threshold_ms:
+            plan = None
+            if self.explain_slow_queries and explain is not None:
+                try:
+                    plan = summarize_plan(explain()['queryPlanner']['winningPlan'])
+                except Exception as ex:
+                    plan = f'explain failed: {ex}'
+            slow_query = SlowQuery(timestamp=datetime.now(timezone.utc), scope=scope, collection=collection,
+                                   operation=operation, elapsed_ms=round(elapsed_ms, 3),
+                                   filter_shape=get_filter_shape(target) if target is not None else None, plan=plan)
+            with self.lock:
+                self.slow_queries.append(slow_query)
+            if self.verbose:
+                sprint(f'[MONGO_DB] [{self.marker}] [SLOW QUERY] [{scope}] [{collection}.{operation}] '
+                       f'[{elapsed_ms:.1f}ms] [{slow_query.filter_shape}]' + (f' [{plan}]' if plan else ''),
+                       Colors.light_yellow)
+
+    @contextmanager
+    def measure(self, collection: str, operation: str, target: object = None, explain: object = None):
+        started_at = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.record(collection=collection, operation=operation, elapsed=time.perf_counter() - started_at,
+                        target=target, explain=explain, failed=failed)
+
+    def snapshot(self):
+        with self.lock:
+            histograms = list(self.histograms.items())
+            slow_queries = list(self.slow_queries)
+        operations = [OperationStats(scope=scope, collection=collection, operation=operation,
+                                     count=histogram.count, errors=histogram.errors,
+                                     total_ms=round(histogram.total_ms, 3),
+                                     mean_ms=round(histogram.total_ms / histogram.count, 3),
+                                     max_ms=round(histogram.max_ms, 3),
+                                     p50_ms=histogram.percentile(0.5), p95_ms=histogram.percentile(0.95),
+                                     p99_ms=histogram.percentile(0.99))
+                      for (scope, collection, operation), histogram in histograms]
+        operations.sort(key=lambda x: x.total_ms, reverse=True)
+        return MetricsSnapshot(started_at=self.started_at, operations=operations, slow_queries=slow_queries)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor: object, metrics: OperationMetrics, collection: str, operation: str,
+                 target: object = None, explain: object = None, elapsed: float = 0.):
+        self.cursor = cursor
+        self.metrics = metrics
+        self.collection = collection
+        self.operation = operation
+        self.target = target
+        self.explain = explain
+        self.elapsed = elapsed
+        self.scope = current_scope.get()
+        self.recorded = False
+
+    def __getattr__(self, item: str):
+        return getattr(self.cursor, item)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started_at = time.perf_counter()
+        try:
+            data = next(self.cursor)
+        except StopIteration:
+            self.elapsed += time.perf_counter() - started_at
+            self._record(failed=False, explain=self.explain)
+            raise
+        except Exception:
+            self.elapsed += time.perf_counter() - started_at
+            self._record(failed=True, explain=self.explain)
+            raise
+        self.elapsed += time.perf_counter() - started_at
+        return data
+
+    def __del__(self):
+        if not self.__dict__.get('recorded', True):
+            self._record(failed=False)
+
+    def _record(self, failed: bool, explain: object = None):
+        if self.recorded:
+            return
+        self.recorded = True
+        self.metrics.record(collection=self.collection, operation=self.operation, elapsed=self.elapsed,
+                            target=self.target, explain=explain, failed=failed, scope=self.scope)
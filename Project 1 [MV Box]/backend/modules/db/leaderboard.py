@@ -0,0 +1,189 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone, timedelta
+from threading import RLock, Lock
+
+from pydantic import BaseModel
+
+from backend.modules.db.models import Playlist
+from backend.modules.tools import encode_cursor, decode_cursor
+
+
+class LeaderboardPage(BaseModel):
+    offset: int
+    next_offset: int | None
+    next_cursor: str | None = None
+    playlists: list[Playlist]
+
+
+class PlaylistRanking:
+    def __init__(self, playlists: list[Playlist] = None):
+        self.playlists: dict[str, Playlist] = {playlist.token: playlist for playlist in playlists or []}
+        self.keys = sorted(self.get_key(playlist) for playlist in self.playlists.values())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, playlist_token: str):
+        return playlist_token in self.playlists
+
+    @staticmethod
+    def get_key(playlist: Playlist):
+        return -playlist.mv_track_count, -playlist.follower_count, playlist.token
+
+    @staticmethod
+    def get_cursor_values(playlist: Playlist):
+        return [playlist.mv_track_count, playlist.follower_count, playlist.token]
+
+    @staticmethod
+    def validate_cursor_values(cursor_values: list):
+        return (isinstance(cursor_values, list) and len(cursor_values) == 3 and
+                all(type(el) is int for el in cursor_values[:2]) and isinstance(cursor_values[2], str))
+
+    def position_after(self, cursor_values: list):
+        mv_track_count, follower_count, token = cursor_values
+        return bisect_right(self.keys, (-mv_track_count, -follower_count, token))
+
+    def add(self, playlist: Playlist):
+        self.playlists[playlist.token] = playlist
+        insort(self.keys, self.get_key(playlist))
+
+    def remove(self, playlist_token: str):
+        playlist = self.playlists.pop(playlist_token)
+        key = self.get_key(playlist)
+        del self.keys[bisect_left(self.keys, key)]
+        return playlist
+
+    def slice(self, start: int, stop: int):
+        return [self.playlists[key[2]] for key in self.keys[start:stop]]
+
+
+class Leaderboard:
+    ranking_fields = ['platform', 'platform_id', 'name', 'image_path', 'follower_count', 'mv_track_count', 'sponsored']
+
+    def __init__(self, loader: object, page_size: int = 10, max_staleness: timedelta = timedelta(minutes=5),
+                 page_cache_size: int = 256):
+        self.loader = loader
+        self.page_size = page_size
+        self.max_staleness = max_staleness
+        self.page_cache_size = page_cache_size
+
+        self.top = PlaylistRanking()
+        self.sponsored = PlaylistRanking()
+        self.loaded_at: datetime | None = None
+        self.version = 0
+        self.pages: dict[tuple[int, str | None], bytes] = {}
+        self.lock = RLock()
+        self.reload_lock = Lock()
+
+    def _changed(self):
+        self.version += 1
+        self.pages.clear()
+
+    def is_stale(self):
+        return self.loaded_at is None or datetime.now(timezone.utc) - self.loaded_at > self.max_staleness
+
+    def _ensure_loaded(self):
+        if not self.is_stale():
+            return
+        if self.loaded_at is None:
+            with self.reload_lock:
+                if self.is_stale():
+                    self.reload()
+        elif self.reload_lock.acquire(blocking=False):
+            try:
+                if self.is_stale():
+                    self.reload()
+            finally:
+                self.reload_lock.release()
+
+    def _get_ranking(self, playlist: Playlist):
+        return self.sponsored if playlist.sponsored else self.top
+
+    def reload(self):
+        self.load(*self.loader())
+
+    @staticmethod
+    def _to_playlist(record):
+        return record if isinstance(record, Playlist) else Playlist.model_construct(**record._asdict())
+
+    def load(self, top_playlists: list, sponsored_playlists: list):
+        top = PlaylistRanking([self._to_playlist(el) for el in top_playlists])
+        sponsored = PlaylistRanking([self._to_playlist(el) for el in sponsored_playlists])
+        with self.lock:
+            changed = top.playlists != self.top.playlists or sponsored.playlists != self.sponsored.playlists
+            self.top = top
+            self.sponsored = sponsored
+            self.loaded_at = datetime.now(timezone.utc)
+            if changed:
+                self._changed()
+
+    def add(self, playlist: Playlist):
+        with self.lock:
+            if self.loaded_at is None or not playlist.competing:
+                return
+            ranking = self._get_ranking(playlist)
+            if playlist.token not in ranking:
+                ranking.add(playlist.model_copy())
+                self._changed()
+
+    def update(self, playlist_token: str, mv_track_count: int = None, follower_count: int = None):
+        with self.lock:
+            for ranking in (self.top, self.sponsored):
+                if playlist_token in ranking:
+                    playlist = ranking.remove(playlist_token)
+                    if mv_track_count is not None:
+                        playlist.mv_track_count = mv_track_count
+                    if follower_count is not None:
+                        playlist.follower_count = follower_count
+                    ranking.add(playlist)
+                    self._changed()
+                    return True
+            return False
+
+    @staticmethod
+    def parse_cursor(cursor: str):
+        values = decode_cursor(cursor)
+        if (not isinstance(values, list) or len(values) != 2 or not PlaylistRanking.validate_cursor_values(values[0]) or
+                not (values[1] is None or PlaylistRanking.validate_cursor_values(values[1]))):
+            raise ValueError('Invalid cursor')
+        return values
+
+    def get_page(self, offset: int = 0, cursor: str = None):
+        self._ensure_loaded()
+        with self.lock:
+            top_start = sponsored_start = offset
+            sponsored_cursor = None
+            if cursor is not None:
+                top_cursor, sponsored_cursor = self.parse_cursor(cursor)
+                top_start = self.top.position_after(top_cursor)
+                sponsored_start = self.sponsored.position_after(sponsored_cursor) if sponsored_cursor else 0
+
+            next_offset = None
+            next_cursor = None
+            playlists = self.top.slice(top_start, top_start + self.page_size + 1)
+            sponsored_playlists = self.sponsored.slice(sponsored_start, sponsored_start + self.page_size)
+            if len(playlists) == self.page_size + 1:
+                playlists.pop()
+                next_offset = offset + self.page_size if cursor is None else None
+                if sponsored_playlists:
+                    sponsored_cursor = PlaylistRanking.get_cursor_values(sponsored_playlists[-1])
+                next_cursor = encode_cursor([PlaylistRanking.get_cursor_values(playlists[-1]), sponsored_cursor])
+
+            sponsor_idx = -2
+            for spl in sponsored_playlists:
+                sponsor_idx += 3
+                playlists.insert(sponsor_idx, spl)
+
+            return LeaderboardPage(offset=offset, next_offset=next_offset, next_cursor=next_cursor,
+                                   playlists=playlists)
+
+    def get_rendered_page(self, render: object, offset: int = 0, cursor: str = None) -> bytes:
+        self._ensure_loaded()
+        with self.lock:
+            page_key = (offset, cursor)
+            if (content := self.pages.get(page_key)) is None:
+                content = render(self.get_page(offset=offset, cursor=cursor))
+                if len(self.pages) >= self.page_cache_size:
+                    self.pages.pop(next(iter(self.pages)))
+                self.pages[page_key] = content
+            return content
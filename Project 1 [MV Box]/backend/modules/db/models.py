@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
 import uuid6
@@ -17,6 +17,9 @@ class Keys(Enum):
     configs = 'configs'
     spotify_users = 'spotify_users'
     email_users = 'email_users'
+    ingestion_jobs = 'ingestion_jobs'
+    playlist_schedules = 'playlist_schedules'
+    job_leases = 'job_leases'
     test = 'test'
 
     @classmethod
@@ -26,6 +29,33 @@ class Keys(Enum):
                 el._value_ = f'{prefix}_{el.value}'
 
 
+class CollectionIndex(BaseModel):
+    key: Keys
+    fields: list[tuple[str, int]]
+    unique: bool = False
+
+
+COLLECTION_INDEXES = [
+    CollectionIndex(key=Keys.playlists, fields=[('platform_id', 1), ('platform', 1)]),
+    CollectionIndex(key=Keys.playlists, fields=[('competing', 1), ('sponsored', 1),
+                                                ('mv_track_count', -1), ('follower_count', -1), ('_id', 1)]),
+    CollectionIndex(key=Keys.playlists, fields=[('competing', 1), ('mv_track_count', -1), ('follower_count', -1)]),
+    CollectionIndex(key=Keys.tracks, fields=[('mv_pass', 1), ('_id', 1)]),
+    CollectionIndex(key=Keys.tracks, fields=[('sources.platform_id', 1), ('sources.platform', 1)]),
+    CollectionIndex(key=Keys.artists, fields=[('sources.platform_id', 1), ('sources.platform', 1)]),
+    CollectionIndex(key=Keys.join_members, fields=[('email', 1)]),
+    CollectionIndex(key=Keys.join_members, fields=[('last_sent_news_date', 1), ('signed_up', -1)]),
+    CollectionIndex(key=Keys.join_members, fields=[('news_subscription', 1), ('_id', 1)]),
+    CollectionIndex(key=Keys.spotify_users, fields=[('spotify_id', 1)]),
+    CollectionIndex(key=Keys.email_users, fields=[('slug', 1)]),
+    CollectionIndex(key=Keys.top_playlists_snapshots, fields=[('timestamp', -1)]),
+    CollectionIndex(key=Keys.top_playlists_snapshots, fields=[('entries.token', 1), ('timestamp', 1)]),
+    CollectionIndex(key=Keys.ingestion_jobs, fields=[('platform_id', 1), ('platform', 1)], unique=True),
+    CollectionIndex(key=Keys.ingestion_jobs, fields=[('status', 1), ('_id', 1)]),
+    CollectionIndex(key=Keys.ingestion_jobs, fields=[('status', 1), ('updated_at', 1)]),
+]
+
+
 class Platforms(Enum):
     spotify = 'spotify'
 
@@ -45,6 +75,8 @@ class Playlist(BaseModel):
     track_count: int
     mv_track_count: int = 0
     sponsored: bool = False
+    snapshot_id: str | None = None
+    whitelist_version: int | None = None
 
     competing: bool = True
 
@@ -55,6 +87,27 @@ class TopPlaylistsSnapshot(BaseModel):
     timestamp: datetime
 
 
+class SnapshotEntry(BaseModel):
+    token: str
+    rank: int
+    follower_count: int
+    mv_track_count: int
+    sponsored: bool = False
+
+
+class CompactTopPlaylistsSnapshot(BaseModel):
+    token: str = Field(default_factory=lambda: uuid6.uuid7().hex, alias='_id')
+    entries: list[SnapshotEntry]
+    timestamp: datetime
+
+
+class PlaylistHistoryPoint(BaseModel):
+    timestamp: datetime
+    rank: int
+    follower_count: int
+    mv_track_count: int
+
+
 class TrackSource(BaseModel):
     platform: Platforms
     platform_id: str
@@ -71,6 +124,16 @@ class Track(BaseModel):
     mv_pass: bool
 
 
+class MVTrackRecord(BaseModel):
+    token: str = Field(alias='_id')
+    artist_token: str | None = None
+    artist_name: str | None = None
+    sources: list[TrackSource]
+
+    name: str
+    image_path: str
+
+
 class ArtistSource(BaseModel):
     platform: Platforms
     platform_id: str
@@ -88,6 +151,7 @@ class Artist(BaseModel):
 
 class InfoTypes(Enum):
     general = 'general'
+    whitelist = 'whitelist'
 
 
 class GeneralInfo(BaseModel):
@@ -154,3 +218,35 @@ class EmailUser(BaseModel):
     domain: str
     region: str
 
+
+class IngestionStatus(Enum):
+    queued = 'queued'
+    processing = 'processing'
+    done = 'done'
+    failed = 'failed'
+
+
+class IngestionJob(BaseModel):
+    token: str = Field(default_factory=lambda: uuid6.uuid7().hex, alias='_id')
+    platform: Platforms
+    platform_id: str
+    status: IngestionStatus = IngestionStatus.queued
+    attempts: int = 0
+    playlist_token: str | None = None
+    error: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime | None = None
+
+
+class PlaylistSchedule(BaseModel):
+    playlist_token: str = Field(alias='_id')
+    change_rate: float = 0.05
+    interval: int = 24
+    next_refresh_at: datetime
+
+
+class JobLease(BaseModel):
+    job: str = Field(alias='_id')
+    owner: str
+    expires_at: datetime
+    heartbeat_at: datetime
@@ -1,24 +1,31 @@
+import time
 from urllib.parse import quote_plus
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from pymongo.client_session import ClientSession
 from pymongo.server_api import ServerApi
 
-from backend.modules.db.models import Keys
+from backend.modules.db.instrumentation import OperationMetrics, InstrumentedCursor
+from backend.modules.db.models import Keys, CollectionIndex
 from backend.modules.tools import sprint, Colors
 
 
 class MongoEngine:
-    def __init__(self, host: str, username: str, password: str, port: int = None, marker: str = None,
-                 verbose: bool = True):
-        connection_url = f'mongodb+srv://{quote_plus(username)}:{quote_plus(password)}@{quote_plus(host)}/?retryWrites=true&w=majority'
+    def __init__(self, host: str = None, username: str = None, password: str = None, port: int = None,
+                 marker: str = None, verbose: bool = True, plan_check: bool = False, connection_url: str = None,
+                 event_listeners: list = None, metrics: OperationMetrics = None):
+        if connection_url is None:
+            connection_url = f'mongodb+srv://{quote_plus(username)}:{quote_plus(password)}@{quote_plus(host)}/?retryWrites=true&w=majority'
 
         self.verbose = verbose
         self.marker = marker
+        self.plan_check = plan_check
+        self.metrics = metrics or OperationMetrics(marker=marker, verbose=verbose)
 
         if self.verbose:
             sprint(f'[MONGO_DB] [{marker}] [CONNECTING]', Colors.light_green)
-        self.engine = MongoClient(host=connection_url, port=port, server_api=ServerApi('1'))
+        self.engine = MongoClient(host=connection_url, port=port, server_api=ServerApi('1'),
+                                  event_listeners=event_listeners or [])
         self.session: ClientSession | None = None
 
     def __del__(self):
@@ -37,53 +44,142 @@ class MongoEngine:
             self.session.abort_transaction()
             self.session = None
 
+    def ensure_indexes(self, db: Keys, indexes: list[CollectionIndex]):
+        for index in indexes:
+            name = self.engine[db.value][index.key.value].create_index(index.fields, unique=index.unique)
+            if self.verbose:
+                sprint(f'[MONGO_DB] [{self.marker}] [INDEX] [{index.key.value}] [{name}]', Colors.light_blue)
+
+    @classmethod
+    def _has_collscan(cls, plan: dict | list):
+        if isinstance(plan, list):
+            return any(cls._has_collscan(el) for el in plan)
+        if isinstance(plan, dict):
+            return plan.get('stage') == 'COLLSCAN' or any(cls._has_collscan(el) for el in plan.values())
+        return False
+
+    def _check_plan(self, db: Keys, key: Keys, target: dict, sort: list[tuple] = None):
+        if not self.plan_check or key is Keys.test or (not target and not sort):
+            return
+        plan = self._explain(db=db, key=key, target=target, sort=sort)()
+        if self._has_collscan(plan['queryPlanner']['winningPlan']):
+            raise Exception(f'[MONGO_DB] [{self.marker}] COLLSCAN on [{key.value}] [{target}] [{sort}]')
+
+    def _explain(self, db: Keys, key: Keys, target: dict, sort: list[tuple] = None):
+        return lambda: self.engine[db.value][key.value].find(filter=target, sort=sort).explain()
+
+    def _measure(self, db: Keys, key: Keys, operation: str, target: dict = None, sort: list[tuple] = None):
+        explain = self._explain(db=db, key=key, target=target, sort=sort) if target else None
+        return self.metrics.measure(collection=key.value, operation=operation, target=target, explain=explain)
+
+    def _cursor(self, db: Keys, key: Keys, operation: str, create: object, target: dict = None,
+                sort: list[tuple] = None):
+        explain = self._explain(db=db, key=key, target=target, sort=sort) if target else None
+        started_at = time.perf_counter()
+        try:
+            cursor = create()
+        except Exception:
+            self.metrics.record(collection=key.value, operation=operation, elapsed=time.perf_counter() - started_at,
+                                target=target, explain=explain, failed=True)
+            raise
+        return InstrumentedCursor(cursor, metrics=self.metrics, collection=key.value, operation=operation,
+                                  target=target, explain=explain, elapsed=time.perf_counter() - started_at)
+
     def insert(self, db: Keys, key: Keys, data: list[dict] | dict):
         if data:
             if type(data) is list:
-                return self.engine[db.value][key.value].insert_many(data, session=self.session)
+                with self._measure(db=db, key=key, operation='insert_many'):
+                    return self.engine[db.value][key.value].insert_many(data, session=self.session)
             elif type(data) is dict:
-                return self.engine[db.value][key.value].insert_one(data, session=self.session)
+                with self._measure(db=db, key=key, operation='insert_one'):
+                    return self.engine[db.value][key.value].insert_one(data, session=self.session)
         return None
 
     def find_one(self, db: Keys, key: Keys, target: dict, project: dict = None):
         if target is not None:
-            return self.engine[db.value][key.value].find_one(filter=target, projection=project, session=self.session)
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='find_one', target=target):
+                return self.engine[db.value][key.value].find_one(filter=target, projection=project,
+                                                                 session=self.session)
 
     def find(self, db: Keys, key: Keys, target: dict = None, project: dict = None, sort: list[tuple] = None,
              skip: int = 0, limit: int = 0):
         if target is not None:
-            return self.engine[db.value][key.value].find(filter=target if target else {},
-                                                         projection=project, sort=sort,
-                                                         skip=skip, limit=limit, session=self.session)
+            self._check_plan(db=db, key=key, target=target, sort=sort)
+            return self._cursor(db=db, key=key, operation='find', target=target, sort=sort,
+                                create=lambda: self.engine[db.value][key.value].find(filter=target if target else {},
+                                                                                     projection=project, sort=sort,
+                                                                                     skip=skip, limit=limit,
+                                                                                     session=self.session))
+
+    def aggregate(self, db: Keys, key: Keys, pipeline: list[dict]):
+        if pipeline:
+            target = None
+            sort = None
+            if '$match' in pipeline[0]:
+                target = pipeline[0]['$match']
+                sort = list(pipeline[1]['$sort'].items()) if len(pipeline) > 1 and '$sort' in pipeline[1] else None
+                self._check_plan(db=db, key=key, target=target, sort=sort)
+            return self._cursor(db=db, key=key, operation='aggregate', target=target, sort=sort,
+                                create=lambda: self.engine[db.value][key.value].aggregate(pipeline,
+                                                                                          session=self.session))
 
     def update_one(self, db: Keys, key: Keys, target: dict, update_query: dict, upsert: bool = False):
         if update_query is not None:
-            return self.engine[db.value][key.value].update_one(filter=target, update=update_query, upsert=upsert,
-                                                               session=self.session)
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='update_one', target=target):
+                return self.engine[db.value][key.value].update_one(filter=target, update=update_query, upsert=upsert,
+                                                                   session=self.session)
+
+    def find_one_and_update(self, db: Keys, key: Keys, target: dict, update_query: dict, sort: list[tuple] = None,
+                            upsert: bool = False):
+        if update_query is not None:
+            self._check_plan(db=db, key=key, target=target, sort=sort)
+            with self._measure(db=db, key=key, operation='find_one_and_update', target=target, sort=sort):
+                return self.engine[db.value][key.value].find_one_and_update(filter=target, update=update_query,
+                                                                            sort=sort, upsert=upsert,
+                                                                            return_document=ReturnDocument.AFTER,
+                                                                            session=self.session)
 
     def update_many(self, db: Keys, key: Keys, target: dict, update_query: dict, upsert: bool = False):
         if update_query is not None:
-            return self.engine[db.value][key.value].update_many(filter=target, update=update_query, upsert=upsert,
-                                                                session=self.session)
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='update_many', target=target):
+                return self.engine[db.value][key.value].update_many(filter=target, update=update_query,
+                                                                    upsert=upsert, session=self.session)
+
+    def bulk_write(self, db: Keys, key: Keys, operations: list, ordered: bool = True):
+        if operations:
+            with self._measure(db=db, key=key, operation='bulk_write'):
+                return self.engine[db.value][key.value].bulk_write(operations, ordered=ordered,
+                                                                   session=self.session)
 
     def delete_one(self, db: Keys, key: Keys, target: dict):
         if target is not None:
-            return self.engine[db.value][key.value].delete_one(filter=target, session=self.session)
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='delete_one', target=target):
+                return self.engine[db.value][key.value].delete_one(filter=target, session=self.session)
 
     def exists(self, db: Keys, key: Keys, target: dict):
         if target is not None:
-            return bool(self.engine[db.value][key.value].count_documents(filter=target, limit=1, session=self.session))
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='exists', target=target):
+                return bool(self.engine[db.value][key.value].count_documents(filter=target, limit=1,
+                                                                             session=self.session))
 
     def count(self, db: Keys, key: Keys, target: dict):
         if target is not None:
-            return self.engine[db.value][key.value].count_documents(filter=target, session=self.session)
+            self._check_plan(db=db, key=key, target=target)
+            with self._measure(db=db, key=key, operation='count', target=target):
+                return self.engine[db.value][key.value].count_documents(filter=target, session=self.session)
 
     def get_keys(self, db: Keys, key: Keys, target: dict) -> list[str]:
         if target is not None:
-            keys = list(self.engine[db.value][key.value].aggregate([{'$match': target},
-                                                                   {'$project': {'array': {'$objectToArray': '$$ROOT'}}},
-                                                                   {'$project': {'keys': '$array.k', '_id': 0}}],
-                                                                   session=self.session))
+            with self._measure(db=db, key=key, operation='get_keys', target=target):
+                keys = list(self.engine[db.value][key.value].aggregate([{'$match': target},
+                                                                       {'$project': {'array': {'$objectToArray': '$$ROOT'}}},
+                                                                       {'$project': {'keys': '$array.k', '_id': 0}}],
+                                                                       session=self.session))
             return keys[0]['keys'] if keys else []
 
     def drop_collection(self, db: Keys, key: Keys):
@@ -0,0 +1,137 @@
+import math
+import random
+from datetime import datetime, timezone, timedelta
+from threading import RLock, Condition
+
+from pydantic import BaseModel
+
+from backend.modules.tools import encode_cursor, decode_cursor
+
+
+class CursorExpired(ValueError):
+    pass
+
+
+class SamplePage(BaseModel):
+    seed: int
+    offset: int
+    next_offset: int | None
+    next_cursor: str | None = None
+    tokens: list[str]
+
+
+class TrackSampler:
+    seed_limit = 2 ** 31
+
+    def __init__(self, loader: object, reshuffle_interval: timedelta = timedelta(hours=1),
+                 retained_permutations: int = 2):
+        assert retained_permutations > 0, 'At least one permutation must be retained'
+
+        self.loader = loader
+        self.reshuffle_interval = reshuffle_interval
+        self.retained_permutations = retained_permutations
+
+        self.permutations: dict[int, list[str]] = {}
+        self.version = 0
+        self.shuffled_at: datetime | None = None
+        self.reloading = False
+        self.added_tokens: list[str] = []
+        self.lock = RLock()
+        self.condition = Condition(self.lock)
+
+    def _set_permutation(self, tokens: list[str]):
+        self.version += 1
+        self.permutations[self.version] = tokens
+        while len(self.permutations) > self.retained_permutations:
+            self.permutations.pop(min(self.permutations))
+
+    def is_stale(self):
+        return self.shuffled_at is None or datetime.now(timezone.utc) - self.shuffled_at > self.reshuffle_interval
+
+    def claim_reload(self):
+        with self.lock:
+            if self.reloading or not self.is_stale():
+                return False
+            self.reloading = True
+            return True
+
+    def release_reload(self):
+        with self.condition:
+            self.reloading = False
+            self.condition.notify_all()
+
+    def _ensure_shuffled(self):
+        while True:
+            if self.claim_reload():
+                return self.reshuffle()
+            with self.condition:
+                if self.shuffled_at is not None:
+                    return
+                if self.reloading:
+                    self.condition.wait()
+
+    def reshuffle(self, tokens: list[str] = None):
+        try:
+            tokens = list(self.loader() if tokens is None else tokens)
+            random.shuffle(tokens)
+            with self.lock:
+                known_tokens = set(tokens)
+                tokens += [token for token in self.added_tokens if token not in known_tokens]
+                self.added_tokens = []
+                self._set_permutation(tokens)
+                self.shuffled_at = datetime.now(timezone.utc)
+        finally:
+            self.release_reload()
+
+    def add(self, token: str):
+        with self.lock:
+            if self.shuffled_at is None:
+                return
+            self.permutations[self.version].append(token)
+            if self.reloading:
+                self.added_tokens.append(token)
+
+    @staticmethod
+    def get_index_map(seed: int, size: int):
+        rng = random.Random(seed)
+        shift = rng.randrange(size)
+        step = rng.randrange(1, size) if size > 1 else 1
+        while math.gcd(step, size) != 1:
+            step = rng.randrange(1, size)
+        return step, shift
+
+    @staticmethod
+    def parse_cursor(cursor: str):
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != 4 or not all(type(el) is int and el >= 0 for el in values):
+            raise ValueError('Invalid cursor')
+        return values
+
+    def get_page(self, seed: int = None, offset: int = 0, limit: int = 10, cursor: str = None):
+        self._ensure_shuffled()
+        with self.lock:
+            version = self.version
+            if cursor is not None:
+                seed, version, size, offset = self.parse_cursor(cursor)
+                if version not in self.permutations:
+                    raise CursorExpired('Cursor expired')
+                if size > len(self.permutations[version]):
+                    raise ValueError('Invalid cursor')
+            else:
+                size = len(self.permutations[version])
+                if seed is None:
+                    seed = random.randrange(self.seed_limit)
+            tokens = self.permutations[version]
+
+        if size:
+            step, shift = self.get_index_map(seed=seed, size=size)
+            page = [tokens[(step * idx + shift) % size] for idx in range(offset, min(offset + limit, size))]
+        else:
+            page = []
+
+        next_offset = None
+        next_cursor = None
+        if offset + limit < size:
+            next_offset = offset + limit
+            next_cursor = encode_cursor([seed, version, size, next_offset])
+        return SamplePage(seed=seed, offset=offset, next_offset=next_offset, next_cursor=next_cursor, tokens=page)
@@ -1,8 +1,13 @@
+import base64
 import enum
+import heapq
+import json
 import re
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime, timezone
-from threading import Timer
+from threading import Timer, Lock, Condition, Thread
 
 from colorama import Fore, Style
 
@@ -38,6 +43,10 @@ def timedelta_to_hours(delta: timedelta):
     return round(delta.total_seconds() / 3600, 4)
 
 
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
 def hour_rounder(t: datetime):
     return t.replace(second=0, microsecond=0, minute=0)
 
@@ -89,6 +98,49 @@ def group_into_bunches(data: list, bunch_size: int):
     return [data[i:i+bunch_size] for i in range(0, len(data), bunch_size)]
 
 
+def encode_cursor(values: list):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    return try_extract(lambda: json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int = None):
+        assert rate > 0, 'The rate must be greater than 0'
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(int(rate), 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: int = 1):
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: int = 1):
+        assert tokens <= self.capacity, 'Cannot acquire more tokens than the bucket capacity'
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
 class RepeatThread(Timer):
     def run(self):
         while not self.finished.wait(self.interval):
@@ -99,64 +151,184 @@ class CronThreadEvents(enum.Enum):
     terminate = 'terminate'
 
 
+class MisfirePolicies(enum.Enum):
+    run_once = 'run_once'
+    skip = 'skip'
+    catch_up = 'catch_up'
+
+
+class CronScheduler:
+    default_scheduler = None
+    default_lock = Lock()
+
+    def __init__(self, workers: int = 4, misfire_grace_time: timedelta = timedelta(minutes=1),
+                 marker: str = None, silent_mode: bool = False, clock: object = None):
+        assert workers > 0, 'The worker count must be greater than 0'
+
+        self.marker = marker
+        self.clock = clock or utc_now
+        self.misfire_grace_time = misfire_grace_time
+        self.silent_mode = silent_mode
+
+        self.queue: list[tuple[datetime, int, CronThread]] = []
+        self.sequence = 0
+        self.stopped = False
+        self.condition = Condition()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=marker or 'cron_scheduler')
+        self.dispatcher = Thread(target=self._dispatch, name=f'{marker or "cron_scheduler"}_dispatcher', daemon=True)
+        self.dispatcher.start()
+
+    def __del__(self):
+        self.shutdown()
+
+    @classmethod
+    def get_default(cls):
+        with cls.default_lock:
+            if cls.default_scheduler is None or cls.default_scheduler.stopped:
+                cls.default_scheduler = cls(marker='cron_scheduler', silent_mode=True)
+            return cls.default_scheduler
+
+    def shutdown(self, wait: bool = False):
+        with self.condition:
+            if self.stopped:
+                return
+            self.stopped = True
+            self.condition.notify_all()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def schedule(self, job: 'CronThread'):
+        with self.condition:
+            self.sequence += 1
+            heapq.heappush(self.queue, (job.start_time, self.sequence, job))
+            self.condition.notify()
+
+    def run_pending(self):
+        with self.condition:
+            while self.queue and not self.stopped:
+                run_at, _, job = self.queue[0]
+                delay = (run_at - self.clock()).total_seconds()
+                if delay > 0:
+                    return delay
+                heapq.heappop(self.queue)
+                if not job.cancelled:
+                    try:
+                        self._fire(job=job)
+                    except:
+                        print(f'CronScheduler [{self.marker}] Dispatch exception [{job.marker}]')
+                        print(traceback.format_exc())
+            return None
+
+    def _dispatch(self):
+        with self.condition:
+            while not self.stopped:
+                self.condition.wait(self.run_pending())
+
+    def _fire(self, job: 'CronThread'):
+        now = self.clock()
+        missed = 0
+        while job.start_time <= now:
+            missed += 1
+            job.advance()
+
+        runs = 1
+        if now - job.scheduled_at > self.misfire_grace_time:
+            runs = {MisfirePolicies.run_once: 1,
+                    MisfirePolicies.skip: 0,
+                    MisfirePolicies.catch_up: missed}[job.misfire_policy]
+            if not self.silent_mode:
+                sprint(f'CronScheduler [{self.marker}] job [{job.marker}] misfired by [{now - job.scheduled_at}] '
+                       f'[{job.misfire_policy.value}] [RUNS {runs}]', Colors.light_yellow)
+        if job.call_limit is not None:
+            runs = min(runs, job.call_limit)
+            job.call_limit -= runs
+
+        if job.call_limit is None or job.call_limit > 0:
+            job.scheduled_at = job.start_time
+            job.next_call = job.start_time - now
+            if not job.silent_mode:
+                sprint(f'CronThread [{job.marker}] next job call in [{job.next_call}]', Colors.light_green)
+            self.sequence += 1
+            heapq.heappush(self.queue, (job.start_time, self.sequence, job))
+        elif not job.silent_mode:
+            sprint(f'CronThread [{job.marker}] All jobs has been completed', Colors.light_cyan)
+
+        if runs and job.enqueue(runs=runs):
+            self.executor.submit(job.run)
+
+
 class CronThread:
     def __init__(self, start_time: datetime, target: object, recall_time: timedelta = timedelta(hours=24),
-                 marker: str = None, round_next_month: bool = False, call_limit: int = None, silent_mode: bool = False):
+                 marker: str = None, round_next_month: bool = False, call_limit: int = None, silent_mode: bool = False,
+                 misfire_policy: MisfirePolicies = MisfirePolicies.run_once, scheduler: CronScheduler = None):
         self.marker = marker
         self.next_call = None
         self.target = target
         self.recall_time = recall_time
         self.start_time = start_time
+        self.scheduled_at = start_time
         self.round_next_month = round_next_month
         self.call_limit = call_limit
         self.silent_mode = silent_mode
+        self.misfire_policy = misfire_policy
+        self.scheduler = scheduler or CronScheduler.get_default()
 
+        assert recall_time > timedelta(0), 'The recall time must be greater than 0'
         assert call_limit is None or call_limit > 0, 'The call limit must be greater than 0'
-        assert self.start_time > datetime.now(timezone.utc), 'The start time must be in the future and in UTC format'
+        assert self.start_time > self.scheduler.clock(), 'The start time must be in the future and in UTC format'
+
+        self.cancelled = False
+        self.running = False
+        self.pending_runs = 0
+        self.lock = Lock()
 
-        self.next_call = self.start_time - datetime.now(timezone.utc)
+        self.next_call = self.start_time - self.scheduler.clock()
 
         if not self.silent_mode:
             sprint(f'CronThread [{self.marker}] next job call in [{self.next_call}] at [{self.start_time}]', Colors.light_green)
-        self.cron_thread = RepeatThread(self.next_call.total_seconds(), self.cron_job)
-        self.cron_thread.start()
+        self.scheduler.schedule(self)
 
     def __del__(self):
         if not self.silent_mode:
             sprint(f'CronThread [{self.marker}] shutting down...', Colors.light_red)
-        self.cron_thread.cancel()
+        self.cancelled = True
 
     def terminate(self):
         self.__del__()
 
-    def cron_job(self):
-        current_cron = self.cron_thread
-        current_cron.cancel()
-
-        self.start_time += self.recall_time
+    def advance(self):
+        start_time = self.start_time + self.recall_time
         if self.round_next_month:
-            self.start_time = self.start_time.replace(day=1)
-        self.next_call = self.start_time - datetime.now(timezone.utc)
-
-        if self.call_limit is not None:
-            self.call_limit -= 1
-            if self.call_limit == 0:
-                if not self.silent_mode:
-                    sprint(f'CronThread [{self.marker}] All jobs has been completed', Colors.light_cyan)
+            start_time = start_time.replace(day=1)
+            if start_time <= self.start_time:
+                start_time = (self.start_time.replace(day=1) + timedelta(days=32)).replace(day=1)
+        self.start_time = start_time
 
-        if self.call_limit is None or self.call_limit > 0:
-            if not self.silent_mode:
-                sprint(f'CronThread [{self.marker}] next job call in [{self.next_call}]', Colors.light_green)
-            self.cron_thread = RepeatThread(self.next_call.total_seconds(), self.cron_job)
-            self.cron_thread.start()
-
-        try:
-            response = self.target()
-            if response is CronThreadEvents.terminate:
-                if not self.silent_mode:
-                    sprint(f'CronThread [{self.marker}] Job terminated via termination response', Colors.light_red)
-                self.cron_thread.cancel()
-        except:
-            print(f'CronThread [{self.marker}] Job exception')
-            print(traceback.format_exc())
+    def enqueue(self, runs: int):
+        with self.lock:
+            if self.running:
+                if self.misfire_policy is MisfirePolicies.catch_up:
+                    self.pending_runs += runs
+                elif not self.silent_mode:
+                    sprint(f'CronThread [{self.marker}] Previous job is still running, skipping', Colors.light_yellow)
+                return False
+            self.running = True
+            self.pending_runs = runs
+            return True
 
+    def run(self):
+        while True:
+            with self.lock:
+                if self.cancelled or self.pending_runs == 0:
+                    self.running = False
+                    return
+                self.pending_runs -= 1
+
+            try:
+                response = self.target()
+                if response is CronThreadEvents.terminate:
+                    if not self.silent_mode:
+                        sprint(f'CronThread [{self.marker}] Job terminated via termination response', Colors.light_red)
+                    self.cancelled = True
+            except:
+                print(f'CronThread [{self.marker}] Job exception')
+                print(traceback.format_exc())
@@ -0,0 +1,75 @@
+import time
+from collections import Counter
+from threading import Lock
+
+from pydantic import BaseModel
+
+
+class StubSpotifyUser(BaseModel):
+    spotify_id: str
+    name: str
+    follower_count: int = 0
+
+
+class StubSpotifyArtist(BaseModel):
+    spotify_id: str
+    name: str
+    image_url: str | None = None
+
+
+class StubSpotifyAlbum(BaseModel):
+    image_url: str | None = None
+
+
+class StubSpotifyTrack(BaseModel):
+    spotify_id: str
+    name: str
+    artist: StubSpotifyArtist
+    album: StubSpotifyAlbum = StubSpotifyAlbum()
+
+
+class StubSpotifyPlaylist(BaseModel):
+    spotify_id: str
+    snapshot_id: str | None = None
+    name: str
+    description: str | None = None
+    image_url: str | None = None
+    follower_count: int = 0
+    track_count: int = 0
+    owner: StubSpotifyUser
+    track_ids: list[str] = []
+
+
+class StubSpotifyController:
+    def __init__(self, playlists: list[StubSpotifyPlaylist] = None, tracks: list[StubSpotifyTrack] = None,
+                 latency: float = 0):
+        self.playlists = {playlist.spotify_id: playlist for playlist in playlists or []}
+        self.tracks = {track.spotify_id: track for track in tracks or []}
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = Lock()
+
+    def __del__(self):
+        pass
+
+    def _call(self, method: str):
+        with self.lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_playlist(self, spotify_id: str):
+        self._call('get_playlist')
+        if spotify_id not in self.playlists:
+            raise Exception('Spotify API Exception: playlist not found')
+        return self.playlists[spotify_id].model_copy(deep=True)
+
+    def get_playlist_tracks(self, playlist_id: str):
+        self._call('get_playlist_tracks')
+        if playlist_id not in self.playlists:
+            raise Exception('Spotify API Exception: playlist not found')
+        return [self.tracks[track_id] for track_id in self.playlists[playlist_id].track_ids if track_id in self.tracks]
+
+    def get_tracks_info(self, track_ids: list[str]):
+        self._call('get_tracks_info')
+        return [self.tracks[track_id] for track_id in track_ids if track_id in self.tracks]
@@ -0,0 +1,34 @@
+from fastapi import Request
+from fastapi import status as http_status
+
+from backend.modules.api.auxiliary.etags import get_etag, is_not_modified, not_modified
+
+
+def get_request(if_none_match: str = None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match is not None else []
+    return Request({'type': 'http', 'method': 'GET', 'headers': headers})
+
+
+def test_get_etag():
+    etag = get_etag(b'{"count": 1}')
+    assert etag == get_etag(b'{"count": 1}')
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != get_etag(b'{"count": 2}')
+
+
+def test_is_not_modified():
+    etag = get_etag(b'1')
+    assert not is_not_modified(request=get_request(), etag=etag)
+    assert is_not_modified(request=get_request(etag), etag=etag)
+    assert is_not_modified(request=get_request(f'"stale", W/{etag}'), etag=etag)
+    assert is_not_modified(request=get_request('*'), etag=etag)
+    assert not is_not_modified(request=get_request(get_etag(b'2')), etag=etag)
+
+
+def test_not_modified():
+    etag = get_etag(b'1')
+    response = not_modified(etag=etag, cache_control='no-cache')
+    assert response.status_code == http_status.HTTP_304_NOT_MODIFIED
+    assert response.headers['etag'] == etag
+    assert response.headers['cache-control'] == 'no-cache'
+    assert response.body == b''
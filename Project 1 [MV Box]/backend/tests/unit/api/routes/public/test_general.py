@@ -1,24 +1,45 @@
 from datetime import timedelta
 
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
 from fastapi import status as http_status
 
 from backend.modules.api.routes.public.general import general_info_get_landing_stats, LandingStatsResponse, \
     general_playlists_get_top_playlists, TopPlaylistsResponse, general_playlists_track_playlist, \
     general_tracks_get_mv_tracks, MVTracksResponse, MVTrack, general_members_join, TopPlaylist, MVTrackSource, \
-    TrackPlaylistResponse
-from backend.modules.db.models import Platforms, TrackSource, JoinMember, MemberTypes
+    TrackPlaylistResponse, general_playlists_get_track_playlist_job
+from backend.modules.app.core import AppCore
+from backend.modules.db.models import Platforms, TrackSource, JoinMember, MemberTypes, IngestionStatus, SpotifyConfig, \
+    Playlist
 from backend.modules.tools import get_spotify_playlist_url, get_spotify_track_url
 from backend.tests.sample_data import general_info_sample, playlist_samples, spotify_playlist_sample, \
     spotify_track_sample, join_members_samples
-from backend.tests.unit.app.test_core import app_core
-from backend.tests.unit.db.test_db_engine import mongo_engine_rollback, mongo_engine
+from backend.tests.unit.app.test_core import TEST_SPOTIFY_CLIENT_ID, TEST_SPOTIFY_CLIENT_SECRET
+from backend.tests.unit.db.test_async_db_engine import async_db_engine, mongo_engine
 
+pytestmark = pytest.mark.anyio
 
-def test_general_info_get_landing_stats(app_core):
+
+@pytest.fixture()
+def app_core(async_db_engine):
+    async_db_engine.sync_engine.add_config(SpotifyConfig(client_id=TEST_SPOTIFY_CLIENT_ID,
+                                                         client_secret=TEST_SPOTIFY_CLIENT_SECRET))
+    app_core = AppCore(db_engine=async_db_engine.sync_engine, dev_mode=True, verbose=False, ingestion_workers=0,
+                       spotify_cache_path=':memory:')
+
+    yield app_core
+
+    app_core.__del__()
+
+
+def get_request(etag: str = None):
+    headers = [(b'if-none-match', etag.encode())] if etag is not None else []
+    return Request({'type': 'http', 'method': 'GET', 'headers': headers})
+
+
+async def test_general_info_get_landing_stats(app_core, async_db_engine):
     app_core.db_engine.add_general_info(info=general_info_sample)
-    info = general_info_get_landing_stats(db=app_core.db_engine)
+    info = await general_info_get_landing_stats(request=get_request(), response=Response(), db=async_db_engine)
 
     next_snapshot_at = general_info_sample.last_snapshot_timestamp + timedelta(
         seconds=general_info_sample.snapshot_cycle)
@@ -29,10 +50,11 @@ def test_general_info_get_landing_stats(app_core):
     assert info == expected_info
 
 
-def test_general_playlists_get_top_playlists(app_core):
+async def test_general_playlists_get_top_playlists(app_core, async_db_engine):
     for playlist in playlist_samples:
         app_core.db_engine.add_playlist(playlist=playlist)
-    response = general_playlists_get_top_playlists(db=app_core.db_engine, offset=0)
+    response = await general_playlists_get_top_playlists(request=get_request(), db=async_db_engine, offset=0)
+    response = TopPlaylistsResponse.model_validate_json(response.body)
 
     wrapped_playlists = [TopPlaylist(token=playlist.token,
                                      name=playlist.name,
@@ -52,16 +74,26 @@ def test_general_playlists_get_top_playlists(app_core):
     assert response == expected_response
 
     with pytest.raises(HTTPException) as ex_info:
-        general_playlists_get_top_playlists(db=app_core.db_engine, offset=-1)
+        await general_playlists_get_top_playlists(request=get_request(), db=async_db_engine, offset=-1)
     assert ex_info.value.status_code == http_status.HTTP_400_BAD_REQUEST
     assert ex_info.value.detail == 'Invalid offset'
 
 
-def test_general_playlists_track_playlist(app_core):
+async def test_general_playlists_track_playlist(app_core, async_db_engine):
     spotify_playlist_url = get_spotify_playlist_url(spotify_playlist_sample.spotify_id)
 
-    response = general_playlists_track_playlist(playlist_url=spotify_playlist_url,
-                                                app_core=app_core, db=app_core.db_engine)
+    response = await general_playlists_track_playlist(playlist_url=spotify_playlist_url, db=async_db_engine,
+                                                      playlist_ingestion=app_core.playlist_ingestion)
+    duplicate_response = await general_playlists_track_playlist(playlist_url=spotify_playlist_url, db=async_db_engine,
+                                                                playlist_ingestion=app_core.playlist_ingestion)
+    assert response.status is IngestionStatus.queued
+    assert duplicate_response.job_id == response.job_id
+
+    assert app_core.playlist_ingestion.process_next()
+    assert not app_core.playlist_ingestion.process_next()
+    response = await general_playlists_get_track_playlist_job(job_id=response.job_id, db=async_db_engine)
+    assert response.status is IngestionStatus.done
+
     playlist = app_core.db_engine.get_top_playlists(limit=1)[0]
     playlist_rank = app_core.db_engine.get_playlist_rank(playlist_token=playlist.token)
     expected_response = TrackPlaylistResponse(playlist=TopPlaylist(token=playlist.token,
@@ -74,26 +106,32 @@ def test_general_playlists_track_playlist(app_core):
                                                                    sponsored=playlist.sponsored),
                                               playlist_rank=playlist_rank)
 
-    assert response == expected_response
+    assert response.result == expected_response
 
     with pytest.raises(HTTPException) as ex_1:
-        general_playlists_track_playlist(playlist_url=spotify_playlist_url,
-                                         app_core=app_core, db=app_core.db_engine)
+        await general_playlists_track_playlist(playlist_url=spotify_playlist_url,
+                                               playlist_ingestion=app_core.playlist_ingestion, db=async_db_engine)
     assert ex_1.value.status_code == http_status.HTTP_403_FORBIDDEN
     assert ex_1.value.detail == 'Playlist already exists'
 
     with pytest.raises(HTTPException) as ex_2:
         invalid_spotify_playlist_url = get_spotify_playlist_url('broken_id')
-        general_playlists_track_playlist(playlist_url=invalid_spotify_playlist_url,
-                                         app_core=app_core, db=app_core.db_engine)
+        await general_playlists_track_playlist(playlist_url=invalid_spotify_playlist_url,
+                                               playlist_ingestion=app_core.playlist_ingestion, db=async_db_engine)
     assert ex_2.value.status_code == http_status.HTTP_400_BAD_REQUEST
     assert ex_2.value.detail == 'Invalid url'
 
+    with pytest.raises(HTTPException) as ex_3:
+        await general_playlists_get_track_playlist_job(job_id='missing_job', db=async_db_engine)
+    assert ex_3.value.status_code == http_status.HTTP_404_NOT_FOUND
+    assert ex_3.value.detail == 'Job not found'
 
-def test_general_tracks_get_mv_tracks(app_core):
+
+async def test_general_tracks_get_mv_tracks(app_core, async_db_engine):
     track = spotify_track_sample
     app_core.add_track(platform_id=track.spotify_id, platform=Platforms.spotify)
-    response = general_tracks_get_mv_tracks(db=app_core.db_engine, offset=0, shuffle=False)
+    response = await general_tracks_get_mv_tracks(request=get_request(), response=Response(), db=async_db_engine,
+                                                  offset=0, shuffle=False)
 
     expected_response = MVTracksResponse(offset=0,
                                          next_offset=None,
@@ -106,33 +144,85 @@ def test_general_tracks_get_mv_tracks(app_core):
                                                                                     track.spotify_id))])])
     assert response == expected_response
 
+    shuffled_response = await general_tracks_get_mv_tracks(request=get_request(), response=Response(),
+                                                           db=async_db_engine, offset=0, seed=1)
+    assert shuffled_response.seed == 1
+    assert shuffled_response.tracks == expected_response.tracks
+
+    default_response = await general_tracks_get_mv_tracks(request=get_request(), response=Response(),
+                                                          db=async_db_engine)
+    assert default_response == expected_response
+
     with pytest.raises(HTTPException) as ex_info:
-        general_tracks_get_mv_tracks(db=app_core.db_engine, offset=-1)
+        await general_tracks_get_mv_tracks(request=get_request(), response=Response(), db=async_db_engine, offset=-1)
     assert ex_info.value.status_code == http_status.HTTP_400_BAD_REQUEST
     assert ex_info.value.detail == 'Invalid offset'
 
+    with pytest.raises(HTTPException) as ex_info:
+        await general_tracks_get_mv_tracks(request=get_request(), response=Response(), db=async_db_engine, seed=-1)
+    assert ex_info.value.status_code == http_status.HTTP_400_BAD_REQUEST
+    assert ex_info.value.detail == 'Invalid seed'
+
+
+async def test_conditional_requests(app_core, async_db_engine):
+    app_core.db_engine.add_general_info(info=general_info_sample)
+    response = Response()
+    await general_info_get_landing_stats(request=get_request(), response=response, db=async_db_engine)
+    etag = response.headers['etag']
+    not_modified = await general_info_get_landing_stats(request=get_request(etag), response=Response(),
+                                                        db=async_db_engine)
+    assert not_modified.status_code == http_status.HTTP_304_NOT_MODIFIED
+    assert not_modified.headers['etag'] == etag
+    assert async_db_engine.view_counter.pending_count == 2
 
-def test_general_members_join(app_core):
+    for playlist in playlist_samples:
+        app_core.db_engine.add_playlist(playlist=playlist)
+    response = await general_playlists_get_top_playlists(request=get_request(), db=async_db_engine)
+    etag = response.headers['etag']
+    not_modified = await general_playlists_get_top_playlists(request=get_request(etag), db=async_db_engine)
+    assert not_modified.status_code == http_status.HTTP_304_NOT_MODIFIED
+
+    app_core.db_engine.add_playlist(playlist=Playlist(platform=Platforms.spotify, platform_id='conditional_id',
+                                                      name='conditional', follower_count=1, track_count=1,
+                                                      mv_track_count=1))
+    response = await general_playlists_get_top_playlists(request=get_request(etag), db=async_db_engine)
+    assert response.status_code == http_status.HTTP_200_OK
+    assert response.headers['etag'] != etag
+
+    app_core.add_track(platform_id=spotify_track_sample.spotify_id, platform=Platforms.spotify)
+    response = Response()
+    await general_tracks_get_mv_tracks(request=get_request(), response=response, db=async_db_engine, shuffle=False)
+    not_modified = await general_tracks_get_mv_tracks(request=get_request(response.headers['etag']),
+                                                      response=Response(), db=async_db_engine, shuffle=False)
+    assert not_modified.status_code == http_status.HTTP_304_NOT_MODIFIED
+
+    response = Response()
+    await general_tracks_get_mv_tracks(request=get_request(), response=response, db=async_db_engine)
+    assert response.headers['cache-control'] == 'no-store'
+    assert 'etag' not in response.headers
+
+
+async def test_general_members_join(app_core, async_db_engine):
     member = join_members_samples[0]
-    response = general_members_join(body=member, db=app_core.db_engine)
+    response = await general_members_join(body=member, db=async_db_engine)
     new_member = app_core.db_engine.get_join_members(limit=1)[0]
 
     assert response == {'details': 'ok'}
     assert member == new_member
 
-    response = general_members_join(body=member, db=app_core.db_engine)
+    response = await general_members_join(body=member, db=async_db_engine)
     new_member = app_core.db_engine.get_join_members(limit=1)[0]
 
     assert response == {'details': 'ok'}
     assert new_member.signed_up
 
     with pytest.raises(HTTPException) as ex_1:
-        general_members_join(body=member, db=app_core.db_engine)
+        await general_members_join(body=member, db=async_db_engine)
     assert ex_1.value.status_code == http_status.HTTP_403_FORBIDDEN
     assert ex_1.value.detail == 'Member already exists'
 
     with pytest.raises(HTTPException) as ex_2:
         member.email = 'broken.email.com'
-        general_members_join(body=member, db=app_core.db_engine)
+        await general_members_join(body=member, db=async_db_engine)
     assert ex_2.value.status_code == http_status.HTTP_400_BAD_REQUEST
     assert ex_2.value.detail == 'Invalid email'
@@ -4,6 +4,7 @@ import pytest
 from dotenv import load_dotenv
 
 from backend.modules.app.core import AppCore, PlaylistTrace
+from backend.modules.app.refresh_engine import RefreshEvents
 from backend.modules.db.db_engine import DBEngine
 from backend.modules.db.models import Platforms, SpotifyConfig
 from backend.tests.sample_data import track_samples, playlist_samples, spotify_track_sample
@@ -21,11 +22,33 @@ def app_core(mongo_engine_rollback):
     db_engine = DBEngine(db_engine=mongo_engine_rollback)
     db_engine.add_config(SpotifyConfig(client_id=TEST_SPOTIFY_CLIENT_ID,
                                        client_secret=TEST_SPOTIFY_CLIENT_SECRET))
-    app_core = AppCore(db_engine=db_engine, dev_mode=True, verbose=False)
+    app_core = AppCore(db_engine=db_engine, dev_mode=True, verbose=False, ingestion_workers=0,
+                       spotify_cache_path=':memory:')
 
     yield app_core
 
     app_core.__del__()
+    db_engine.__del__()
+
+
+def test__init_track_whitelist(app_core):
+    for track in track_samples:
+        app_core.db_engine.add_track(track=track)
+    app_core._init_track_whitelist()
+    assert app_core.track_whitelist.spotify_ids == {track.sources[0].platform_id for track in track_samples
+                                                    if track.mv_pass}
+
+
+def test__sync_track_whitelist(app_core):
+    for track in track_samples:
+        app_core.db_engine.add_track(track=track)
+    app_core._sync_track_whitelist()
+    assert not app_core.track_whitelist.spotify_ids
+
+    app_core.db_engine.bump_whitelist_version()
+    app_core._sync_track_whitelist()
+    assert app_core.track_whitelist.spotify_ids == {track.sources[0].platform_id for track in track_samples
+                                                    if track.mv_pass}
 
 
 def test__init_playlist_tracking(app_core):
@@ -35,18 +58,30 @@ def test__init_playlist_tracking(app_core):
     assert app_core.playlist_tracking.available_slot_idx == len(playlist_samples) % 24
 
 
+def test__sync_playlist_tracking(app_core):
+    app_core.db_engine.add_playlist(playlist_samples[0])
+    app_core._init_playlist_tracking()
+    for playlist in playlist_samples[1:]:
+        app_core.db_engine.add_playlist(playlist)
+    app_core._sync_playlist_tracking()
+
+    competing_count = len(app_core.db_engine.get_top_playlists()) + len(app_core.db_engine.get_sponsored_playlists())
+    assert len(app_core.playlist_tracking) == competing_count
+    assert len(app_core.refresh_scheduler) == competing_count
+
+
 def test__update_playlist_trace(app_core):
     for playlist in playlist_samples:
         app_core.db_engine.add_playlist(playlist)
     app_core._init_playlist_tracking()
 
-    new_trace = app_core.playlist_tracking.slots[1][0]
+    new_trace = app_core.playlist_tracking.get_slot(1)[0]
     new_trace.mv_track_count = 32
     new_trace.follower_count = 23
     update_response = app_core._update_playlist_trace(new_trace)
     assert update_response
 
-    current_trace = app_core.playlist_tracking.slots[1][0]
+    current_trace = app_core.playlist_tracking.get_slot(1)[0]
     assert current_trace.mv_track_count == new_trace.mv_track_count
     assert current_trace.follower_count == new_trace.follower_count
 
@@ -60,7 +95,19 @@ def test__track_playlist(app_core):
                           follower_count=playlist.follower_count)
     app_core._track_playlist(playlist=trace)
     assert app_core.playlist_tracking.available_slot_idx == 1
-    assert app_core.playlist_tracking.slots[0][0] == trace
+    assert app_core.playlist_tracking.get_slot(0)[0] == trace
+    assert playlist.token in app_core.refresh_scheduler
+
+
+def test__refresh_playlist(app_core):
+    playlist = playlist_samples[0]
+    app_core.track_new_playlist(platform_id=playlist.platform_id, platform=Platforms.spotify)
+    trace = app_core.playlist_tracking.get_slot(0)[0]
+    app_core._refresh_playlist(trace)
+
+    schedule = app_core.db_engine.get_playlist_schedules()[0]
+    assert schedule.playlist_token == trace.playlist_token
+    assert schedule == app_core.refresh_scheduler.schedules[trace.playlist_token]
 
 
 def test__playlist_tracking_job(app_core):
@@ -68,18 +115,42 @@ def test__playlist_tracking_job(app_core):
         app_core.db_engine.add_playlist(playlist)
 
     app_core._init_playlist_tracking()
-    app_core._playlist_tracking_job()
+    summary = app_core._playlist_tracking_job()
+    assert 0 < summary.total <= len(playlist_samples)
 
 
 def test_check_playlist(app_core):
     playlist = playlist_samples[0]
     app_core.track_new_playlist(platform_id=playlist.platform_id, platform=Platforms.spotify)
     app_core.add_track(platform_id='469WecMhHPGtp39QSUOdNw', platform=Platforms.spotify)
-    trace = app_core.playlist_tracking.slots[0][0]
+    trace = app_core.playlist_tracking.get_slot(0)[0]
     app_core.check_playlist(trace)
     assert app_core.db_engine.get_top_playlists(limit=1)[0].mv_track_count == 1
 
 
+def test__refresh_playlist_snapshot(app_core):
+    playlist = playlist_samples[0]
+    new_playlist = app_core.track_new_playlist(platform_id=playlist.platform_id, platform=Platforms.spotify)
+    trace = app_core.playlist_tracking.get(new_playlist.token)
+    assert trace.snapshot_id == new_playlist.snapshot_id
+
+    if trace.snapshot_id is not None:
+        assert app_core._refresh_playlist(trace) is RefreshEvents.tracks_skipped
+
+        version = app_core.track_whitelist.version
+        app_core.add_track(platform_id='469WecMhHPGtp39QSUOdNw', platform=Platforms.spotify)
+        assert app_core.track_whitelist.version == version + 1
+        assert app_core.db_engine.get_whitelist_version() == version + 1
+
+        trace = app_core.playlist_tracking.get(new_playlist.token)
+        assert trace.whitelist_version == version
+        assert app_core._refresh_playlist(trace) is None
+        trace = app_core.playlist_tracking.get(new_playlist.token)
+        assert trace.whitelist_version == version + 1
+        assert app_core.db_engine.get_playlist(playlist_token=new_playlist.token).whitelist_version == version + 1
+        assert app_core._refresh_playlist(trace) is RefreshEvents.tracks_skipped
+
+
 def test_track_new_playlist(app_core):
     playlist = playlist_samples[0]
     app_core.track_new_playlist(platform_id=playlist.platform_id, platform=Platforms.spotify)
@@ -100,4 +171,23 @@ def test_add_track(app_core):
     assert artist.sources[0].platform_id == track.artist.spotify_id
     assert new_track.sources[0].platform_id == track.spotify_id
     assert new_track.artist_token == artist.token
+    assert track.spotify_id in app_core.track_whitelist.spotify_ids
+
 
+def test_serverless(mongo_engine_rollback):
+    db_engine = DBEngine(db_engine=mongo_engine_rollback)
+    app_core = AppCore(db_engine=db_engine, dev_mode=True, verbose=False, ingestion_workers=0,
+                       spotify_cache_path=':memory:', serverless=True)
+    assert app_core._spotify_controller is None
+    assert not app_core.track_whitelist.spotify_ids
+
+    for track in track_samples:
+        db_engine.add_track(track=track)
+    assert app_core.run_job(job='playlist_ingestion') == 0
+    assert app_core.track_whitelist.spotify_ids == {track.sources[0].platform_id for track in track_samples
+                                                    if track.mv_pass}
+    with pytest.raises(ValueError):
+        app_core.run_job(job='missing_job')
+
+    app_core.__del__()
+    db_engine.__del__()
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from backend.modules.app.ingestion import PlaylistIngestion
+from backend.modules.db.models import IngestionJob, Platforms
+
+
+class JobStore:
+    def __init__(self, jobs: list[IngestionJob]):
+        self.jobs = jobs
+        self.finished = {}
+        self.requeued = 0
+
+    def requeue_stale_ingestion_jobs(self, stale_after, max_attempts):
+        self.requeued += 1
+
+    def claim_ingestion_job(self):
+        return self.jobs.pop(0) if self.jobs else None
+
+    def finish_ingestion_job(self, job_token: str, playlist_token: str = None, error: str = None):
+        self.finished[job_token] = (playlist_token, error)
+
+
+def ingest(platform_id: str, platform: Platforms):
+    if platform_id == 'broken_id':
+        raise Exception('Invalid url')
+    return SimpleNamespace(token=f'playlist_{platform_id}')
+
+
+def test_drain():
+    jobs = [IngestionJob(platform=Platforms.spotify, platform_id=platform_id)
+            for platform_id in ('spotify_id', 'broken_id')]
+    store = JobStore(jobs=list(jobs))
+    ingestion = PlaylistIngestion(db_engine=store, target=ingest, workers=0, verbose=False)
+
+    assert ingestion.drain() == 2
+    assert store.requeued == 1
+    assert store.finished == {jobs[0].token: ('playlist_spotify_id', None),
+                              jobs[1].token: (None, 'Invalid url')}
+    assert ingestion.drain() == 0
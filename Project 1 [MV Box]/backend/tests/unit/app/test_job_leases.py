@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.modules.app.job_leases import JobLeases
+
+
+class LeaseStore:
+    def __init__(self):
+        self.leases = {}
+
+    def acquire_job_lease(self, job: str, owner: str, ttl: timedelta):
+        now = datetime.now(timezone.utc)
+        current = self.leases.get(job)
+        if current is not None and current[0] != owner and current[1] >= now:
+            return False
+        self.leases[job] = (owner, now + ttl)
+        return True
+
+    def release_job_lease(self, job: str, owner: str):
+        if job in self.leases and self.leases[job][0] == owner:
+            self.leases[job] = (owner, datetime.now(timezone.utc))
+            return True
+        return False
+
+
+def test_leased():
+    store = LeaseStore()
+    leader = JobLeases(db_engine=store, owner='worker_a', verbose=False)
+    follower = JobLeases(db_engine=store, owner='worker_b', verbose=False)
+    runs = []
+    acquired = []
+
+    leader_job = leader.leased(job='update_stats', target=lambda: runs.append('worker_a'),
+                               on_acquire=lambda: acquired.append('worker_a'))
+    follower_job = follower.leased(job='update_stats', target=lambda: runs.append('worker_b'),
+                                   on_acquire=lambda: acquired.append('worker_b'))
+    leader_job()
+    follower_job()
+    leader_job()
+
+    assert runs == ['worker_a', 'worker_a']
+    assert acquired == ['worker_a']
+    assert leader.is_held('update_stats')
+    assert not follower.is_held('update_stats')
+
+    leader.__del__()
+    follower_job()
+
+    assert runs == ['worker_a', 'worker_a', 'worker_b']
+    assert acquired == ['worker_a', 'worker_b']
+    follower.__del__()
+
+
+def test_heartbeat_lost():
+    store = LeaseStore()
+    leases = JobLeases(db_engine=store, owner='worker_a', verbose=False)
+    assert leases.acquire(job='playlist_tracking')
+
+    store.leases['playlist_tracking'] = ('worker_b', datetime.now(timezone.utc) + timedelta(minutes=1))
+    leases.heartbeat()
+
+    assert not leases.is_held('playlist_tracking')
+    leases.__del__()
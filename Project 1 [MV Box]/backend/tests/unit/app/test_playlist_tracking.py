@@ -0,0 +1,49 @@
+from backend.modules.app.playlist_tracking import PlaylistTracking, PlaylistTrace
+from backend.modules.db.models import Platforms
+
+
+def get_trace(idx: int):
+    return PlaylistTrace(playlist_token=f'token_{idx}',
+                         platform=Platforms.spotify,
+                         platform_id=f'platform_id_{idx}',
+                         mv_track_count=idx,
+                         follower_count=idx * 10)
+
+
+def test_track():
+    tracking = PlaylistTracking()
+    for idx in range(30):
+        tracking.track(get_trace(idx))
+
+    assert len(tracking) == 30
+    assert tracking.available_slot_idx == 30 % 24
+    assert tracking.get_slot(0) == [get_trace(0), get_trace(24)]
+    assert tracking.track(get_trace(24)) == 0
+    assert len(tracking) == 30
+
+
+def test_update():
+    tracking = PlaylistTracking()
+    trace = get_trace(1)
+    tracking.track(trace)
+
+    trace.mv_track_count = 32
+    trace.follower_count = 23
+    assert tracking.update(trace)
+    assert tracking.get(trace.playlist_token) == trace
+    assert not tracking.update(get_trace(2))
+
+
+def test_remove():
+    tracking = PlaylistTracking()
+    for idx in range(72):
+        tracking.track(get_trace(idx))
+
+    assert tracking.remove('token_0')
+    assert not tracking.remove('token_0')
+    assert 'token_0' not in tracking
+    assert tracking.get_slot(0) == [get_trace(48), get_trace(24)]
+    assert tracking.get('token_48') == get_trace(48)
+
+    assert tracking.remove('token_24')
+    assert tracking.get_slot(0) == [get_trace(48)]
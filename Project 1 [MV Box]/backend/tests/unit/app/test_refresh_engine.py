@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+from threading import Event, Timer
+
+import pytest
+
+from backend.modules.app.playlist_tracking import PlaylistTrace
+from backend.modules.app.refresh_engine import PlaylistRefreshEngine, RefreshEvents, RefreshTimeout, \
+    check_refresh_deadline, refresh_deadline
+from backend.modules.db.models import Platforms
+
+
+def get_traces(count: int):
+    return [PlaylistTrace(playlist_token=f'token_{idx}',
+                          platform=Platforms.spotify,
+                          platform_id=f'platform_id_{idx}',
+                          mv_track_count=0,
+                          follower_count=0) for idx in range(count)]
+
+
+def test_run():
+    checked = []
+    engine = PlaylistRefreshEngine(target=lambda playlist: checked.append(playlist.playlist_token),
+                                   workers=4, verbose=False)
+    traces = get_traces(10)
+    summary = engine.run(playlists=traces + traces[:2])
+    engine.__del__()
+
+    assert sorted(checked) == sorted(trace.playlist_token for trace in traces)
+    assert summary.total == 12
+    assert summary.refreshed == 10
+    assert summary.skipped == 2
+    assert summary.failed == 0
+
+
+def test_run_tracks_skipped():
+    def target(playlist: PlaylistTrace):
+        if playlist.playlist_token != 'token_0':
+            return RefreshEvents.tracks_skipped
+
+    engine = PlaylistRefreshEngine(target=target, workers=2, verbose=False)
+    summary = engine.run(playlists=get_traces(5))
+    engine.__del__()
+
+    assert summary.refreshed == 5
+    assert summary.tracks_skipped == 4
+
+
+def test_run_failed():
+    def target(playlist: PlaylistTrace):
+        if playlist.playlist_token == 'token_0':
+            raise Exception('Spotify API Exception')
+
+    engine = PlaylistRefreshEngine(target=target, workers=2, verbose=False)
+    summary = engine.run(playlists=get_traces(5))
+    engine.__del__()
+
+    assert summary.refreshed == 4
+    assert summary.failed == 1
+
+
+def test_run_timed_out():
+    def target(playlist: PlaylistTrace):
+        if playlist.playlist_token == 'token_0':
+            time.sleep(1)
+
+    engine = PlaylistRefreshEngine(target=target, workers=2, playlist_timeout=timedelta(seconds=0.2), verbose=False)
+    summary = engine.run(playlists=get_traces(5))
+    engine.__del__()
+
+    assert summary.refreshed == 4
+    assert summary.timed_out == 1
+    assert summary.failed == 1
+    assert summary.still_running == 1
+    assert summary.wall_time < 1
+
+
+def test_run_timed_out_occupies_worker():
+    release = Event()
+    started = []
+
+    def target(playlist: PlaylistTrace):
+        started.append(playlist.playlist_token)
+        if playlist.playlist_token == 'token_0':
+            release.wait(timeout=5)
+
+    engine = PlaylistRefreshEngine(target=target, workers=1, playlist_timeout=timedelta(seconds=0.1), verbose=False)
+    Timer(0.3, release.set).start()
+    summary = engine.run(playlists=get_traces(3))
+    engine.__del__()
+
+    assert started == ['token_0', 'token_1', 'token_2']
+    assert summary.timed_out == 1
+    assert summary.refreshed == 2
+    assert summary.wall_time >= 0.3
+
+
+def test_check_refresh_deadline():
+    def target(playlist: PlaylistTrace):
+        for _ in range(500):
+            time.sleep(0.01)
+            check_refresh_deadline()
+
+    engine = PlaylistRefreshEngine(target=target, workers=1, playlist_timeout=timedelta(seconds=0.1), verbose=False)
+    summary = engine.run(playlists=get_traces(2))
+    engine.__del__()
+
+    assert summary.timed_out == 2
+    assert summary.wall_time < 1
+
+    token = refresh_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(RefreshTimeout):
+            check_refresh_deadline()
+    finally:
+        refresh_deadline.reset(token)
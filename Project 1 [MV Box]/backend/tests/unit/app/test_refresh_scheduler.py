@@ -0,0 +1,68 @@
+from datetime import datetime, timezone, timedelta
+
+from backend.modules.app.refresh_scheduler import RefreshScheduler
+from backend.modules.db.models import PlaylistSchedule
+
+now = datetime(2024, 1, 1, 12, 0, 5, tzinfo=timezone.utc)
+
+
+def test_add():
+    scheduler = RefreshScheduler()
+    for idx in range(30):
+        scheduler.add(playlist_token=f'playlist_{idx}', now=now)
+
+    assert len(scheduler) == 30
+    assert scheduler.schedules['playlist_0'].next_refresh_at == now.replace(second=0)
+    assert scheduler.schedules['playlist_25'].next_refresh_at == now.replace(second=0) + timedelta(hours=1)
+    assert scheduler.due(now=now) == ['playlist_0', 'playlist_24']
+
+
+def test_due_budget():
+    scheduler = RefreshScheduler(hourly_budget=2)
+    for idx in range(3):
+        scheduler.add(playlist_token=f'playlist_{idx}', now=now, next_refresh_at=now)
+
+    assert scheduler.due(now=now) == ['playlist_0', 'playlist_1']
+    assert scheduler.due(now=now) == ['playlist_2']
+    assert scheduler.due(now=now + timedelta(hours=1)) == ['playlist_0', 'playlist_1']
+
+
+def test_record():
+    scheduler = RefreshScheduler(smoothing=0.5)
+    scheduler.add(playlist_token='hot', now=now, next_refresh_at=now)
+    scheduler.add(playlist_token='dormant', now=now, next_refresh_at=now)
+
+    current = now
+    for _ in range(8):
+        for token in scheduler.due(now=current):
+            scheduler.record(playlist_token=token, changed=token == 'hot', now=current)
+        current += timedelta(hours=1)
+
+    assert scheduler.schedules['hot'].interval == 1
+    assert scheduler.schedules['dormant'].interval > 1
+    assert scheduler.record(playlist_token='missing', changed=True, now=now) is None
+
+
+def test_initial_interval():
+    scheduler = RefreshScheduler()
+    scheduler.add(playlist_token='unchanged', now=now, next_refresh_at=now)
+    scheduler.add(playlist_token='changed', now=now, next_refresh_at=now)
+    assert scheduler.schedules['unchanged'].interval == 24
+
+    assert scheduler.record(playlist_token='unchanged', changed=False, now=now).interval == 24
+    assert scheduler.record(playlist_token='changed', changed=True, now=now).interval < 24
+
+
+def test_get_interval():
+    assert RefreshScheduler.get_interval(change_rate=1) == 1
+    assert RefreshScheduler.get_interval(change_rate=0.3) == 3
+    assert RefreshScheduler.get_interval(change_rate=0.01) == 168
+
+
+def test_load_and_remove():
+    scheduler = RefreshScheduler()
+    scheduler.load(schedules=[PlaylistSchedule(_id='playlist', change_rate=0.05, interval=24, next_refresh_at=now)])
+    assert scheduler.add(playlist_token='playlist', now=now).interval == 24
+
+    assert scheduler.remove(playlist_token='playlist')
+    assert scheduler.due(now=now) == []
@@ -0,0 +1,109 @@
+import os
+import stat
+from datetime import timedelta
+
+import pytest
+from pydantic import BaseModel
+
+from backend.modules.app.spotify_cache import PersistentCache, CachedSpotifyController
+from backend.modules.tools import TokenBucket
+from backend.tests.stubs.spotify import StubSpotifyController, StubSpotifyTrack, StubSpotifyArtist, \
+    StubSpotifyPlaylist, StubSpotifyUser
+
+
+def get_controller():
+    artist = StubSpotifyArtist(spotify_id='artist_0', name='artist')
+    tracks = [StubSpotifyTrack(spotify_id=f'track_{idx}', name=f'track_{idx}', artist=artist) for idx in range(5)]
+    playlist = StubSpotifyPlaylist(spotify_id='playlist_0', name='playlist',
+                                   owner=StubSpotifyUser(spotify_id='user_0', name='user'))
+    return StubSpotifyController(playlists=[playlist], tracks=tracks)
+
+
+class CacheValue(BaseModel):
+    data: int | str
+
+
+def test_persistent_cache():
+    cache = PersistentCache(verbose=False)
+    cache.set('key', CacheValue(data=1))
+    assert cache.get('key', model=CacheValue) == CacheValue(data=1)
+    assert cache.get('missing', model=CacheValue) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.set('expired', CacheValue(data=1), ttl=timedelta(seconds=-1))
+    assert cache.get('expired', model=CacheValue) is None
+    assert cache.delete('key')
+    assert len(cache) == 0
+
+
+def test_persistent_cache_corrupt_entry():
+    cache = PersistentCache(verbose=False)
+    cache.set('key', CacheValue(data=1))
+    cache.connection.execute('UPDATE cache SET value = ? WHERE key = ?', (b'corrupt', 'key'))
+
+    assert cache.get('key', model=CacheValue) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(cache) == 0
+
+
+def test_persistent_cache_eviction():
+    cache = PersistentCache(max_entries=3, verbose=False)
+    for idx in range(3):
+        cache.set(f'key_{idx}', CacheValue(data=idx))
+    cache.get('key_0', model=CacheValue)
+    cache.set('key_3', CacheValue(data=3))
+
+    assert len(cache) == 3
+    assert cache.get('key_1', model=CacheValue) is None
+    assert cache.get('key_0', model=CacheValue) == CacheValue(data=0)
+
+    cache = PersistentCache(max_bytes=200, verbose=False)
+    cache.set('key_0', CacheValue(data='x' * 100))
+    cache.set('key_1', CacheValue(data='x' * 100))
+    assert len(cache) == 1
+    assert not cache.set('key_2', CacheValue(data='x' * 300))
+
+
+def test_persistent_cache_restart(tmp_path):
+    path = os.path.join(tmp_path, 'cache', 'cache.sqlite3')
+    cache = PersistentCache(path=path, verbose=False)
+    cache.set('key', CacheValue(data='value'))
+    cache.__del__()
+
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert PersistentCache(path=path, verbose=False).get('key', model=CacheValue) == CacheValue(data='value')
+
+
+def test_persistent_cache_shared_dir(tmp_path):
+    os.chmod(tmp_path, 0o777)
+    with pytest.raises(Exception):
+        PersistentCache(path=os.path.join(tmp_path, 'cache.sqlite3'), verbose=False)
+
+
+def test_cached_spotify_controller():
+    controller = get_controller()
+    rate_limiter = TokenBucket(rate=0.001, capacity=10)
+    cached_controller = CachedSpotifyController(controller=controller, cache=PersistentCache(verbose=False),
+                                                rate_limiter=rate_limiter)
+
+    assert [track.spotify_id for track in cached_controller.get_tracks_info(['track_0', 'track_1'])] == \
+           ['track_0', 'track_1']
+    tracks = cached_controller.get_tracks_info(['track_1', 'missing', 'track_2', 'track_0'])
+    assert [track.spotify_id for track in tracks] == ['track_1', 'track_2', 'track_0']
+    assert controller.calls['get_tracks_info'] == 2
+
+    assert cached_controller.get_playlist('playlist_0') == cached_controller.get_playlist('playlist_0')
+    assert controller.calls['get_playlist'] == 1
+    assert cached_controller.get_playlist_tracks('playlist_0') == []
+    assert rate_limiter.try_acquire(tokens=7) and not rate_limiter.try_acquire(tokens=1)
+
+
+def test_cached_spotify_controller_models():
+    cache = PersistentCache(verbose=False)
+    CachedSpotifyController(controller=get_controller(), cache=cache).get_tracks_info(['track_0'])
+
+    controller = get_controller()
+    cached_controller = CachedSpotifyController(controller=controller, cache=cache,
+                                                models={'track': StubSpotifyTrack})
+    assert [track.spotify_id for track in cached_controller.get_tracks_info(['track_0'])] == ['track_0']
+    assert controller.calls['get_tracks_info'] == 0
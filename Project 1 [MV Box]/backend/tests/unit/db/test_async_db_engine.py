@@ -0,0 +1,97 @@
+import pytest
+
+from backend.modules.db.async_db_engine import AsyncDBEngine
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
+from backend.modules.db.db_engine import DBEngine
+from backend.modules.db.models import Keys, InfoTypes, Platforms, IngestionStatus
+from backend.tests.sample_data import playlist_samples, track_samples, general_info_sample, join_members_samples
+from backend.tests.unit.db.test_mongo_engine import mongo_engine, MONGO_HOST, MONGO_USER, MONGO_PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture()
+def async_db_engine(mongo_engine):
+    mongo_engine.abort_session()
+    db_engine = DBEngine(db_engine=mongo_engine)
+    async_mongo_engine = AsyncMongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD,
+                                          marker='unit_test', verbose=False)
+    engine = AsyncDBEngine(db_engine=async_mongo_engine, sync_engine=db_engine)
+
+    yield engine
+
+    async_mongo_engine.__del__()
+    db_engine.__del__()
+    for key in Keys:
+        if key is not Keys.mv_box_playlists_db:
+            mongo_engine.drop_collection(db=Keys.mv_box_playlists_db, key=key)
+
+
+async def test_ensure_leaderboard(async_db_engine):
+    for playlist in playlist_samples:
+        async_db_engine.sync_engine.add_playlist(playlist=playlist)
+
+    assert async_db_engine.leaderboard.is_stale()
+    await async_db_engine.ensure_leaderboard()
+    assert not async_db_engine.leaderboard.is_stale()
+
+    sync_engine = DBEngine(db_engine=async_db_engine.sync_engine.db_engine)
+    assert async_db_engine.leaderboard.get_page(offset=0) == sync_engine.leaderboard.get_page(offset=0)
+    sync_engine.__del__()
+
+
+async def test_get_playlist_rank(async_db_engine):
+    for playlist in playlist_samples:
+        async_db_engine.sync_engine.add_playlist(playlist=playlist)
+
+    for playlist in playlist_samples:
+        assert (await async_db_engine.get_playlist_rank(playlist_token=playlist.token) ==
+                async_db_engine.sync_engine.get_playlist_rank(playlist_token=playlist.token))
+    assert await async_db_engine.get_playlist(playlist_token=playlist_samples[0].token) == playlist_samples[0]
+
+
+async def test_sample_mv_track_records(async_db_engine):
+    for track in track_samples:
+        async_db_engine.sync_engine.add_track(track=track)
+
+    mv_tokens = [track.token for track in track_samples if track.mv_pass]
+    page, records = await async_db_engine.sample_mv_track_records(seed=1, limit=len(mv_tokens))
+    assert sorted(record.token for record in records) == sorted(mv_tokens)
+    assert [record.token for record in records] == page.tokens
+    assert await async_db_engine.get_mv_track_records() == async_db_engine.sync_engine.get_mv_track_records()
+
+
+async def test_get_cached_info(async_db_engine):
+    async_db_engine.sync_engine.add_general_info(info=general_info_sample)
+    assert await async_db_engine.get_cached_info(InfoTypes.general) == general_info_sample
+
+    async_db_engine.sync_engine.update_general_info(network_coverage=1)
+    info = await async_db_engine.get_cached_info(InfoTypes.general)
+    assert info.network_coverage == 1
+    assert async_db_engine.sync_engine.get_cached_info(InfoTypes.general) is info
+
+
+async def test_ingestion_jobs(async_db_engine):
+    job = await async_db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify)
+    assert job.status is IngestionStatus.queued
+    assert (await async_db_engine.enqueue_ingestion_job(platform_id='spotify_id',
+                                                        platform=Platforms.spotify)).token == job.token
+
+    async_db_engine.sync_engine.finish_ingestion_job(job_token=job.token, error='Invalid url')
+    failed_job = await async_db_engine.get_ingestion_job(job_token=job.token)
+    assert failed_job.status is IngestionStatus.failed
+
+    requeued_job = await async_db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify)
+    assert requeued_job.token == job.token
+    assert requeued_job.status is IngestionStatus.queued
+    assert requeued_job.error is None
+
+
+async def test_join_members(async_db_engine):
+    member = join_members_samples[0]
+    assert await async_db_engine.add_join_member(member=member)
+    assert not await async_db_engine.add_join_member(member=member)
+
+    await async_db_engine.sign_up_member(token=member.token)
+    members = await async_db_engine.get_join_members(target={'email': member.email})
+    assert len(members) == 1 and members[0].signed_up
@@ -0,0 +1,87 @@
+import pytest
+
+from backend.modules.db.async_mongo_engine import AsyncMongoEngine
+from backend.modules.db.models import Keys
+from backend.tests.sample_data import mongo_engine_samples
+from backend.tests.unit.db.test_mongo_engine import MONGO_HOST, MONGO_USER, MONGO_PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture()
+async def async_mongo_engine_rollback():
+    Keys.alter_keys(prefix='test')
+    engine = AsyncMongoEngine(host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD,
+                              marker='unit_test', verbose=False)
+    await engine.start_session()
+
+    yield engine
+
+    await engine.abort_session()
+    engine.__del__()
+
+
+async def test_insert(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
+    response = await async_mongo_engine_rollback.find_one(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                          target={'_id': mongo_engine_samples[0]['_id']})
+    assert mongo_engine_samples[0]['data'] == response['data']
+
+
+async def test_find(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                             data=[mongo_engine_samples[0], mongo_engine_samples[1]])
+    response = await async_mongo_engine_rollback.find(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                      target={'data': mongo_engine_samples[0]['data']})
+    assert len(response) == 2
+
+
+async def test_aggregate(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                             data=[mongo_engine_samples[0], mongo_engine_samples[1]])
+    response = await async_mongo_engine_rollback.aggregate(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                           pipeline=[{'$match': {'_id': mongo_engine_samples[0]['_id']}}])
+    assert response == [mongo_engine_samples[0]]
+
+
+async def test_update_one(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
+    await async_mongo_engine_rollback.update_one(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                 target={'_id': mongo_engine_samples[0]['_id']},
+                                                 update_query={'$set': {'data': 'new_data'}})
+    response = await async_mongo_engine_rollback.find_one(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                          target={'_id': mongo_engine_samples[0]['_id']})
+    assert 'new_data' == response['data']
+
+
+async def test_find_one_and_update(async_mongo_engine_rollback):
+    response = await async_mongo_engine_rollback.find_one_and_update(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                                     target={'_id': 'upserted'},
+                                                                     update_query={'$set': {'data': 'new_data'}},
+                                                                     upsert=True)
+    assert response == {'_id': 'upserted', 'data': 'new_data'}
+
+
+async def test_delete_one(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
+    await async_mongo_engine_rollback.delete_one(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                 target={'_id': mongo_engine_samples[0]['_id']})
+    assert not await async_mongo_engine_rollback.exists(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                                        target={'_id': mongo_engine_samples[0]['_id']})
+
+
+async def test_count(async_mongo_engine_rollback):
+    await async_mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                             data=[mongo_engine_samples[0], mongo_engine_samples[1]])
+    assert await async_mongo_engine_rollback.count(db=Keys.mv_box_playlists_db, key=Keys.test, target={}) == 2
+
+
+async def test_operation_metrics(async_mongo_engine_rollback):
+    async_mongo_engine_rollback.metrics.reset()
+    await async_mongo_engine_rollback.insert(db=Keys.test, key=Keys.test, data={'_id': 'metrics', 'value': 1})
+    await async_mongo_engine_rollback.find(db=Keys.test, key=Keys.test, target={'value': 1})
+    await async_mongo_engine_rollback.count(db=Keys.test, key=Keys.test, target={'value': 1})
+
+    operations = {el.operation: el for el in async_mongo_engine_rollback.metrics.snapshot().operations}
+    assert set(operations) == {'insert_one', 'find', 'count'}
+    assert all(el.collection == Keys.test.value and el.count == 1 for el in operations.values())
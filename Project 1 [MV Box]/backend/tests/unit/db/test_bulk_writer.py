@@ -0,0 +1,63 @@
+from datetime import timedelta
+from threading import Event
+
+from pymongo.errors import AutoReconnect
+
+from backend.modules.db.bulk_writer import BulkWriter
+from backend.modules.db.models import Keys
+
+
+class BulkWriteResult:
+    def __init__(self, count: int):
+        self.bulk_api_result = {'nMatched': count, 'nModified': count, 'nUpserted': 0}
+
+
+class FlakyEngine:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.written: dict[Keys, int] = {}
+        self.written_event = Event()
+
+    def bulk_write(self, db: Keys, key: Keys, operations: list, ordered: bool = True):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect('connection lost')
+        self.written[key] = self.written.get(key, 0) + len(operations)
+        self.written_event.set()
+        return BulkWriteResult(count=len(operations))
+
+
+def test_flush_requeue():
+    engine = FlakyEngine(failures=1)
+    batch = BulkWriter(engine=engine, db=Keys.mv_box_playlists_db, batch_size=2, verbose=False)
+    batch.update_one(key=Keys.playlists, target={'_id': 'a'}, update_query={'$set': {'x': 1}})
+    batch.update_one(key=Keys.playlists, target={'_id': 'b'}, update_query={'$set': {'x': 1}})
+
+    assert batch.reports[0].requeued_count == 2
+    assert batch.reports[0].errors[0]['message'] == 'connection lost'
+    assert batch.operation_count == 2
+
+    batch.flush()
+    assert batch.reports[1].modified_count == 2
+    assert engine.written == {Keys.playlists: 2}
+
+
+def test_flush_unsent():
+    engine = FlakyEngine(failures=1)
+    with BulkWriter(engine=engine, db=Keys.mv_box_playlists_db, verbose=False) as batch:
+        batch.update_one(key=Keys.playlists, target={'_id': 'a'}, update_query={'$set': {'x': 1}})
+        batch.update_one(key=Keys.playlist_schedules, target={'_id': 'a'}, update_query={'$set': {'x': 1}})
+
+    assert [report.unsent_count for report in batch.reports] == [1, 0]
+    assert engine.written == {Keys.playlist_schedules: 1}
+    assert batch.operation_count == 0
+
+
+def test_flush_interval():
+    engine = FlakyEngine()
+    batch = BulkWriter(engine=engine, db=Keys.mv_box_playlists_db, flush_interval=timedelta(milliseconds=10),
+                       verbose=False)
+    batch.update_one(key=Keys.playlists, target={'_id': 'a'}, update_query={'$set': {'x': 1}})
+
+    assert engine.written_event.wait(timeout=5)
+    assert engine.written == {Keys.playlists: 1}
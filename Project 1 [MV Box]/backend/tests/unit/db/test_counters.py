@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from backend.modules.db.counters import WriteBehindCounter
+
+
+def test_flush():
+    flushed = []
+    counter = WriteBehindCounter(flush=flushed.append, flush_interval=timedelta(minutes=1))
+    for _ in range(5):
+        counter.incr()
+    counter.incr(amount=3)
+
+    assert counter.pending_count == 8
+    assert counter.flush() == 8
+    assert counter.flush() == 0
+    assert flushed == [8]
+    counter.__del__()
+
+
+def test_flush_threshold():
+    flushed = []
+    counter = WriteBehindCounter(flush=flushed.append, flush_interval=timedelta(minutes=1), flush_threshold=10)
+    for _ in range(10):
+        counter.incr()
+    time.sleep(0.1)
+
+    assert flushed == [10]
+    counter.__del__()
+
+
+def test_flush_failed():
+    def flush(amount: int):
+        raise Exception('MongoDB Exception')
+
+    counter = WriteBehindCounter(flush=flush, flush_interval=timedelta(minutes=1))
+    counter.incr(amount=4)
+    assert counter.flush() == 0
+    assert counter.pending_count == 4
+
+
+def test_shutdown():
+    flushed = []
+    counter = WriteBehindCounter(flush=flushed.append, flush_interval=timedelta(minutes=1))
+    counter.incr(amount=2)
+    counter.__del__()
+
+    assert flushed == [2]
+    assert counter.flush_thread is None
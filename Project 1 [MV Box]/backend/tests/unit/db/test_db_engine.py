@@ -3,7 +3,8 @@ from datetime import datetime, timedelta, timezone
 import pytest
 
 from backend.modules.db.db_engine import DBEngine
-from backend.modules.db.models import InfoTypes, ConfigTypes, JoinMember, MemberTypes
+from backend.modules.db.models import InfoTypes, ConfigTypes, JoinMember, MemberTypes, Platforms, Keys, \
+    COLLECTION_INDEXES, SenderSlugs, IngestionStatus, PlaylistSchedule
 from backend.modules.tools import hour_rounder
 from backend.tests.sample_data import playlist_samples, track_samples, artist_samples, general_info_sample, \
     spotify_config_sample, spotify_users_samples, join_members_samples, email_user_sample, top_playlists_snapshot_sample
@@ -13,7 +14,10 @@ from backend.tests.unit.db.test_mongo_engine import mongo_engine_rollback, mongo
 @pytest.fixture()
 def db_engine(mongo_engine_rollback):
     engine = DBEngine(db_engine=mongo_engine_rollback)
-    return engine
+
+    yield engine
+
+    engine.__del__()
 
 
 def test_add_playlist(db_engine):
@@ -36,6 +40,19 @@ def test_get_top_playlist(db_engine):
     assert top_playlists == sorted(playlist_samples, key=lambda x: (x.mv_track_count, x.follower_count), reverse=True)
 
 
+def test_get_top_playlists_trusted(db_engine):
+    for playlist in playlist_samples:
+        db_engine.add_playlist(playlist=playlist)
+
+    top_playlists = db_engine.get_top_playlists()
+    records = db_engine.get_top_playlists(trusted=True)
+    assert [record.token for record in records] == [playlist.token for playlist in top_playlists]
+    assert all(record.platform is playlist.platform for record, playlist in zip(records, top_playlists))
+
+    records = db_engine.get_top_playlists(trusted=True, fields=['follower_count'])
+    assert records == [(playlist.token, playlist.follower_count) for playlist in top_playlists]
+
+
 def test_get_sponsored_playlists(db_engine):
     for playlist in playlist_samples:
         playlist.sponsored = True
@@ -45,6 +62,18 @@ def test_get_sponsored_playlists(db_engine):
     assert top_playlists == sorted(playlist_samples, key=lambda x: (x.mv_track_count, x.follower_count), reverse=True)
 
 
+def test_get_top_playlists_cursor(db_engine):
+    for playlist in playlist_samples:
+        db_engine.add_playlist(playlist=playlist)
+
+    first_page = db_engine.get_top_playlists(limit=2)
+    next_page = db_engine.get_top_playlists(limit=2, cursor=db_engine.get_playlist_cursor(first_page[-1]))
+    assert next_page == db_engine.get_top_playlists(offset=2, limit=2)
+
+    with pytest.raises(ValueError):
+        db_engine.get_top_playlists(cursor='broken_cursor')
+
+
 def test_get_playlist_rank(db_engine):
     for playlist in playlist_samples:
         db_engine.add_playlist(playlist=playlist)
@@ -55,6 +84,16 @@ def test_get_playlist_rank(db_engine):
         assert rank == idx
 
 
+def test_get_playlist_ranks(db_engine):
+    for playlist in playlist_samples:
+        db_engine.add_playlist(playlist=playlist)
+
+    sorted_playlists = sorted(playlist_samples, key=lambda x: (x.mv_track_count, x.follower_count), reverse=True)
+    ranks = db_engine.get_playlist_ranks(playlist_tokens=[pl.token for pl in sorted_playlists])
+    assert ranks == {pl.token: idx for idx, pl in enumerate(sorted_playlists, start=1)}
+    assert db_engine.get_playlist_rank(playlist_token='missing_token') is None
+
+
 def test_update_playlist(db_engine):
     playlist = playlist_samples[0]
     db_engine.add_playlist(playlist=playlist)
@@ -63,6 +102,26 @@ def test_update_playlist(db_engine):
     assert updated_playlist.mv_track_count == 144
     assert updated_playlist.follower_count == 5050
 
+    leaderboard_playlist = db_engine.leaderboard.get_page().playlists[0]
+    assert leaderboard_playlist.mv_track_count == 144
+    assert leaderboard_playlist.follower_count == 5050
+
+
+def test_update_playlist_batch(db_engine):
+    for playlist in playlist_samples:
+        db_engine.add_playlist(playlist=playlist)
+
+    with db_engine.bulk_writer(batch_size=len(playlist_samples) + 1) as batch:
+        for playlist in playlist_samples:
+            db_engine.update_playlist(playlist_token=playlist.token, follower_count=playlist.follower_count + 1,
+                                      batch=batch)
+        assert batch.operation_count == len(playlist_samples)
+
+    assert batch.reports[0].modified_count == len(playlist_samples)
+    assert not batch.reports[0].errors
+    follower_counts = {pl.token: pl.follower_count for pl in db_engine.get_top_playlists()}
+    assert all(follower_counts[pl.token] == pl.follower_count + 1 for pl in playlist_samples if not pl.sponsored)
+
 
 def test_add_track(db_engine):
     track = track_samples[0]
@@ -86,6 +145,63 @@ def test_get_mv_tracks(db_engine):
     assert mv_tracks == list(filter(lambda x: x.mv_pass, track_samples))
 
 
+def test_get_mv_tracks_cursor(db_engine):
+    for track in track_samples:
+        db_engine.add_track(track=track)
+
+    first_page = db_engine.get_mv_tracks(limit=1)
+    next_page = db_engine.get_mv_tracks(limit=1, cursor=db_engine.get_track_cursor(first_page[-1]))
+    assert next_page == db_engine.get_mv_tracks(offset=1, limit=1)
+
+
+def test_get_mv_track_records(db_engine):
+    for track in track_samples:
+        db_engine.add_track(track=track)
+    for artist in artist_samples:
+        db_engine.add_artist(artist=artist)
+
+    artists = {artist.token: artist.name for artist in artist_samples}
+    mv_tracks = db_engine.get_mv_tracks()
+    records = db_engine.get_mv_track_records()
+    assert [record.token for record in records] == [track.token for track in mv_tracks]
+    assert all(record.artist_name == artists.get(record.artist_token) for record in records)
+    assert all(record.artist_token in db_engine.artist_names for record in records
+               if record.artist_token in artists)
+
+    next_page = db_engine.get_mv_track_records(limit=1, cursor=db_engine.get_track_cursor(records[0]))
+    assert next_page == db_engine.get_mv_track_records(offset=1, limit=1)
+
+
+def test_sample_mv_track_records(db_engine):
+    for track in track_samples:
+        db_engine.add_track(track=track)
+
+    mv_tokens = [track.token for track in track_samples if track.mv_pass]
+    page, records = db_engine.sample_mv_track_records(seed=1, limit=len(mv_tokens))
+    assert sorted(record.token for record in records) == sorted(mv_tokens)
+    assert [record.token for record in records] == page.tokens
+
+    _, same_records = db_engine.sample_mv_track_records(seed=1, limit=len(mv_tokens))
+    assert same_records == records
+
+
+def test_get_artist_names(db_engine):
+    for artist in artist_samples:
+        db_engine.add_artist(artist=artist)
+
+    names = db_engine.get_artist_names(artist_tokens=[artist.token for artist in artist_samples])
+    assert names == {artist.token: artist.name for artist in artist_samples}
+    assert all(artist.token in db_engine.artist_names for artist in artist_samples)
+
+
+def test_get_mv_track_ids(db_engine):
+    for track in track_samples:
+        db_engine.add_track(track=track)
+
+    mv_track_ids = db_engine.get_mv_track_ids(platform=Platforms.spotify)
+    assert mv_track_ids == [track.sources[0].platform_id for track in track_samples if track.mv_pass]
+
+
 def test_add_artist(db_engine):
     artist = artist_samples[0]
     db_engine.add_artist(artist=artist)
@@ -142,6 +258,48 @@ def test_incr_landing_page_view_count(db_engine):
     assert info.landing_page_view_count == general_info_sample.landing_page_view_count + 14
 
 
+def test_get_cached_info(db_engine):
+    db_engine.add_general_info(info=general_info_sample)
+    assert general_info_sample == db_engine.get_cached_info(info_type=InfoTypes.general)
+
+    db_engine.incr_landing_page_view_count(14)
+    assert db_engine.get_cached_info(info_type=InfoTypes.general) == general_info_sample
+
+    db_engine.update_general_info(network_coverage=5555)
+    assert db_engine.get_cached_info(info_type=InfoTypes.general).network_coverage == 5555
+
+
+def test_view_counter(db_engine):
+    db_engine.add_general_info(info=general_info_sample)
+    for _ in range(14):
+        db_engine.view_counter.incr()
+    assert db_engine.view_counter.pending_count == 14
+    assert db_engine.get_info(info_type=InfoTypes.general).landing_page_view_count == \
+           general_info_sample.landing_page_view_count
+
+    assert db_engine.view_counter.flush() == 14
+    assert db_engine.view_counter.pending_count == 0
+    assert db_engine.get_cached_info(info_type=InfoTypes.general).landing_page_view_count == \
+           general_info_sample.landing_page_view_count + 14
+
+
+def test_view_counter_refresh_failure(db_engine, monkeypatch):
+    db_engine.add_general_info(info=general_info_sample)
+    db_engine.get_cached_info(info_type=InfoTypes.general)
+
+    def fail(**kwargs):
+        raise Exception('Refresh failed')
+
+    monkeypatch.setattr(db_engine, 'get_info', fail)
+    db_engine.view_counter.incr(amount=3)
+    assert db_engine.view_counter.flush() == 3
+    assert db_engine.view_counter.pending_count == 0
+    assert db_engine.view_counter.flush() == 0
+    monkeypatch.undo()
+    assert db_engine.get_cached_info(info_type=InfoTypes.general).landing_page_view_count == \
+           general_info_sample.landing_page_view_count + 3
+
+
 def test_set_last_snapshot_timestamp(db_engine):
     db_engine.add_general_info(info=general_info_sample)
 
@@ -202,6 +360,27 @@ def test_get_join_members(db_engine):
     assert all([member in join_members_samples for member in members])
 
 
+def test_iter_join_members(db_engine):
+    for member in join_members_samples:
+        db_engine.add_join_member(member=member)
+
+    pages = list(db_engine.iter_join_members(page_size=2))
+    assert all(len(page) <= 2 for page in pages)
+    assert sorted(member.token for page in pages for member in page) == \
+           sorted(member.token for member in join_members_samples)
+
+
+def test_update_join_members(db_engine):
+    for member in join_members_samples:
+        db_engine.add_join_member(member=member)
+    last_date = hour_rounder(datetime.now())
+    db_engine.update_join_members(tokens=[member.token for member in join_members_samples],
+                                  last_sent_news_date=last_date)
+
+    members = db_engine.get_join_members()
+    assert all(member.last_sent_news_date == last_date for member in members)
+
+
 def test_get_join_members_count(db_engine):
     for member in join_members_samples:
         db_engine.add_join_member(member=member)
@@ -242,3 +421,129 @@ def test_get_top_playlists_snapshots(db_engine):
     snapshot.token = top_playlists_snapshot_sample.token
     assert snapshot == top_playlists_snapshot_sample
 
+
+def test_get_playlist_history(db_engine):
+    playlists = top_playlists_snapshot_sample.top_playlists
+    timestamp = hour_rounder(datetime.now(timezone.utc))
+    for idx in range(3):
+        db_engine.add_top_playlists_snapshot(timestamp=timestamp + timedelta(days=7 * idx),
+                                             playlists=playlists[idx:] + playlists[:idx])
+
+    history = db_engine.get_playlist_history(playlist_token=playlists[0].token)
+    assert [point.rank for point in history] == [1, len(playlists), len(playlists) - 1]
+    assert [point.timestamp for point in history] == [timestamp + timedelta(days=7 * idx) for idx in range(3)]
+
+    latest = db_engine.get_playlist_history(playlist_token=playlists[0].token, limit=2)
+    assert latest == history[1:]
+    ranged = db_engine.get_playlist_history(playlist_token=playlists[0].token, start=timestamp + timedelta(days=1),
+                                            end=timestamp + timedelta(days=8))
+    assert ranged == history[1:2]
+
+
+def test_compact_top_playlists_snapshots(db_engine):
+    data = top_playlists_snapshot_sample.model_dump(by_alias=True, mode='json')
+    db_engine.db_engine.insert(db=Keys.mv_box_playlists_db, key=Keys.top_playlists_snapshots, data=data)
+    for playlist in top_playlists_snapshot_sample.top_playlists:
+        db_engine.add_playlist(playlist=playlist)
+
+    assert db_engine.get_latest_top_playlists_snapshot() == top_playlists_snapshot_sample
+    assert db_engine.compact_top_playlists_snapshots() == 1
+    assert db_engine.compact_top_playlists_snapshots() == 0
+
+    db_engine.snapshot_playlists.clear()
+    snapshot = db_engine.get_latest_top_playlists_snapshot()
+    assert [playlist.token for playlist in snapshot.top_playlists] == \
+           [playlist.token for playlist in top_playlists_snapshot_sample.top_playlists]
+
+
+def test_query_plans(db_engine):
+    db_engine.db_engine.ensure_indexes(db=Keys.mv_box_playlists_db, indexes=COLLECTION_INDEXES)
+    db_engine.db_engine.plan_check = True
+    try:
+        playlist = playlist_samples[0]
+        track = track_samples[0]
+        artist = artist_samples[0]
+        db_engine.check_playlist_existence(platform_id=playlist.platform_id, platform=playlist.platform)
+        db_engine.get_top_playlists(limit=10)
+        db_engine.get_sponsored_playlists(limit=10)
+        db_engine.get_playlist_ranks(playlist_tokens=[playlist.token])
+        db_engine.update_playlist(playlist_token=playlist.token, follower_count=1)
+        db_engine.check_track_existence(platform_id=track.sources[0].platform_id, platform=track.sources[0].platform)
+        db_engine.get_mv_tracks(limit=10)
+        db_engine.get_mv_track_records(limit=10)
+        db_engine.get_mv_track_ids(platform=Platforms.spotify)
+        db_engine.get_artists(artist_tokens=[artist.token])
+        db_engine.get_artist_by_platform(platform_id=artist.sources[0].platform_id, platform=artist.sources[0].platform)
+        db_engine.get_join_members(limit=10)
+        db_engine.get_join_members(target={'email': join_members_samples[0].email})
+        list(db_engine.iter_join_members(target={'news_subscription': True}, page_size=10))
+        db_engine.get_spotify_user_by_spotify_id(spotify_id=spotify_users_samples[0].spotify_id)
+        db_engine.get_email_user(sender=SenderSlugs.community_team)
+        db_engine.get_top_playlists_snapshots(limit=1)
+        db_engine.get_playlist_history(playlist_token=playlist.token, limit=10)
+        db_engine.claim_ingestion_job()
+        db_engine.requeue_stale_ingestion_jobs(stale_after=timedelta(minutes=10))
+    finally:
+        db_engine.db_engine.plan_check = False
+
+
+def test_requeue_stale_ingestion_jobs(db_engine):
+    job = db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify)
+    for attempt in range(1, 3):
+        assert db_engine.claim_ingestion_job().attempts == attempt
+        assert db_engine.requeue_stale_ingestion_jobs(stale_after=timedelta(0), max_attempts=2) == (attempt < 2)
+
+    failed_job = db_engine.get_ingestion_job(job_token=job.token)
+    assert failed_job.status is IngestionStatus.failed
+    assert failed_job.error == 'Too many attempts'
+    assert db_engine.claim_ingestion_job() is None
+
+
+def test_ingestion_jobs(db_engine):
+    job = db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify)
+    assert job.status is IngestionStatus.queued
+    assert db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify).token == job.token
+
+    claimed_job = db_engine.claim_ingestion_job()
+    assert claimed_job.token == job.token
+    assert claimed_job.status is IngestionStatus.processing
+    assert claimed_job.attempts == 1
+    assert db_engine.claim_ingestion_job() is None
+    assert db_engine.requeue_stale_ingestion_jobs(stale_after=timedelta(hours=1)) == 0
+
+    db_engine.finish_ingestion_job(job_token=job.token, error='Invalid url')
+    failed_job = db_engine.get_ingestion_job(job_token=job.token)
+    assert failed_job.status is IngestionStatus.failed
+    assert failed_job.error == 'Invalid url'
+
+    requeued_job = db_engine.enqueue_ingestion_job(platform_id='spotify_id', platform=Platforms.spotify)
+    assert requeued_job.token == job.token
+    assert requeued_job.status is IngestionStatus.queued
+    assert requeued_job.error is None
+
+
+def test_playlist_schedules(db_engine):
+    schedule = PlaylistSchedule(_id=playlist_samples[0].token, change_rate=0.2, interval=6,
+                                next_refresh_at=hour_rounder(datetime.now(timezone.utc)))
+    db_engine.save_playlist_schedule(schedule=schedule)
+    assert db_engine.get_playlist_schedules() == [schedule]
+
+    schedule.interval = 24
+    with db_engine.bulk_writer() as batch:
+        db_engine.save_playlist_schedule(schedule=schedule, batch=batch)
+    assert db_engine.get_playlist_schedules() == [schedule]
+
+
+def test_job_leases(db_engine):
+    assert db_engine.acquire_job_lease(job='update_stats', owner='worker_a', ttl=timedelta(minutes=1))
+    assert not db_engine.acquire_job_lease(job='update_stats', owner='worker_b', ttl=timedelta(minutes=1))
+    assert db_engine.acquire_job_lease(job='update_stats', owner='worker_a', ttl=timedelta(minutes=1))
+    assert db_engine.get_job_lease(job='update_stats').owner == 'worker_a'
+
+    assert not db_engine.release_job_lease(job='update_stats', owner='worker_b')
+    assert db_engine.release_job_lease(job='update_stats', owner='worker_a')
+    assert db_engine.acquire_job_lease(job='update_stats', owner='worker_b', ttl=timedelta(minutes=1))
+    assert db_engine.get_job_lease(job='update_stats').owner == 'worker_b'
+
+    assert db_engine.acquire_job_lease(job='playlist_tracking', owner='worker_a', ttl=timedelta(seconds=-1))
+    assert db_engine.acquire_job_lease(job='playlist_tracking', owner='worker_b', ttl=timedelta(minutes=1))
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.modules.db.decoding import decode, get_projection
+from backend.modules.db.models import Playlist, Platforms, Track, TrackSource, JoinMember, MemberTypes, \
+    CompactTopPlaylistsSnapshot, SnapshotEntry, IngestionJob, IngestionStatus
+
+
+def get_samples():
+    return [Playlist(platform=Platforms.spotify, platform_id='platform_id', name='Playlist', follower_count=10,
+                     track_count=20, mv_track_count=3, snapshot_id='snapshot_id'),
+            Track(sources=[TrackSource(platform=Platforms.spotify, platform_id='platform_id')], name='Track',
+                  image_path='image_path', mv_pass=True),
+            JoinMember(name='Member', email='member@example.com', member_type=MemberTypes.curator,
+                       last_sent_news_date=datetime(2024, 6, 1, tzinfo=timezone.utc)),
+            CompactTopPlaylistsSnapshot(entries=[SnapshotEntry(token='token', rank=1, follower_count=10,
+                                                               mv_track_count=3)],
+                                        timestamp=datetime(2024, 6, 1, tzinfo=timezone.utc)),
+            IngestionJob(platform_id='platform_id', platform=Platforms.spotify, status=IngestionStatus.done)]
+
+
+@pytest.mark.parametrize('sample', get_samples())
+def test_trusted_decode(sample):
+    model = type(sample)
+    data = sample.model_dump(by_alias=True, mode='json')
+    validated = decode(model=model, data=[data])[0]
+    record = decode(model=model, data=[data], trusted=True)[0]
+
+    assert record._fields == tuple(model.model_fields)
+    for name in model.model_fields:
+        value = getattr(record, name)
+        if isinstance(value, list):
+            value = [el._asdict() if hasattr(el, '_asdict') else el for el in value]
+            expected = [el.__dict__ if hasattr(el, '__dict__') else el for el in getattr(validated, name)]
+            assert value == expected
+        else:
+            assert value == getattr(validated, name)
+
+
+def test_projected_decode():
+    playlist = get_samples()[0]
+    fields = ['platform', 'follower_count']
+    projection = get_projection(model=Playlist, fields=fields)
+    assert projection == {'platform': 1, 'follower_count': 1}
+
+    data = {key: value for key, value in playlist.model_dump(by_alias=True, mode='json').items()
+            if key == '_id' or key in projection}
+    record = decode(model=Playlist, data=[data], trusted=True, fields=fields)[0]
+    assert record == (playlist.token, Platforms.spotify, 10)
+    assert record.platform is Platforms.spotify
+
+    with pytest.raises(ValueError):
+        decode(model=Playlist, data=[data], fields=fields)
+    with pytest.raises(ValueError):
+        get_projection(model=Playlist, fields=['unknown'])
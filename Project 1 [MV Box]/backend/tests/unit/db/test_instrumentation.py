@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import pytest
+
+from backend.modules.db.instrumentation import OperationMetrics, InstrumentedCursor, LatencyHistogram, \
+    operation_scope, scoped, get_filter_shape, summarize_plan
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for elapsed_ms in [0.2] * 90 + [30] * 9 + [700]:
+        histogram.observe(elapsed_ms=elapsed_ms)
+    histogram.observe(elapsed_ms=3, failed=True)
+
+    assert histogram.count == 101
+    assert histogram.errors == 1
+    assert histogram.max_ms == 700
+    assert histogram.percentile(0.5) == 0.5
+    assert histogram.percentile(0.95) == 50
+    assert histogram.percentile(1) == 700
+
+
+def test_get_filter_shape():
+    target = {'_id': 'token', '$or': [{'owner': 'worker_a'}, {'expires_at': {'$lt': 5}}],
+              'entries.token': {'$in': ['a', 'b']}}
+    assert get_filter_shape(target) == {'_id': '?', '$or': [{'owner': '?'}, {'expires_at': {'$lt': '?'}}],
+                                        'entries.token': {'$in': '?'}}
+
+
+def test_summarize_plan():
+    plan = {'stage': 'LIMIT', 'inputStage': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN',
+                                                                             'indexName': 'mv_pass_1__id_1'}}}
+    assert summarize_plan(plan) == 'LIMIT <- FETCH <- IXSCAN(mv_pass_1__id_1)'
+
+
+def test_measure_scopes():
+    metrics = OperationMetrics(verbose=False)
+    with metrics.measure(collection='playlists', operation='find_one'):
+        pass
+    with operation_scope('GET /general/info/landing_stats'):
+        with metrics.measure(collection='info', operation='find_one'):
+            pass
+    scoped('update_stats', lambda: metrics.record(collection='playlists', operation='count', elapsed=0.01))()
+    with pytest.raises(ValueError):
+        with metrics.measure(collection='playlists', operation='update_one'):
+            raise ValueError()
+
+    operations = {(el.scope, el.collection, el.operation): el for el in metrics.snapshot().operations}
+    assert set(operations) == {(None, 'playlists', 'find_one'), ('GET /general/info/landing_stats', 'info', 'find_one'),
+                               ('update_stats', 'playlists', 'count'), (None, 'playlists', 'update_one')}
+    assert operations[('update_stats', 'playlists', 'count')].total_ms == 10
+    assert operations[(None, 'playlists', 'update_one')].errors == 1
+
+    metrics.reset()
+    assert metrics.snapshot().operations == []
+
+
+def test_slow_queries():
+    metrics = OperationMetrics(slow_threshold=timedelta(milliseconds=50), explain_slow_queries=True,
+                               slow_log_size=2, verbose=False)
+    explain = lambda: {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}
+    metrics.record(collection='tracks', operation='find', elapsed=0.01, target={'mv_pass': True}, explain=explain)
+    for _ in range(3):
+        metrics.record(collection='tracks', operation='find', elapsed=0.2, target={'mv_pass': True}, explain=explain)
+
+    slow_queries = metrics.snapshot().slow_queries
+    assert len(slow_queries) == 2
+    assert slow_queries[0].filter_shape == {'mv_pass': '?'}
+    assert slow_queries[0].plan == 'COLLSCAN'
+    assert slow_queries[0].elapsed_ms == 200
+
+
+def test_instrumented_cursor():
+    metrics = OperationMetrics(verbose=False)
+    with operation_scope('GET /general/tracks/mv_tracks'):
+        cursor = InstrumentedCursor(iter([1, 2, 3]), metrics=metrics, collection='tracks', operation='find')
+    assert list(cursor) == [1, 2, 3]
+    assert list(cursor) == []
+
+    operations = metrics.snapshot().operations
+    assert len(operations) == 1
+    assert operations[0].scope == 'GET /general/tracks/mv_tracks'
+    assert operations[0].count == 1
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from threading import Event, Thread
+
+import pytest
+
+from backend.modules.db.decoding import decode
+from backend.modules.db.leaderboard import Leaderboard
+from backend.modules.db.models import Playlist, Platforms
+
+
+def get_playlist(idx: int, mv_track_count: int, follower_count: int, sponsored: bool = False):
+    return Playlist(platform=Platforms.spotify,
+                    platform_id=f'platform_id_{idx}',
+                    name=f'playlist_{idx}',
+                    follower_count=follower_count,
+                    track_count=100,
+                    mv_track_count=mv_track_count,
+                    sponsored=sponsored)
+
+
+def get_leaderboard(top_count: int, sponsored_count: int = 0):
+    top_playlists = [get_playlist(idx, mv_track_count=idx % 5, follower_count=idx) for idx in range(top_count)]
+    sponsored_playlists = [get_playlist(idx, mv_track_count=0, follower_count=idx, sponsored=True)
+                           for idx in range(sponsored_count)]
+    leaderboard = Leaderboard(loader=lambda: (top_playlists, sponsored_playlists))
+    return leaderboard, top_playlists, sponsored_playlists
+
+
+def test_get_page():
+    leaderboard, top_playlists, sponsored_playlists = get_leaderboard(top_count=25, sponsored_count=2)
+    expected_top = sorted(top_playlists, key=lambda x: (x.mv_track_count, x.follower_count), reverse=True)
+    expected_sponsored = sorted(sponsored_playlists, key=lambda x: x.follower_count, reverse=True)
+
+    page = leaderboard.get_page(offset=0)
+    assert page.next_offset == 10
+    assert len(page.playlists) == 12
+    assert page.playlists[1] == expected_sponsored[0]
+    assert page.playlists[4] == expected_sponsored[1]
+    assert [pl for pl in page.playlists if not pl.sponsored] == expected_top[:10]
+
+    page = leaderboard.get_page(offset=20)
+    assert page.next_offset is None
+    assert page.playlists == expected_top[20:]
+
+
+def test_get_page_cursor():
+    leaderboard, top_playlists, sponsored_playlists = get_leaderboard(top_count=25, sponsored_count=12)
+    expected_top = sorted(top_playlists, key=lambda x: (-x.mv_track_count, -x.follower_count, x.token))
+    expected_sponsored = sorted(sponsored_playlists, key=lambda x: -x.follower_count)
+
+    pages = [leaderboard.get_page()]
+    while pages[-1].next_cursor is not None:
+        pages.append(leaderboard.get_page(cursor=pages[-1].next_cursor))
+
+    assert len(pages) == 3
+    assert [pl for page in pages for pl in page.playlists if not pl.sponsored] == expected_top
+    assert [pl for page in pages for pl in page.playlists if pl.sponsored] == expected_sponsored
+
+    with pytest.raises(ValueError):
+        leaderboard.get_page(cursor='broken_cursor')
+
+
+def test_add():
+    leaderboard, _, _ = get_leaderboard(top_count=5)
+    leaderboard.get_page()
+    version = leaderboard.version
+
+    playlist = get_playlist(99, mv_track_count=100, follower_count=0)
+    leaderboard.add(playlist)
+    assert leaderboard.get_page().playlists[0] == playlist
+    assert leaderboard.version == version + 1
+
+
+def test_reload_version():
+    leaderboard, top_playlists, _ = get_leaderboard(top_count=5)
+    leaderboard.get_page()
+    version = leaderboard.version
+
+    leaderboard.reload()
+    assert leaderboard.version == version
+
+    top_playlists[0] = top_playlists[0].model_copy(update={'follower_count': 1000})
+    leaderboard.reload()
+    assert leaderboard.version == version + 1
+
+
+def test_load_records():
+    playlists = [get_playlist(idx, mv_track_count=idx, follower_count=idx) for idx in range(5)]
+    records = decode(model=Playlist, data=[el.model_dump(by_alias=True) for el in playlists], trusted=True,
+                     fields=Leaderboard.ranking_fields)
+    leaderboard = Leaderboard(loader=lambda: (records, []))
+
+    page = leaderboard.get_page()
+    assert [pl.token for pl in page.playlists] == [pl.token for pl in reversed(playlists)]
+    assert all(isinstance(pl, Playlist) for pl in page.playlists)
+    assert page.playlists[0].name == playlists[-1].name
+
+
+def test_reload_does_not_block_readers():
+    playlists = [get_playlist(idx, mv_track_count=idx, follower_count=idx) for idx in range(5)]
+    loading = Event()
+    release = Event()
+
+    def loader():
+        if leaderboard.loaded_at is not None:
+            loading.set()
+            release.wait(5)
+        return playlists, []
+
+    leaderboard = Leaderboard(loader=loader, max_staleness=timedelta(0))
+    leaderboard.get_page()
+
+    reload_thread = Thread(target=leaderboard.get_page)
+    reload_thread.start()
+    assert loading.wait(5)
+    assert len(leaderboard.get_page().playlists) == 5
+    assert not release.is_set()
+
+    release.set()
+    reload_thread.join()
+
+
+def test_update():
+    leaderboard, top_playlists, _ = get_leaderboard(top_count=5)
+    leaderboard.get_page()
+
+    last_playlist = leaderboard.get_page().playlists[-1]
+    assert leaderboard.update(playlist_token=last_playlist.token, mv_track_count=100)
+    assert leaderboard.get_page().playlists[0].token == last_playlist.token
+    assert not leaderboard.update(playlist_token='missing_token', follower_count=1)
+
+
+def test_get_rendered_page():
+    leaderboard, _, _ = get_leaderboard(top_count=5)
+    renders = []
+
+    def render(page):
+        renders.append(page)
+        return str(len(page.playlists)).encode()
+
+    assert leaderboard.get_rendered_page(offset=0, render=render) == b'5'
+    assert leaderboard.get_rendered_page(offset=0, render=render) == b'5'
+    assert len(renders) == 1
+
+    leaderboard.add(get_playlist(99, mv_track_count=100, follower_count=0))
+    assert leaderboard.get_rendered_page(offset=0, render=render) == b'6'
+    assert len(renders) == 2
@@ -2,8 +2,9 @@ import os
 
 import pytest
 from dotenv import load_dotenv
+from pymongo import UpdateOne
 
-from backend.modules.db.models import Keys
+from backend.modules.db.models import Keys, CollectionIndex
 from backend.modules.db.mongo_engine import MongoEngine
 from backend.tests.sample_data import mongo_engine_samples
 
@@ -73,6 +74,26 @@ def test_update_many(mongo_engine_rollback):
     assert len(list(response)) == 2
 
 
+def test_bulk_write(mongo_engine_rollback):
+    mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
+    mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[1])
+    operations = [UpdateOne(filter={'_id': sample['_id']}, update={'$set': {'data': 'new_data'}})
+                  for sample in mongo_engine_samples[:2]]
+    result = mongo_engine_rollback.bulk_write(db=Keys.mv_box_playlists_db, key=Keys.test, operations=operations,
+                                              ordered=False)
+    assert result.modified_count == 2
+    response = mongo_engine_rollback.find(db=Keys.mv_box_playlists_db, key=Keys.test, target={'data': 'new_data'})
+    assert len(list(response)) == 2
+
+
+def test_aggregate(mongo_engine_rollback):
+    mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
+    mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[1])
+    response = mongo_engine_rollback.aggregate(db=Keys.mv_box_playlists_db, key=Keys.test,
+                                               pipeline=[{'$match': {'data': mongo_engine_samples[0]['data']}}])
+    assert list(response) == [mongo_engine_samples[0]]
+
+
 def test_delete_one(mongo_engine_rollback):
     mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
     mongo_engine_rollback.delete_one(db=Keys.mv_box_playlists_db, key=Keys.test, target={'_id': mongo_engine_samples[0]['_id']})
@@ -95,3 +116,22 @@ def test_get_keys(mongo_engine_rollback):
     mongo_engine_rollback.insert(db=Keys.mv_box_playlists_db, key=Keys.test, data=mongo_engine_samples[0])
     keys = mongo_engine_rollback.get_keys(db=Keys.mv_box_playlists_db, key=Keys.test, target={'_id': mongo_engine_samples[0]['_id']})
     assert keys == list(mongo_engine_samples[0].keys())
+
+
+def test_ensure_indexes(mongo_engine_rollback):
+    indexes = [CollectionIndex(key=Keys.test, fields=[('data', 1)])]
+    mongo_engine_rollback.ensure_indexes(db=Keys.mv_box_playlists_db, indexes=indexes)
+    mongo_engine_rollback.ensure_indexes(db=Keys.mv_box_playlists_db, indexes=indexes)
+    index_info = mongo_engine_rollback.engine[Keys.mv_box_playlists_db.value][Keys.test.value].index_information()
+    assert index_info['data_1']['key'] == [('data', 1)]
+
+
+def test_operation_metrics(mongo_engine_rollback):
+    mongo_engine_rollback.metrics.reset()
+    mongo_engine_rollback.insert(db=Keys.test, key=Keys.test, data={'_id': 'metrics', 'value': 1})
+    list(mongo_engine_rollback.find(db=Keys.test, key=Keys.test, target={'value': 1}))
+    mongo_engine_rollback.count(db=Keys.test, key=Keys.test, target={'value': 1})
+
+    operations = {el.operation: el for el in mongo_engine_rollback.metrics.snapshot().operations}
+    assert set(operations) == {'insert_one', 'find', 'count'}
+    assert all(el.collection == Keys.test.value and el.count == 1 for el in operations.values())
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from threading import Event, Thread
+
+import pytest
+
+from backend.modules.db.track_sampler import TrackSampler, CursorExpired
+
+
+def get_sampler(count: int):
+    tokens = [f'track_{idx}' for idx in range(count)]
+    return TrackSampler(loader=lambda: tokens), tokens
+
+
+def collect_pages(sampler: TrackSampler, seed: int, limit: int):
+    page = sampler.get_page(seed=seed, limit=limit)
+    collected = list(page.tokens)
+    while page.next_cursor is not None:
+        page = sampler.get_page(limit=limit, cursor=page.next_cursor)
+        collected += page.tokens
+    return collected
+
+
+def test_get_page():
+    sampler, tokens = get_sampler(count=47)
+    collected = collect_pages(sampler, seed=7, limit=10)
+    assert sorted(collected) == sorted(tokens)
+    assert collect_pages(sampler, seed=7, limit=10) == collected
+    assert collect_pages(sampler, seed=8, limit=10) != collected
+
+    page = sampler.get_page(seed=7, offset=10, limit=10)
+    assert page.tokens == collected[10:20]
+    assert page.next_offset == 20
+
+
+def test_get_page_without_seed():
+    sampler, tokens = get_sampler(count=5)
+    page = sampler.get_page(limit=10)
+    assert 0 <= page.seed < TrackSampler.seed_limit
+    assert sorted(page.tokens) == sorted(tokens)
+    assert page.next_offset is None and page.next_cursor is None
+
+
+def test_get_page_empty():
+    sampler, _ = get_sampler(count=0)
+    page = sampler.get_page(seed=1)
+    assert page.tokens == []
+    assert page.next_cursor is None
+
+
+def test_add():
+    sampler, tokens = get_sampler(count=20)
+    first_page = sampler.get_page(seed=3, limit=10)
+    version = sampler.version
+    for idx in range(3):
+        sampler.add(token=f'track_new_{idx}')
+    assert sampler.version == version
+
+    next_page = sampler.get_page(limit=10, cursor=first_page.next_cursor)
+    assert sorted(first_page.tokens + next_page.tokens) == sorted(tokens)
+    assert {'track_new_0', 'track_new_1', 'track_new_2'} <= set(collect_pages(sampler, seed=3, limit=10))
+
+
+def test_reload_does_not_block_readers():
+    loading = Event()
+    release = Event()
+    tokens = [f'track_{idx}' for idx in range(10)]
+
+    def loader():
+        if sampler.shuffled_at is not None:
+            loading.set()
+            release.wait(timeout=5)
+        return tokens
+
+    sampler = TrackSampler(loader=loader, reshuffle_interval=timedelta(0))
+    sampler.get_page(seed=1)
+    version = sampler.version
+    reload_thread = Thread(target=sampler.get_page)
+    reload_thread.start()
+    assert loading.wait(timeout=5)
+
+    assert sorted(sampler.get_page(seed=1, limit=10).tokens) == sorted(tokens)
+    sampler.add(token='track_new')
+    release.set()
+    reload_thread.join(timeout=5)
+
+    assert sampler.version == version + 1
+    assert 'track_new' in sampler.permutations[sampler.version]
+
+
+def test_expired_cursor():
+    sampler, _ = get_sampler(count=20)
+    cursor = sampler.get_page(seed=3, limit=10).next_cursor
+    for _ in range(sampler.retained_permutations):
+        sampler.reshuffle()
+
+    with pytest.raises(CursorExpired):
+        sampler.get_page(cursor=cursor)
+
+
+def test_parse_cursor():
+    sampler, _ = get_sampler(count=5)
+    with pytest.raises(ValueError):
+        sampler.get_page(cursor='broken')
+    with pytest.raises(ValueError):
+        sampler.parse_cursor(sampler.get_page(seed=1, limit=1).next_cursor[:-2])
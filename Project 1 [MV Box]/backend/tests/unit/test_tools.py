@@ -0,0 +1,114 @@
+import time
+from datetime import datetime, timezone, timedelta
+from threading import Event
+
+from backend.modules.tools import TokenBucket, encode_cursor, decode_cursor, CronScheduler, CronThread, \
+    CronThreadEvents, MisfirePolicies
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    started_at = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started_at >= 0.04
+
+
+def test_cursor():
+    values = [12, 3400, '0190a2b3c4d5e6f7']
+    assert decode_cursor(encode_cursor(values)) == values
+    assert decode_cursor('broken_cursor') is None
+
+
+class FakeClock:
+    def __init__(self, now: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc)):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, delta: timedelta):
+        self.now += delta
+
+
+def get_cron_job(scheduler: CronScheduler, target: object, recall_time: timedelta = timedelta(minutes=1),
+                 **kwargs):
+    return CronThread(start_time=scheduler.clock() + timedelta(minutes=1), target=target,
+                      recall_time=recall_time, silent_mode=True, scheduler=scheduler, **kwargs)
+
+
+def wait_for_jobs(scheduler: CronScheduler):
+    scheduler.executor.submit(lambda: None).result(timeout=5)
+
+
+def test_cron_scheduler():
+    clock = FakeClock()
+    scheduler = CronScheduler(workers=1, silent_mode=True, clock=clock)
+    calls = []
+    get_cron_job(scheduler, target=lambda: calls.append(1), call_limit=3)
+    get_cron_job(scheduler, target=lambda: CronThreadEvents.terminate if calls.append(2) is None else None)
+    for _ in range(5):
+        clock.advance(timedelta(minutes=1))
+        scheduler.run_pending()
+        wait_for_jobs(scheduler)
+    scheduler.shutdown(wait=True)
+
+    assert calls.count(1) == 3
+    assert calls.count(2) == 1
+    assert scheduler.executor._max_workers == 1
+
+
+def test_cron_scheduler_overlap():
+    clock = FakeClock()
+    scheduler = CronScheduler(workers=4, silent_mode=True, clock=clock)
+    release = Event()
+    calls = []
+
+    def target():
+        calls.append(1)
+        release.wait(timeout=5)
+
+    get_cron_job(scheduler, target=target)
+    for _ in range(3):
+        clock.advance(timedelta(minutes=1))
+        scheduler.run_pending()
+    release.set()
+    scheduler.shutdown(wait=True)
+
+    assert len(calls) == 1
+
+
+def test_cron_scheduler_misfire():
+    counts = {}
+    for policy in MisfirePolicies:
+        clock = FakeClock()
+        scheduler = CronScheduler(workers=1, silent_mode=True, clock=clock)
+        calls = []
+        get_cron_job(scheduler, target=lambda: calls.append(1), misfire_policy=policy)
+        clock.advance(timedelta(minutes=3.5))
+        scheduler.run_pending()
+        wait_for_jobs(scheduler)
+        scheduler.shutdown(wait=True)
+        counts[policy] = len(calls)
+
+    assert counts[MisfirePolicies.skip] == 0
+    assert counts[MisfirePolicies.run_once] == 1
+    assert counts[MisfirePolicies.catch_up] == 3
+
+
+def test_cron_scheduler_round_next_month():
+    clock = FakeClock(now=datetime(2024, 1, 31, 12, tzinfo=timezone.utc))
+    scheduler = CronScheduler(workers=1, silent_mode=True, clock=clock)
+    calls = []
+    job = get_cron_job(scheduler, target=lambda: calls.append(1), recall_time=timedelta(hours=1),
+                       round_next_month=True)
+    clock.advance(timedelta(minutes=1))
+    assert scheduler.run_pending() > 0
+    wait_for_jobs(scheduler)
+    scheduler.shutdown(wait=True)
+
+    assert calls == [1]
+    assert job.start_time == datetime(2024, 2, 1, 12, 1, tzinfo=timezone.utc)
@@ -19,8 +19,7 @@ export const TrackPlaylist = () => {
 
         if (inputValue && !trackPlaylistMutation.isPending) {
             trackPlaylistMutation.mutate({ playlistUrl: inputValue }, {
-                onSuccess: async (response) => {
-                    const data = await response.json();
+                onSuccess: (data) => {
                     setPlaylist(data);
                     setOpenModal(true);
                     setInputValue("");
@@ -31,6 +30,8 @@ export const TrackPlaylist = () => {
                         setInvalid("Playlist not found");
                     } else if (error.response.status === 403) {
                         setInvalid("The playlist is already being tracked");
+                    } else if (error.response.status === 408) {
+                        setInvalid("The playlist is still being processed, check back later");
                     }
                 }
             });
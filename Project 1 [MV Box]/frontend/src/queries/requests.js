@@ -1,4 +1,5 @@
-import { useInfiniteQuery, useMutation, useQuery } from "@tanstack/react-query";
+import { useEffect } from "react";
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { endpoints } from "./endpoints";
 
 const callAPI = async (endpoint, params) => {
@@ -12,6 +13,19 @@ const callAPI = async (endpoint, params) => {
     return response;
 };
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const JOB_POLL_INTERVAL = 1000;
+const JOB_POLL_LIMIT = 60;
+const CURSOR_EXPIRED = 410;
+
+const jobError = (message, status) => {
+    let error = new Error(message);
+    error.response = { status };
+    error.status = status;
+    return error;
+};
+
 export const TopPlaylistsInfiniteQuery = () => {
     const fetchData = async ({ pageParam }) => {
         const payload = new URLSearchParams({
@@ -37,10 +51,15 @@ export const TopPlaylistsInfiniteQuery = () => {
 };
 
 export const MVTracksInfiniteQuery = () => {
+    const queryClient = useQueryClient();
+
     const fetchData = async ({ pageParam }) => {
         const payload = new URLSearchParams({
-            offset: pageParam,
+            shuffle: true,
         });
+        if (pageParam) {
+            payload.append("cursor", pageParam);
+        }
 
         const params = {
             method: 'GET',
@@ -53,23 +72,43 @@ export const MVTracksInfiniteQuery = () => {
     const infiniteQuery = useInfiniteQuery({
         queryKey: ['mvTracks'],
         queryFn: fetchData,
-        initialPageParam: 0,
-        getNextPageParam: (lastPage, pages) => lastPage.next_offset,
+        initialPageParam: null,
+        getNextPageParam: (lastPage, pages) => lastPage.next_cursor,
+        retry: (failureCount, error) => error.status !== CURSOR_EXPIRED && failureCount < 3,
     });
 
+    useEffect(() => {
+        if (infiniteQuery.error?.status === CURSOR_EXPIRED) {
+            queryClient.resetQueries({ queryKey: ['mvTracks'] });
+        }
+    }, [infiniteQuery.error, queryClient]);
+
     return infiniteQuery;
 };
 
 export const TrackPlaylistMutation = () => {
     const mutation = useMutation({
-        mutationFn: ({ playlistUrl }) => {
+        mutationFn: async ({ playlistUrl }) => {
             const params = {
                 method: 'POST',
             };
             const payload = new URLSearchParams({
                 "playlist_url": playlistUrl,
             });
-            return callAPI(`${endpoints.trackPlaylist}?${payload}`, params);
+            let job = await (await callAPI(`${endpoints.trackPlaylist}?${payload}`, params)).json();
+
+            for (let attempt = 0; job.status === "queued" || job.status === "processing"; attempt++) {
+                if (attempt >= JOB_POLL_LIMIT) {
+                    throw jobError("Playlist is still processing", 408);
+                }
+                await sleep(JOB_POLL_INTERVAL);
+                job = await (await callAPI(`${endpoints.trackPlaylist}/${job.job_id}`, { method: 'GET' })).json();
+            }
+
+            if (job.status === "failed") {
+                throw jobError(job.error, job.error === "Playlist already exists" ? 403 : 400);
+            }
+            return job.result;
         }
     });
 